@@ -1,34 +1,233 @@
-from fastapi import APIRouter, File, UploadFile, Form, HTTPException
+import asyncio
+import functools
+import json
+import time
+from collections.abc import Iterator
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import APIRouter, File, UploadFile, Form, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
-from backend.app.services.face_recognition import face_service
+from backend.app import config
+from backend.app.services import metrics
+from backend.app.services.batcher import MicroBatcher
+from backend.app.services.face_recognition import face_service, resolve_det_size
+from backend.app.services.frame_stream import LatestFrame
+from backend.app.services.inference_pool import InferencePool, InferencePoolFull
+from backend.app.services.tracker import FaceTracker
 
 router = APIRouter()
 
+# Blocking model inference runs here instead of on the event loop
+inference_pool = InferencePool(config.INFERENCE_WORKERS, config.INFERENCE_QUEUE_SIZE)
+# Concurrent /predict frames are coalesced and analyzed as one batch,
+# one batcher per detection size so a batch shares a single det_size
+predict_batchers: dict[int, MicroBatcher] = {}
+
+DET_SIZE_QUERY = Query(
+    None,
+    description="Detection input size in pixels (multiple of 32) or a profile name such as 'kiosk'"
+)
+
+
+def get_predict_batcher(det_size: int) -> MicroBatcher:
+    batcher = predict_batchers.get(det_size)
+    if batcher is None:
+        batcher = predict_batchers[det_size] = MicroBatcher(
+            functools.partial(face_service.analyze_images, det_size=det_size), inference_pool,
+            max_batch=config.PREDICT_MAX_BATCH, max_wait_ms=config.PREDICT_MAX_WAIT_MS
+        )
+    return batcher
+
+
+def parse_det_size(det_size: str | None) -> int:
+    try:
+        return resolve_det_size(det_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def busy_error() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server is busy processing other images. Please retry shortly.",
+        headers={"Retry-After": str(config.INFERENCE_RETRY_AFTER)}
+    )
+
+
+async def read_upload(request: Request, file: UploadFile) -> bytes:
+    """
+    Read an uploaded file, recording the "read" stage: receiving and parsing
+    the multipart body (from the start of the request) plus this read.
+    """
+    contents = await file.read()
+    started = getattr(request.state, "started", None)
+    if started is not None:
+        metrics.record_stage("read", time.perf_counter() - started)
+    return contents
+
+
+async def run_inference(func, *args):
+    """Run a blocking service call on the inference pool, answering 503 when it is saturated."""
+    try:
+        return await inference_pool.run(func, *args)
+    except InferencePoolFull:
+        raise busy_error()
+
 
 # ─── Predict (Analyze) ─────────────────────────────────────────────
 
 @router.post("/predict")
-async def predict_face(file: UploadFile = File(...)):
+async def predict_face(request: Request, file: UploadFile = File(...), det_size: Optional[str] = DET_SIZE_QUERY):
     """
     Upload an image to detect and recognize faces.
     Returns bounding boxes, identified names, and similarity scores.
     """
-    contents = await file.read()
-    results = face_service.analyze_image(contents)
-    return {"results": results}
+    size = parse_det_size(det_size)
+    contents = await read_upload(request, file)
+    try:
+        results = await get_predict_batcher(size).submit(contents)
+    except InferencePoolFull:
+        raise busy_error()
+    with metrics.stage("serialize"):
+        return JSONResponse({"results": results})
+
+
+async def next_when_free(results: Iterator[dict]) -> dict | None:
+    """
+    Advance a blocking result generator on the inference pool, waiting for a
+    free slot rather than failing once a streamed response has started.
+    """
+    while True:
+        try:
+            return await inference_pool.run(next, results, None)
+        except InferencePoolFull:
+            await asyncio.sleep(0.05)
+
+
+async def stream_ndjson(first: dict | None, results: Iterator[dict]):
+    """One JSON line per result, then a summary line with the image and failure counts."""
+    images = failed = 0
+    result = first
+    try:
+        while result is not None:
+            images += 1
+            failed += "error" in result
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+            result = await next_when_free(results)
+    except Exception as e:
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+    finally:
+        # Runs the generator's cleanup (its thread pool) when the client
+        # disconnects; a batch still running on the pool is left to finish
+        try:
+            results.close()
+        except ValueError:
+            pass
+    yield json.dumps({"summary": {"images": images, "failed": failed}}) + "\n"
+
+
+@router.post("/predict/batch")
+async def predict_batch(
+    files: Optional[List[UploadFile]] = File(None),
+    file: Optional[UploadFile] = File(None),
+    det_size: Optional[str] = DET_SIZE_QUERY
+):
+    """
+    Detect and recognize faces in many images: a multipart list of `files`,
+    or one zip/tar archive `file` with images in any folder layout.
+    Images are decoded in parallel and recognized in batches. Results are
+    streamed as NDJSON, one line per image in upload order as soon as its
+    batch is done: {"index", "source", "results"} or {"index", "source",
+    "error"}, followed by a {"summary": {"images", "failed"}} line.
+    """
+    if (not files) == (file is None):
+        raise HTTPException(status_code=400, detail="Provide either image files or an archive file")
+    size = parse_det_size(det_size)
+    if file is not None:
+        results = face_service.analyze_archive(file.file, size)
+    else:
+        # Uploads are spooled to temporary files and read one batch at a time
+        results = face_service.analyze_many(((f.filename, f.file.read()) for f in files), size)
+    # The first batch runs before the response starts, so a saturated pool or
+    # an invalid archive is still reported with a status code
+    try:
+        first = await run_inference(next, results, None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(stream_ndjson(first, results), media_type="application/x-ndjson")
+
+
+@router.websocket("/stream")
+async def stream_predict(websocket: WebSocket, det_size: Optional[str] = None,
+                         track: bool = config.STREAM_TRACKING):
+    """
+    Continuous recognition over a WebSocket.
+    The client sends binary JPEG frames and receives one JSON message per
+    analyzed frame: {"frame": n, "results": [...], "dropped": count}.
+    While a frame is being analyzed only the newest incoming frame is kept,
+    so latency stays bounded when frames arrive faster than they are analyzed.
+    With `track` (default), faces are tracked across frames and only new or
+    changed tracks are re-embedded; results then include a "track_id".
+    """
+    try:
+        size = resolve_det_size(det_size)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    await websocket.accept()
+
+    mailbox = LatestFrame()
+
+    async def receive_frames():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    mailbox.put(message["bytes"])
+        finally:
+            mailbox.close()
+
+    if track:
+        tracker = FaceTracker(refresh_every=config.TRACK_REFRESH_FRAMES, max_missed=config.TRACK_MAX_MISSED)
+
+        def analyze(frame):
+            return inference_pool.run(face_service.analyze_tracked, frame, tracker, size)
+    else:
+        analyze = get_predict_batcher(size).submit
+
+    receiver = asyncio.create_task(receive_frames())
+    try:
+        while (item := await mailbox.get()) is not None:
+            seq, frame = item
+            try:
+                results = await analyze(frame)
+            except InferencePoolFull:
+                # Server saturated: skip this frame, the next one is already arriving
+                mailbox.dropped += 1
+                continue
+            await websocket.send_json({"frame": seq, "results": results, "dropped": mailbox.dropped})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
 
 
 # ─── Register ───────────────────────────────────────────────────────
 
 @router.post("/register")
-async def register_face(name: str = Form(...), file: UploadFile = File(...)):
+async def register_face(request: Request, name: str = Form(...), file: UploadFile = File(...),
+                        det_size: Optional[str] = DET_SIZE_QUERY):
     """
     Register a new face (name + single image).
     Supports Korean (한글) names.
     If the name already exists, the new embedding is appended.
     """
-    contents = await file.read()
-    result = face_service.register_face(name, contents)
+    size = parse_det_size(det_size)
+    contents = await read_upload(request, file)
+    result = await run_inference(face_service.register_face, name, contents, size)
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     return result
@@ -37,43 +236,152 @@ async def register_face(name: str = Form(...), file: UploadFile = File(...)):
 @router.post("/register/multiple")
 async def register_multiple_faces(
     name: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    det_size: Optional[str] = DET_SIZE_QUERY
 ):
     """
     Register multiple face images for a person at once.
     At least 2 images recommended for better recognition accuracy.
     """
+    size = parse_det_size(det_size)
     images_bytes = []
     for f in files:
         contents = await f.read()
         images_bytes.append(contents)
 
-    result = face_service.register_multiple_faces(name, images_bytes)
+    result = await run_inference(face_service.register_multiple_faces, name, images_bytes, size)
+    if result["status"] == "error":
+        raise HTTPException(status_code=400, detail=result["message"])
+    return result
+
+
+@router.post("/register/bulk")
+async def register_bulk(
+    file: Optional[UploadFile] = File(None),
+    folder: Optional[str] = Form(None),
+    det_size: Optional[str] = DET_SIZE_QUERY
+):
+    """
+    Enroll many people at once from a zip/tar archive upload, or from a
+    server folder under FACE_ENROLL_IMPORT_ROOT, laid out as name/*.jpg.
+    Images are decoded in parallel, embedded in batches and persisted once
+    per batch. Returns per-person image totals and the images that failed.
+    """
+    if (file is None) == (folder is None):
+        raise HTTPException(status_code=400, detail="Provide either an archive file or a folder")
+    size = parse_det_size(det_size)
+    if file is not None:
+        # The upload is spooled to a temporary file; members are read one at a time
+        result = await run_inference(face_service.register_archive, file.file, size)
+    else:
+        result = await run_inference(face_service.register_folder, folder, size)
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     return result
 
 
+# ─── Caches ─────────────────────────────────────────────────────────
+
+@router.get("/cache")
+async def cache_stats():
+    """
+    Hit/miss counters and size of the embedding cache (re-sent images skip
+    inference) and the thumbnail cache.
+    """
+    return {
+        "embeddings": face_service.embedding_cache.stats(),
+        "thumbnails": face_service.thumbnails.stats(),
+    }
+
+
 # ─── User Management (CRUD) ────────────────────────────────────────
+# Not inference, so not the inference pool, but still blocking: lookups wait on the
+# service lock that writers hold while persisting, and writes fsync and may compact
+# the snapshot. They run on Starlette's thread pool to keep the event loop free.
+
+def with_thumbnail_url(request: Request, user: dict) -> dict:
+    """Replace the service's thumbnail version with a versioned thumbnail URL (or None)."""
+    version = user.pop("thumbnail_version", None)
+    user["thumbnail"] = None
+    if version is not None:
+        url = request.url_for("get_user_thumbnail", name=user["name"])
+        user["thumbnail"] = str(url.include_query_params(v=version))
+    return user
+
+
+def not_modified(request: Request, etag: str, modified: float) -> bool:
+    """Evaluate If-None-Match (preferred) or If-Modified-Since against the current thumbnail."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
 
 @router.get("/users")
-async def get_users():
+async def get_users(
+    request: Request,
+    search: Optional[str] = Query(None, description="Filter by name; Hangul initials such as 'ㅎㄱㄷ' match '홍길동'"),
+    mode: str = Query("substring", description="'prefix' or 'substring' name matching"),
+    sort: str = Query("name", description="name, created_at, updated_at or image_count"),
+    order: str = Query("asc", description="'asc' or 'desc'"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(config.USERS_PAGE_SIZE, ge=1, le=config.USERS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+):
     """
-    Get all registered users with their information.
+    Get one page of registered users with their information.
+    "total" counts every user matching `search`; pass "next_cursor" back as
+    `cursor` for the next page (None on the last one).
+    Thumbnails are returned as URLs; fetch them from /users/{name}/thumbnail.
     """
-    users = face_service.get_registered_users()
-    return {"users": users, "total": len(users)}
+    try:
+        page = await run_in_threadpool(face_service.get_registered_users, search, mode, sort, order, offset,
+                                       limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page["users"] = [with_thumbnail_url(request, user) for user in page["users"]]
+    return page
 
 
 @router.get("/users/{name}")
-async def get_user(name: str):
+async def get_user(name: str, request: Request):
     """
     Get a specific registered user's information.
     """
-    user = face_service.get_user(name)
+    user = await run_in_threadpool(face_service.get_user, name)
     if user is None:
         raise HTTPException(status_code=404, detail=f"User '{name}' not found")
-    return user
+    return with_thumbnail_url(request, user)
+
+
+@router.get("/users/{name}/thumbnail", name="get_user_thumbnail")
+async def get_user_thumbnail(name: str, request: Request, v: Optional[str] = None):
+    """
+    Get a user's face thumbnail (JPEG).
+    Supports conditional requests with ETag / Last-Modified. URLs from /users
+    carry the thumbnail version, so those responses may be cached for good.
+    """
+    thumbnail = await run_in_threadpool(face_service.get_thumbnail, name)
+    if thumbnail is None:
+        raise HTTPException(status_code=404, detail=f"No thumbnail for user '{name}'")
+    data, etag, modified = thumbnail
+
+    headers = {
+        "ETag": f'"{etag}"',
+        "Last-Modified": formatdate(modified, usegmt=True),
+        # A versioned URL changes whenever the thumbnail does; others must revalidate
+        "Cache-Control": "public, max-age=31536000, immutable" if v == etag else "no-cache",
+    }
+    if not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
 
 
 @router.put("/users/{name}")
@@ -82,7 +390,7 @@ async def update_user(name: str, new_name: str = Form(...)):
     Update a registered user's name.
     Supports Korean (한글) names.
     """
-    result = face_service.update_user_name(name, new_name)
+    result = await run_in_threadpool(face_service.update_user_name, name, new_name)
     if result["status"] == "error":
         raise HTTPException(status_code=400, detail=result["message"])
     return result
@@ -93,7 +401,7 @@ async def delete_user(name: str):
     """
     Delete a registered user and all their face data.
     """
-    result = face_service.delete_user(name)
+    result = await run_in_threadpool(face_service.delete_user, name)
     if result["status"] == "error":
         raise HTTPException(status_code=404, detail=result["message"])
     return result
@@ -0,0 +1,104 @@
+import os
+
+# ─── Startup ────────────────────────────────────────────────────────
+# Load the models in the background as soon as the server starts (see /ready).
+# When off, they load on the first request that needs them.
+WARMUP_ON_STARTUP = os.environ.get("FACE_WARMUP_ON_STARTUP", "1") != "0"
+
+# ─── Models ─────────────────────────────────────────────────────────
+# InsightFace model pack: buffalo_l (most accurate), buffalo_s or buffalo_sc (smallest, CPU friendly)
+MODEL_PACK = os.environ.get("FACE_MODEL_PACK", "buffalo_l")
+# Model heads to load from the pack. Only detection and recognition are used;
+# the landmark and gender/age heads would just cost memory and load time.
+MODEL_MODULES = [m.strip() for m in os.environ.get("FACE_MODEL_MODULES", "detection,recognition").split(",") if m.strip()]
+
+# ─── Detection resolution ───────────────────────────────────────────
+# Default square detector input. Smaller is faster but misses small faces.
+DET_SIZE = int(os.environ.get("FACE_DET_SIZE", "640"))
+# Named presets accepted wherever a det_size can be given per request
+DET_PROFILES = {
+    "default": DET_SIZE,
+    # Close-up kiosk / door cameras: faces fill much of the frame
+    "kiosk": 320,
+    # Group photos and wide shots with many small faces
+    "crowd": 960,
+}
+
+# ─── Inference worker pool ──────────────────────────────────────────
+# ONNX Runtime releases the GIL while running a model, so a thread pool
+# gives parallel inference while sharing one gallery in memory.
+INFERENCE_WORKERS = int(os.environ.get("FACE_INFERENCE_WORKERS", "2"))
+# Requests allowed to wait for a free worker before new ones are rejected
+INFERENCE_QUEUE_SIZE = int(os.environ.get("FACE_INFERENCE_QUEUE_SIZE", "8"))
+# Seconds suggested to clients in the Retry-After header when the queue is full
+INFERENCE_RETRY_AFTER = int(os.environ.get("FACE_INFERENCE_RETRY_AFTER", "1"))
+
+# ─── /predict micro-batching ────────────────────────────────────────
+# Frames arriving within PREDICT_MAX_WAIT_MS of each other are analyzed as
+# one batch of at most PREDICT_MAX_BATCH images. Set PREDICT_MAX_BATCH=1 to disable.
+PREDICT_MAX_BATCH = int(os.environ.get("FACE_PREDICT_MAX_BATCH", "8"))
+PREDICT_MAX_WAIT_MS = float(os.environ.get("FACE_PREDICT_MAX_WAIT_MS", "5"))
+
+# ─── Gallery search ─────────────────────────────────────────────────
+# Nearest-neighbour index over the registered embeddings: "exact" (float32
+# brute force), "ivf" (inverted lists) or "quantized" (brute force over
+# compact codes). See backend/app/services/search_index.py.
+SEARCH_BACKEND = os.environ.get("FACE_SEARCH_BACKEND", "exact")
+# How the ivf / quantized index stores embeddings: float32, float16 or int8
+# (about 4x smaller than float32). Empty = the backend's default.
+SEARCH_CODEC = os.environ.get("FACE_SEARCH_CODEC", "")
+# Re-score an approximate index's candidates against the float32 embeddings
+SEARCH_RERANK = os.environ.get("FACE_SEARCH_RERANK", "1") != "0"
+# Search each person's centroid plus up to this many diverse exemplars instead
+# of every enrolled embedding (0 = off). All embeddings stay on disk, so
+# setting it back to 0 restores full matching.
+PROTOTYPES_PER_IDENTITY = int(os.environ.get("FACE_PROTOTYPES", "0"))
+
+# ─── WebSocket stream tracking ──────────────────────────────────────
+# Faces in /api/stream are tracked across frames and only re-embedded when a
+# track is new, every TRACK_REFRESH_FRAMES frames, or when the face gets clearer.
+STREAM_TRACKING = os.environ.get("FACE_STREAM_TRACKING", "1") != "0"
+TRACK_REFRESH_FRAMES = int(os.environ.get("FACE_TRACK_REFRESH_FRAMES", "15"))
+# Frames a track survives without a matching detection
+TRACK_MAX_MISSED = int(os.environ.get("FACE_TRACK_MAX_MISSED", "5"))
+
+# ─── Thumbnails ─────────────────────────────────────────────────────
+# Encoded thumbnails kept in memory by /api/users/{name}/thumbnail
+THUMBNAIL_CACHE_SIZE = int(os.environ.get("FACE_THUMBNAIL_CACHE_SIZE", "1024"))
+
+# ─── Embedding cache ────────────────────────────────────────────────
+# Detection + embedding outputs of re-sent images, keyed by a hash of the bytes
+# (entries, 0 = off; total megabytes; seconds an entry stays valid)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("FACE_EMBEDDING_CACHE_SIZE", "1024"))
+EMBEDDING_CACHE_BYTES = int(float(os.environ.get("FACE_EMBEDDING_CACHE_MB", "64")) * 1024 * 1024)
+EMBEDDING_CACHE_TTL = float(os.environ.get("FACE_EMBEDDING_CACHE_TTL", "600"))
+
+# ─── User listing ───────────────────────────────────────────────────
+# Default and largest page size of /api/users
+USERS_PAGE_SIZE = int(os.environ.get("FACE_USERS_PAGE_SIZE", "50"))
+USERS_MAX_PAGE_SIZE = int(os.environ.get("FACE_USERS_MAX_PAGE_SIZE", "500"))
+
+# ─── Bulk enrollment ────────────────────────────────────────────────
+# Images decoded and detected concurrently, and crops embedded (and persisted) per batch
+ENROLL_WORKERS = int(os.environ.get("FACE_ENROLL_WORKERS", str(min(8, os.cpu_count() or 1))))
+ENROLL_BATCH_SIZE = int(os.environ.get("FACE_ENROLL_BATCH_SIZE", "32"))
+# Larger archive members are skipped as failures
+ENROLL_MAX_IMAGE_BYTES = int(os.environ.get("FACE_ENROLL_MAX_IMAGE_BYTES", str(20 * 1024 * 1024)))
+# Server directory /api/register/bulk may import folders from (unset = folder import disabled)
+ENROLL_IMPORT_ROOT = os.environ.get("FACE_ENROLL_IMPORT_ROOT") or None
+
+# ─── Batch prediction (/api/predict/batch) ──────────────────────────
+# Images decoded and detected concurrently, then recognized together, per
+# batch; each batch's results are streamed back before the next one starts
+BATCH_PREDICT_WORKERS = int(os.environ.get("FACE_BATCH_PREDICT_WORKERS", str(ENROLL_WORKERS)))
+BATCH_PREDICT_SIZE = int(os.environ.get("FACE_BATCH_PREDICT_SIZE", "16"))
+
+# ─── Metrics ────────────────────────────────────────────────────────
+# Add a Server-Timing header with per-stage durations to every HTTP response
+DEBUG_TIMING_HEADER = os.environ.get("FACE_DEBUG_TIMING", "0") != "0"
+
+# ─── Multi-process serving (backend/serve.py) ───────────────────────
+# Seconds between checks for gallery changes written by other worker processes (0 = off)
+GALLERY_SYNC_INTERVAL = float(os.environ.get("FACE_GALLERY_SYNC_INTERVAL", "0"))
+# Intra-op threads per ONNX Runtime session (0 = runtime default, i.e. all cores)
+ORT_INTRA_OP_THREADS = int(os.environ.get("FACE_ORT_THREADS", "0"))
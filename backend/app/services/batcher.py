@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+from backend.app.services import metrics
+from backend.app.services.inference_pool import InferencePool
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent requests into batches for one blocking batch function.
+
+    Items submitted within `max_wait_ms` of the first waiting item are grouped,
+    up to `max_batch` items, and `process_batch(items) -> results` runs once
+    for the whole group on the inference pool. Each caller gets back the
+    result at its own position. `max_batch=1` disables coalescing.
+
+    Raising latency budget (max_wait_ms) buys larger batches and throughput.
+    Stage timings of a batch are copied into the trace of every request in
+    it, along with its wait for the batch ("batch_wait") and the batch size.
+    """
+
+    def __init__(self, process_batch, pool: InferencePool, max_batch: int = 8, max_wait_ms: float = 5.0):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.process_batch = process_batch
+        self.pool = pool
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+
+        # (item, future, caller's trace, submit time)
+        self._waiting: list[tuple[object, asyncio.Future, dict | None, float]] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    @property
+    def pending(self) -> int:
+        """Items waiting for their batch to be dispatched."""
+        return len(self._waiting)
+
+    async def submit(self, item):
+        """Queue `item` for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiting.append((item, future, metrics.current_trace(), time.perf_counter()))
+
+        if len(self._waiting) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiting:
+            batch = self._waiting[:self.max_batch]
+            del self._waiting[:self.max_batch]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[object, asyncio.Future, dict | None, float]]):
+        items = [item for item, _, _, _ in batch]
+        started = time.perf_counter()
+        for _, _, _, submitted in batch:
+            metrics.STAGE_SECONDS.observe(started - submitted, stage="batch_wait")
+        # This task runs in its own context: collect the batch's stages here
+        batch_trace = metrics.start_trace()
+        try:
+            results = await self.pool.run(self.process_batch, items)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, trace, submitted), result in zip(batch, results):
+            if trace is not None:
+                trace["batch_wait"] = started - submitted
+                trace.update(batch_trace)
+                trace["batch_size"] = len(batch)
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,145 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.app.services.gallery import EMBEDDING_DIM
+
+# Rough per-entry bookkeeping cost (key, tuple, OrderedDict node) counted towards max_bytes
+_ENTRY_OVERHEAD = 256
+
+
+class CachedFaces:
+    """
+    Detection and embedding outputs for one image: per-face bbox, keypoints,
+    detection score and embedding, in original image coordinates.
+    `complete` is False when only some faces were embedded (registration
+    embeds just the largest one); analysis needs every face.
+    Arrays are read-only since they are shared by every cache hit.
+    """
+
+    def __init__(self, bboxes: np.ndarray, kpss: np.ndarray | None, scores: np.ndarray,
+                 embeddings: np.ndarray, complete: bool):
+        self.bboxes = bboxes
+        self.kpss = kpss
+        self.scores = scores
+        self.embeddings = embeddings
+        self.complete = complete
+        for array in (bboxes, kpss, scores, embeddings):
+            if array is not None:
+                array.flags.writeable = False
+
+    @classmethod
+    def from_faces(cls, faces: list, complete: bool = True, dim: int = EMBEDDING_DIM) -> "CachedFaces":
+        """Capture faces that all carry an embedding; `dim` shapes the empty entry of a face-less image."""
+        kps = [face.kps for face in faces]
+        embeddings = (np.array([face.embedding for face in faces], dtype=np.float32) if faces
+                      else np.empty((0, dim), dtype=np.float32))
+        return cls(
+            bboxes=np.array([face.bbox for face in faces], dtype=np.float32).reshape(-1, 4),
+            kpss=np.array(kps, dtype=np.float32) if faces and all(k is not None for k in kps) else None,
+            scores=np.array([face.det_score for face in faces], dtype=np.float32),
+            embeddings=embeddings,
+            complete=complete,
+        )
+
+    def __len__(self) -> int:
+        return len(self.bboxes)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.bboxes, self.kpss, self.scores, self.embeddings)
+        return sum(a.nbytes for a in arrays if a is not None) + _ENTRY_OVERHEAD
+
+
+class EmbeddingCache:
+    """
+    LRU of CachedFaces keyed by a hash of the raw image bytes (and the
+    detection size), so a re-sent image skips decoding, detection and
+    recognition. Gallery matching is not cached: it runs on every request
+    against the current gallery.
+
+    Bounded by entry count and total bytes; entries older than `ttl`
+    seconds are treated as misses. `max_entries=0` disables the cache.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        # key -> (stored at, CachedFaces)
+        self._entries: OrderedDict[bytes, tuple[float, CachedFaces]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def key(image_bytes: bytes, det_size: int) -> bytes:
+        """128-bit BLAKE2b digest of the image bytes and detection size."""
+        digest = hashlib.blake2b(image_bytes, digest_size=16)
+        digest.update(det_size.to_bytes(4, 'little'))
+        return digest.digest()
+
+    def get(self, key: bytes, complete: bool = False) -> CachedFaces | None:
+        """Cached outputs for `key`, or None. With `complete`, partial entries count as misses."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and time.monotonic() - item[0] > self.ttl:
+                self._discard(key)
+                item = None
+            if item is None or (complete and not item[1].complete):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: bytes, faces: CachedFaces):
+        if not self.enabled or faces.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None:
+                # Never replace a complete entry by a partial one
+                if current[1].complete and not faces.complete:
+                    return
+                self._discard(key)
+            self._entries[key] = (time.monotonic(), faces)
+            self.nbytes += faces.nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._discard(oldest)
+                self.evictions += 1
+
+    def _discard(self, key: bytes):
+        _, faces = self._entries.pop(key)
+        self.nbytes -= faces.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self.nbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,472 @@
+import numpy as np
+import os
+import json
+import pickle
+import struct
+import threading
+import zlib
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from backend.app.services.gallery import GalleryIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+# Snapshot = label/offset table (JSON) + flat float32 matrix (.npy, opened with np.memmap).
+# The table is written last and names the matrix file, so it is the commit point.
+SNAPSHOT_TABLE = "faces_snapshot.json"
+SNAPSHOT_MATRIX = "faces_snapshot.{generation}.npy"
+LOG_FILE = "faces.log"
+# Suffix of snapshot and log files set aside by EmbeddingStore.reset after a failed load
+CORRUPT_SUFFIX = ".corrupt"
+# Advisory lock file serializing log appends and compaction across worker processes
+LOCK_FILE = "faces.lock"
+
+# Log layout: header (magic + generation), then records of
+#   op (u8) | payload length (u32) | payload | crc32 of the preceding bytes (u32)
+LOG_MAGIC = b"FACELOG1"
+_HEADER = struct.Struct("<8sQ")
+_RECORD_HEAD = struct.Struct("<BI")
+_CRC = struct.Struct("<I")
+
+OP_ADD = 1
+OP_REMOVE = 2
+OP_RENAME = 3
+
+# Compact the log into a new snapshot after this many records
+DEFAULT_COMPACT_EVERY = 500
+
+
+def atomic_write(path: str, data: bytes, fsync: bool = True):
+    """Write `data` to `path` via a temp file and rename, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def atomic_save_npy(path: str, array: np.ndarray, fsync: bool = True):
+    """np.save() with the same temp file + rename guarantee as atomic_write."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _pack_str(value: str) -> bytes:
+    raw = value.encode('utf-8')
+    return struct.pack("<H", len(raw)) + raw
+
+
+def _unpack_str(payload: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("<H", payload, offset)
+    offset += 2
+    return payload[offset:offset + length].decode('utf-8'), offset + length
+
+
+# Metadata entries are replaced rather than mutated, so an indexing mapping (UserIndex) sees every change
+
+def apply_add(gallery: GalleryIndex, meta: dict, name: str, embedding: np.ndarray, timestamp: str):
+    gallery.add(name, embedding)
+    entry = dict(meta.get(name) or {"created_at": timestamp})
+    entry["image_count"] = gallery.count(name)
+    entry["updated_at"] = timestamp
+    meta[name] = entry
+
+
+def apply_remove(gallery: GalleryIndex, meta: dict, name: str):
+    gallery.remove(name)
+    meta.pop(name, None)
+
+
+def apply_rename(gallery: GalleryIndex, meta: dict, old_name: str, new_name: str, timestamp: str):
+    if old_name not in gallery:
+        return
+    gallery.rename(old_name, new_name)
+    if old_name in meta:
+        entry = dict(meta.pop(old_name))
+        entry["updated_at"] = timestamp
+        meta[new_name] = entry
+
+
+class EmbeddingStore:
+    """
+    Durable storage for registered embeddings and their metadata.
+
+    State on disk is a snapshot plus an append-only binary log of add,
+    remove and rename records, so an enrollment costs one small append
+    instead of rewriting the whole gallery. Every `compact_every` records
+    the log is folded into a new snapshot.
+
+    The snapshot matrix holds L2-normalized embeddings grouped by identity
+    and is opened with np.memmap: startup does not copy embeddings into the
+    heap, and several worker processes share one page-cache copy. The
+    GalleryIndex only copies the matrix once it is first modified.
+
+    The store owns the gallery and metadata it loaded: `add`, `remove` and
+    `rename` append a record and then apply it, the same way replay does.
+
+    Several processes may share one data directory. Appends and compaction
+    hold an advisory lock file, each process first catches up with records
+    written by the others, and `sync()` (cheap when nothing changed: a few
+    stat calls) pulls in their changes between writes. A new snapshot table
+    or log file means another process compacted, and triggers a reload.
+
+    Crash safety:
+      - the snapshot and fresh logs are written atomically (temp file + rename)
+      - every record carries a CRC; a torn record at the end of the log is
+        dropped on replay
+      - the snapshot and log share a generation number, so a log that was
+        already folded into the snapshot is never replayed twice
+    """
+
+    def __init__(self, data_dir: str, legacy_faces_file: str | None = None,
+                 legacy_meta_file: str | None = None, compact_every: int = DEFAULT_COMPACT_EVERY,
+                 fsync: bool = True):
+        self.data_dir = data_dir
+        self.table_path = os.path.join(data_dir, SNAPSHOT_TABLE)
+        self.log_path = os.path.join(data_dir, LOG_FILE)
+        self.lock_path = os.path.join(data_dir, LOCK_FILE)
+        self.legacy_faces_file = legacy_faces_file
+        self.legacy_meta_file = legacy_meta_file
+        self.compact_every = compact_every
+        self.fsync = fsync
+
+        self.generation = 0
+        self.log_records = 0
+        self._log = None
+        # Bytes of the log already applied to the gallery
+        self._log_offset = 0
+        # Identity of the snapshot table we loaded, to notice compaction by another process
+        self._table_signature = None
+
+        self._gallery: GalleryIndex | None = None
+        self._meta: dict[str, dict] = {}
+
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+    @contextmanager
+    def _exclusive(self):
+        """Thread lock plus the cross-process lock file (re-entrant)."""
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if self._lock_depth == 1 and fcntl is not None:
+                    if self._lock_file is None:
+                        self._lock_file = open(self.lock_path, 'a')
+                    fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                yield
+            finally:
+                if self._lock_depth == 1 and fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                self._lock_depth -= 1
+
+    @staticmethod
+    def _signature(path: str):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    # ─── Loading ────────────────────────────────────────────────────
+
+    def load(self, gallery: GalleryIndex, meta: MutableMapping | None = None) -> MutableMapping:
+        """
+        Fill `gallery` from the snapshot, replay the log on top of it and
+        open the log for appending. Returns the metadata {name: {...}},
+        which the store keeps up to date from then on. Pass `meta` to have
+        it filled instead of a new dict (e.g. a UserIndex).
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._gallery = gallery
+        self._meta = meta if meta is not None else {}
+        with self._exclusive():
+            self._reset_meta(self._load_state())
+        return self._meta
+
+    def reset(self, gallery: GalleryIndex, meta: MutableMapping | None = None) -> MutableMapping:
+        """
+        Start an empty store after `load` failed: the snapshot and log are
+        renamed with CORRUPT_SUFFIX (kept for recovery; earlier ones are not
+        overwritten) and a fresh log is opened. Returns the metadata
+        mapping, as `load` does.
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._gallery = gallery
+        self._meta = meta if meta is not None else {}
+        with self._exclusive():
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            for file in os.listdir(self.data_dir):
+                if file in (SNAPSHOT_TABLE, LOG_FILE) or (file.startswith("faces_snapshot.") and file.endswith(".npy")):
+                    path = os.path.join(self.data_dir, file)
+                    target, n = path + CORRUPT_SUFFIX, 1
+                    while os.path.exists(target):
+                        target, n = f"{path}.{n}{CORRUPT_SUFFIX}", n + 1
+                    os.replace(path, target)
+            gallery.clear()
+            self._table_signature = None
+            self.generation = 0
+            self.log_records = 0
+            self._write_empty_log()
+            self._log = open(self.log_path, 'ab')
+            self._reset_meta({})
+        return self._meta
+
+    def _reset_meta(self, loaded: dict):
+        self._meta.clear()
+        self._meta.update(loaded)
+
+    def _load_state(self) -> dict[str, dict]:
+        # Replay into a plain dict; the caller swaps it into the store's mapping in one go
+        meta = self._load_snapshot(self._gallery)
+
+        replayed = self._replay(self._gallery, meta)
+        if replayed is None:
+            # Missing, foreign or stale log: start a fresh one for this generation
+            self._write_empty_log()
+            self.log_records = 0
+        else:
+            self.log_records = replayed
+
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, 'ab')
+        return meta
+
+    def _matrix_path(self, generation: int) -> str:
+        return os.path.join(self.data_dir, SNAPSHOT_MATRIX.format(generation=generation))
+
+    def _load_snapshot(self, gallery: GalleryIndex) -> dict[str, dict]:
+        self._table_signature = self._signature(self.table_path)
+        if self._table_signature is not None:
+            with open(self.table_path, 'r', encoding='utf-8') as f:
+                table = json.load(f)
+            self.generation = table["generation"]
+            matrix = np.load(self._matrix_path(self.generation), mmap_mode='r')
+            names = [entry["name"] for entry in table["identities"]]
+            counts = [entry["count"] for entry in table["identities"]]
+            gallery.load_snapshot(matrix, names, counts)
+            return {entry["name"]: entry["meta"] for entry in table["identities"]}
+
+        # First start after upgrading: import the legacy pickle + JSON files
+        gallery.clear()
+        meta = {}
+        if self.legacy_faces_file and os.path.exists(self.legacy_faces_file):
+            with open(self.legacy_faces_file, 'rb') as f:
+                for name, embeddings in pickle.load(f).items():
+                    if len(embeddings):
+                        gallery.add(name, np.stack(embeddings))
+        if self.legacy_meta_file and os.path.exists(self.legacy_meta_file):
+            with open(self.legacy_meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        self.generation = 0
+        return meta
+
+    def _replay(self, gallery: GalleryIndex, meta: dict) -> int | None:
+        """Apply log records to (gallery, meta). Returns the record count, or None if the log is unusable."""
+        if not os.path.exists(self.log_path):
+            return None
+
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            return None
+        magic, generation = _HEADER.unpack_from(data, 0)
+        if magic != LOG_MAGIC or generation != self.generation:
+            return None
+
+        count, consumed = self._apply_records(data[_HEADER.size:], gallery, meta)
+        offset = _HEADER.size + consumed
+        if offset < len(data):
+            # Safe to cut: writers hold the lock file while appending
+            print(f"Discarding {len(data) - offset} bytes of incomplete log records.")
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(offset)
+        self._log_offset = offset
+        return count
+
+    def _apply_records(self, data: bytes, gallery: GalleryIndex, meta: dict) -> tuple[int, int]:
+        """Apply every complete, valid record in `data`. Returns (records applied, bytes consumed)."""
+        offset = 0
+        count = 0
+        while offset + _RECORD_HEAD.size <= len(data):
+            op, length = _RECORD_HEAD.unpack_from(data, offset)
+            end = offset + _RECORD_HEAD.size + length
+            if end + _CRC.size > len(data):
+                break
+            (crc,) = _CRC.unpack_from(data, end)
+            if crc != zlib.crc32(data[offset:end]):
+                break
+            self._apply(op, data[offset + _RECORD_HEAD.size:end], gallery, meta)
+            offset = end + _CRC.size
+            count += 1
+        return count, offset
+
+    @staticmethod
+    def _apply(op: int, payload: bytes, gallery: GalleryIndex, meta: dict):
+        if op == OP_ADD:
+            name, offset = _unpack_str(payload, 0)
+            timestamp, offset = _unpack_str(payload, offset)
+            (dim,) = struct.unpack_from("<H", payload, offset)
+            embedding = np.frombuffer(payload, dtype=np.float32, count=dim, offset=offset + 2).copy()
+            apply_add(gallery, meta, name, embedding, timestamp)
+        elif op == OP_REMOVE:
+            name, _ = _unpack_str(payload, 0)
+            apply_remove(gallery, meta, name)
+        elif op == OP_RENAME:
+            old_name, offset = _unpack_str(payload, 0)
+            new_name, offset = _unpack_str(payload, offset)
+            timestamp, _ = _unpack_str(payload, offset)
+            apply_rename(gallery, meta, old_name, new_name, timestamp)
+
+    # ─── Following other processes ──────────────────────────────────
+
+    def _replaced_elsewhere(self) -> bool:
+        """True if another process wrote a new snapshot table or log file (i.e. compacted)."""
+        if self._signature(self.table_path) != self._table_signature:
+            return True
+        try:
+            return os.stat(self.log_path).st_ino != os.fstat(self._log.fileno()).st_ino
+        except FileNotFoundError:
+            return True
+
+    def _changed_elsewhere(self) -> bool:
+        return self._replaced_elsewhere() or os.path.getsize(self.log_path) != self._log_offset
+
+    def _catch_up(self) -> bool:
+        """Apply changes made by other processes. Caller holds the exclusive lock."""
+        if self._replaced_elsewhere():
+            # Another process compacted: load its snapshot and fresh log
+            self._reset_meta(self._load_state())
+            return True
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        if not data:
+            return False
+        count, consumed = self._apply_records(data, self._gallery, self._meta)
+        self._log_offset += consumed
+        self.log_records += count
+        return count > 0
+
+    def sync(self) -> bool:
+        """Pick up changes written by other processes. Returns True if anything changed."""
+        if self._gallery is None or not self._changed_elsewhere():
+            return False
+        with self._exclusive():
+            return self._catch_up()
+
+    # ─── Changes ────────────────────────────────────────────────────
+
+    def _commit(self, op: int, payload: bytes):
+        """Append one record, after catching up with other writers, then apply it."""
+        self._commit_many([(op, payload)])
+
+    def _commit_many(self, ops: list[tuple[int, bytes]]):
+        """Append several records with a single write and fsync, then apply them in order."""
+        records = []
+        for op, payload in ops:
+            record = _RECORD_HEAD.pack(op, len(payload)) + payload
+            records.append(record + _CRC.pack(zlib.crc32(record)))
+        data = b"".join(records)
+        with self._exclusive():
+            if self._changed_elsewhere():
+                self._catch_up()
+            self._log.write(data)
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._log_offset += len(data)
+            self.log_records += len(ops)
+            for op, payload in ops:
+                self._apply(op, payload, self._gallery, self._meta)
+
+    @staticmethod
+    def _add_payload(name: str, embedding: np.ndarray, timestamp: str) -> bytes:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        payload = _pack_str(name) + _pack_str(timestamp) + struct.pack("<H", embedding.size)
+        return payload + embedding.tobytes()
+
+    def add(self, name: str, embedding: np.ndarray, timestamp: str):
+        self._commit(OP_ADD, self._add_payload(name, embedding, timestamp))
+
+    def add_many(self, entries: list[tuple[str, np.ndarray, str]]):
+        """Add (name, embedding, timestamp) entries as one durable append (one fsync for the batch)."""
+        if entries:
+            self._commit_many([(OP_ADD, self._add_payload(*entry)) for entry in entries])
+
+    def remove(self, name: str):
+        self._commit(OP_REMOVE, _pack_str(name))
+
+    def rename(self, old_name: str, new_name: str, timestamp: str):
+        self._commit(OP_RENAME, _pack_str(old_name) + _pack_str(new_name) + _pack_str(timestamp))
+
+    # ─── Compaction ─────────────────────────────────────────────────
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.log_records >= self.compact_every
+
+    def _write_empty_log(self):
+        atomic_write(self.log_path, _HEADER.pack(LOG_MAGIC, self.generation), self.fsync)
+        self._log_offset = _HEADER.size
+
+    def compact(self):
+        """Write the full state as a new snapshot and start an empty log."""
+        with self._exclusive():
+            if self._changed_elsewhere():
+                self._catch_up()
+
+            generation = self.generation + 1
+            matrix, names, counts = self._gallery.grouped_rows()
+
+            atomic_save_npy(self._matrix_path(generation), matrix, self.fsync)
+            table = {
+                "generation": generation,
+                "dim": self._gallery.dim,
+                "identities": [
+                    {"name": name, "offset": int(offset), "count": int(count), "meta": self._meta.get(name, {})}
+                    for name, offset, count in zip(names, np.r_[0, np.cumsum(counts)[:-1]], counts)
+                ],
+            }
+            atomic_write(self.table_path, json.dumps(table, ensure_ascii=False).encode('utf-8'), self.fsync)
+            self._table_signature = self._signature(self.table_path)
+
+            # The old log now has a stale generation and is ignored even if the swap below never happens
+            previous = self.generation
+            self.generation = generation
+            if self._log is not None:
+                self._log.close()
+            self._write_empty_log()
+            self._log = open(self.log_path, 'ab')
+            self.log_records = 0
+
+            # Other processes may still have the old matrix mapped; on POSIX unlinking is safe
+            old_matrix = self._matrix_path(previous)
+            if os.path.exists(old_matrix):
+                try:
+                    os.remove(old_matrix)
+                except OSError:
+                    pass
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,144 @@
+import os
+import tarfile
+import unicodedata
+import zipfile
+from typing import BinaryIO, Callable, Container, Iterator
+
+# File types accepted by bulk enrollment
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+# Zip flag marking UTF-8 member names; archives made without it (e.g. by
+# Windows Explorer) store names in a legacy code page instead
+_ZIP_UTF8_FLAG = 0x800
+
+
+class SkippedImage(Exception):
+    """An archive member that is an image but cannot be enrolled (e.g. too large)."""
+
+
+def identity_of(path: str) -> str | None:
+    """
+    Person name for an image at `.../name/photo.jpg`: its parent directory.
+    Returns None for non-images, files without a parent directory and
+    hidden or macOS metadata entries. Names are NFC-normalized, since
+    macOS writes decomposed Hangul in file names.
+    """
+    parts = _image_parts(path)
+    if parts is None or len(parts) < 2:
+        return None
+    return unicodedata.normalize("NFC", parts[-2]).strip() or None
+
+
+def image_path(path: str) -> str | None:
+    """
+    `path` itself (NFC-normalized) if it is an image at any depth, else None.
+    Hidden and macOS metadata entries are skipped as by identity_of.
+    """
+    parts = _image_parts(path)
+    return None if parts is None else unicodedata.normalize("NFC", "/".join(parts))
+
+
+def _image_parts(path: str) -> list[str] | None:
+    parts = [p for p in path.replace("\\", "/").split("/") if p and p != "."]
+    if not parts or not parts[-1].lower().endswith(IMAGE_EXTENSIONS):
+        return None
+    if any(p.startswith(".") or p == "__MACOSX" for p in parts):
+        return None
+    return parts
+
+
+def _zip_member_name(info: zipfile.ZipInfo) -> str:
+    if info.flag_bits & _ZIP_UTF8_FLAG:
+        return info.filename
+    # zipfile decoded the raw bytes as cp437; recover UTF-8 or Korean cp949 names
+    raw = info.filename.encode('cp437', errors='replace')
+    for encoding in ('utf-8', 'cp949'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return info.filename
+
+
+def iter_archive(fileobj: BinaryIO, max_bytes: int,
+                 label: Callable[[str], str | None] = identity_of) -> Iterator[tuple[str, str, bytes | SkippedImage]]:
+    """
+    Yield (name, member path, image bytes) for every `name/*.jpg` in a zip
+    or tar(.gz/.bz2/.xz) archive, reading one member at a time. Members
+    over `max_bytes` yield a SkippedImage instead of bytes.
+    `label` maps a member path to its name, or None to skip the member
+    (e.g. image_path to take every image regardless of layout).
+    Raises ValueError if `fileobj` is neither a zip nor a tar archive.
+    """
+    if zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                path = _zip_member_name(info)
+                name = label(path)
+                if name is None:
+                    continue
+                if info.file_size > max_bytes:
+                    yield name, path, SkippedImage(f"Image larger than {max_bytes} bytes")
+                    continue
+                yield name, path, archive.read(info)
+        return
+
+    fileobj.seek(0)
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode="r:*")
+    except tarfile.TarError:
+        raise ValueError("Unsupported archive; expected a .zip or .tar(.gz) file")
+    with archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            name = label(member.name)
+            if name is None:
+                continue
+            if member.size > max_bytes:
+                yield name, member.name, SkippedImage(f"Image larger than {max_bytes} bytes")
+                continue
+            f = archive.extractfile(member)
+            if f is not None:
+                yield name, member.name, f.read()
+
+
+def iter_folder(root: str, max_bytes: int,
+                skip: Container[str] = ()) -> Iterator[tuple[str, str, bytes | SkippedImage]]:
+    """
+    Yield (name, relative path, image bytes) for every `root/**/name/*.jpg`,
+    in sorted order. Relative paths in `skip` are not read (e.g. to resume).
+    """
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(directory, filename)
+            relative = os.path.relpath(path, root)
+            name = identity_of(relative)
+            if name is None or relative in skip:
+                continue
+            if os.path.getsize(path) > max_bytes:
+                yield name, relative, SkippedImage(f"Image larger than {max_bytes} bytes")
+                continue
+            with open(path, 'rb') as f:
+                yield name, relative, f.read()
+
+
+def resolve_import_folder(root: str | None, folder: str) -> str:
+    """
+    Absolute path of `folder` inside the allowed import `root`.
+    Raises ValueError when folder import is disabled, the folder escapes
+    `root` or does not exist.
+    """
+    if not root:
+        raise ValueError("Folder import is disabled (set FACE_ENROLL_IMPORT_ROOT)")
+    base = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(base, folder))
+    if os.path.commonpath([base, path]) != base:
+        raise ValueError("Folder must be inside the import root")
+    if not os.path.isdir(path):
+        raise ValueError(f"Folder '{folder}' not found")
+    return path
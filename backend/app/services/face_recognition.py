@@ -1,70 +1,264 @@
 import numpy as np
 import cv2
-import pickle
 import os
-import json
-import base64
-from insightface.app import FaceAnalysis
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import BinaryIO, TYPE_CHECKING
+from backend.app import config
+from backend.app.services import metrics
+from backend.app.services.embedding_cache import CachedFaces, EmbeddingCache
+from backend.app.services.embedding_store import CORRUPT_SUFFIX, EmbeddingStore, atomic_write
+from backend.app.services.enrollment import (
+    SkippedImage, image_path, iter_archive, iter_folder, resolve_import_folder
+)
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.image_io import decode_for_detection, decode_image
+from backend.app.services.matcher import BatchMatcher
+from backend.app.services.prototypes import PrototypeIndex
+from backend.app.services.search_index import CODEC_BACKENDS, make_backend
+from backend.app.services.thumbnail_cache import ThumbnailCache
+from backend.app.services.tracker import FaceTracker, face_quality
+from backend.app.services.user_index import UserIndex
+
+if TYPE_CHECKING:
+    from insightface.app import FaceAnalysis
+    from insightface.app.common import Face
 
 # Data directory for storing registered faces
 DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data")
+# Pre-snapshot storage files, imported once by EmbeddingStore on first start
 DATA_FILE = os.path.join(DATA_DIR, "registered_faces.pkl")
 META_FILE = os.path.join(DATA_DIR, "faces_meta.json")
 THUMB_DIR = os.path.join(DATA_DIR, "thumbnails")
 
+# Minimum cosine similarity for a face to be identified as a registered user
+MATCH_THRESHOLD = 0.4
+
+# Model heads the pipeline calls directly (see detect_faces / embed_faces)
+REQUIRED_MODULES = ("detection", "recognition")
+
+
+def resolve_det_size(det_size: int | str | None) -> int:
+    """
+    Detection input size from a pixel count, a profile name from
+    config.DET_PROFILES (e.g. "kiosk"), or None for config.DET_SIZE.
+    """
+    if det_size is None or det_size == "":
+        return config.DET_SIZE
+    if isinstance(det_size, str) and not det_size.isdigit():
+        if det_size not in config.DET_PROFILES:
+            raise ValueError(f"Unknown detection profile '{det_size}', expected one of {list(config.DET_PROFILES)}")
+        return config.DET_PROFILES[det_size]
+    size = int(det_size)
+    # The detector's feature strides need the input to be a multiple of 32
+    if size % 32 or not 128 <= size <= 1920:
+        raise ValueError("det_size must be a multiple of 32 between 128 and 1920")
+    return size
+
 
 class FaceRecognitionService:
-    def __init__(self, use_gpu: bool = False):
+    def __init__(self, use_gpu: bool = False, aggregation: str = "max", top_k: int = 3,
+                 search_backend: str = "exact", search_params: dict | None = None, search_rerank: bool = True,
+                 prototypes: int = 0, model_pack: str | None = None, allowed_modules: list[str] | None = None,
+                 data_dir: str | None = None):
+        # Models and the gallery are loaded on first use or by warmup(), so
+        # importing this module stays cheap and has no side effects on disk
+        self.use_gpu = use_gpu
+        # InsightFace pack name and the heads to load from it
+        self.model_pack = model_pack or config.MODEL_PACK
+        self.allowed_modules = list(allowed_modules or config.MODEL_MODULES)
+        missing = [m for m in REQUIRED_MODULES if m not in self.allowed_modules]
+        if missing:
+            raise ValueError(f"allowed_modules must include {missing}")
+        self._app: "FaceAnalysis | None" = None
+        self._model_lock = threading.Lock()
+        self._gallery_loaded = False
+        # Seconds spent loading each component, reported by the readiness endpoint
+        self.startup_timings: dict[str, float] = {}
+        self.load_error: str | None = None
+        # Set when the stored gallery could not be read and the store was reset (see load_faces)
+        self.gallery_error: str | None = None
+
+        # Metadata: {name: {"image_count": int, "created_at": str, ...}}, indexed for /users listing
+        self.faces_meta = UserIndex()
+        # Registered faces as one pre-normalized embedding matrix, used for matching
+        self.gallery = GalleryIndex()
+        # How per-sample similarities are reduced per identity ("max", "mean" or "topk")
+        self.aggregation = aggregation
+        self.top_k = top_k
+        # Nearest-neighbour backend for the gallery ("exact", "ivf" or "quantized", see search_index.py)
+        self.search_backend = search_backend
+        self.search_params = search_params or {}
+        # Fail here rather than on every gallery load
+        make_backend(search_backend, **self.search_params)
+        # Re-score an approximate backend's candidates with the float32 embeddings
+        self.search_rerank = search_rerank
+        # Match against a centroid + this many exemplars per identity instead of every embedding (0 = off)
+        self.prototypes = prototypes
+        self.prototype_index: PrototypeIndex | None = None
+        self.matcher = BatchMatcher(self.gallery, aggregation, top_k, rerank=search_rerank)
+        # Guards the gallery and metadata: inference runs on several pool threads
+        self._lock = threading.RLock()
+        # Snapshot + append-only log of embedding changes. The pre-snapshot files
+        # are only imported into the default data directory.
+        self.data_dir = data_dir or DATA_DIR
+        legacy_files = {} if data_dir else {"legacy_faces_file": DATA_FILE, "legacy_meta_file": META_FILE}
+        self.store = EmbeddingStore(self.data_dir, **legacy_files)
+        # Encoded thumbnails served by /users/{name}/thumbnail
+        thumb_dir = os.path.join(data_dir, "thumbnails") if data_dir else THUMB_DIR
+        self.thumbnails = ThumbnailCache(thumb_dir, config.THUMBNAIL_CACHE_SIZE)
+        # Detection + embedding outputs of recently seen images, keyed by content hash
+        self.embedding_cache = EmbeddingCache(config.EMBEDDING_CACHE_SIZE, config.EMBEDDING_CACHE_BYTES,
+                                              config.EMBEDDING_CACHE_TTL)
+
+    # ─── Lazy initialization ───────────────────────────────────────
+
+    @property
+    def app(self) -> "FaceAnalysis":
+        """The InsightFace model pack, loaded on first access."""
+        if self._app is None:
+            with self._model_lock:
+                if self._app is None:
+                    self._app = self._load_models()
+        return self._app
+
+    def _load_models(self) -> "FaceAnalysis":
+        # Imported here: insightface and onnxruntime alone take most of a second to import
+        import onnxruntime
+        from insightface.app import FaceAnalysis
+
+        started = time.perf_counter()
         providers = ['CPUExecutionProvider']
+        model_kwargs = {}
+        if config.ORT_INTRA_OP_THREADS > 0:
+            # Several worker processes share the CPU: cap each ONNX session's threads
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = config.ORT_INTRA_OP_THREADS
+            model_kwargs["sess_options"] = session_options
+        app = FaceAnalysis(name=self.model_pack, allowed_modules=self.allowed_modules,
+                           providers=providers, **model_kwargs)
+        app.prepare(ctx_id=0, det_size=(config.DET_SIZE, config.DET_SIZE))
+        self.startup_timings["models"] = time.perf_counter() - started
+        print(f"Loaded {self.model_pack} ({', '.join(sorted(app.models))}) "
+              f"in {self.startup_timings['models']:.2f}s.")
+        return app
+
+    def _ensure_gallery(self):
+        """Load the registered faces the first time they are needed."""
+        if self._gallery_loaded:
+            return
+        with self._lock:
+            if self._gallery_loaded:
+                return
+            started = time.perf_counter()
+            os.makedirs(self.data_dir, exist_ok=True)
+            os.makedirs(self.thumbnails.thumb_dir, exist_ok=True)
+            self.load_faces()
+            self.startup_timings["gallery"] = time.perf_counter() - started
+            self._gallery_loaded = True
+
+        # Follow registrations made by other worker processes (see backend/serve.py)
+        if config.GALLERY_SYNC_INTERVAL > 0:
+            threading.Thread(target=self._sync_loop, name="gallery-sync", daemon=True).start()
+
+    def warmup(self) -> bool:
+        """
+        Load the gallery and the models now instead of on the first request,
+        and run one dummy frame through the detector. Returns True when ready.
+        """
+        try:
+            self._ensure_gallery()
+            self.app  # property access loads the models
+            started = time.perf_counter()
+            self.detect_faces(np.zeros((config.DET_SIZE, config.DET_SIZE, 3), dtype=np.uint8))
+            self.startup_timings["first_inference"] = time.perf_counter() - started
+            self.load_error = None
+            return True
+        except Exception as e:
+            print(f"Error warming up face models: {e}")
+            self.load_error = str(e)
+            return False
 
-        # Initialize FaceAnalysis app
-        self.app = FaceAnalysis(name='buffalo_l', providers=providers)
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
-
-        # In-memory storage for registered faces {name: [embedding1, embedding2, ...]}
-        self.registered_faces: dict[str, list[np.ndarray]] = {}
-        # Metadata: {name: {"image_count": int, "created_at": str, ...}}
-        self.faces_meta: dict[str, dict] = {}
+    @property
+    def is_ready(self) -> bool:
+        """True once both the models and the gallery are loaded, and the gallery loaded intact."""
+        return self._app is not None and self._gallery_loaded and self.gallery_error is None
 
-        # Ensure data directories exist
-        os.makedirs(DATA_DIR, exist_ok=True)
-        os.makedirs(THUMB_DIR, exist_ok=True)
+    def readiness(self) -> dict:
+        """Readiness report: load state, per-component load times and any load error."""
+        return {
+            "ready": self.is_ready,
+            "model_pack": self.model_pack,
+            "models_loaded": self._app is not None,
+            "gallery_loaded": self._gallery_loaded,
+            "startup_seconds": {k: round(v, 3) for k, v in self.startup_timings.items()},
+            "error": "; ".join(e for e in (self.gallery_error, self.load_error) if e) or None,
+        }
 
-        self.load_faces()
+    # ─── Storage ───────────────────────────────────────────────────
 
     def load_faces(self):
-        """Load registered faces from disk."""
-        if os.path.exists(DATA_FILE):
-            try:
-                with open(DATA_FILE, 'rb') as f:
-                    self.registered_faces = pickle.load(f)
-                print(f"Loaded {len(self.registered_faces)} registered faces.")
-            except Exception as e:
-                print(f"Error loading faces: {e}")
-                self.registered_faces = {}
-
-        if os.path.exists(META_FILE):
-            try:
-                with open(META_FILE, 'r', encoding='utf-8') as f:
-                    self.faces_meta = json.load(f)
-            except Exception as e:
-                print(f"Error loading metadata: {e}")
-                self.faces_meta = {}
+        """Load registered faces from disk (snapshot + change log)."""
+        backend = make_backend(self.search_backend, **self.search_params)
+        if self.prototypes > 0:
+            # The raw embeddings stay in self.gallery (and on disk); only the prototypes are searched
+            self.gallery = GalleryIndex()
+            self.prototype_index = PrototypeIndex(self.gallery, self.prototypes, backend)
+            searched = self.prototype_index.gallery
+        else:
+            # An approximate backend searches its own codes: keep the float32 rows, which
+            # are only read for re-ranking, file-backed rather than on the heap
+            self.gallery = GalleryIndex(backend=backend, spill_dir=None if backend.exact else self.data_dir)
+            self.prototype_index = None
+            searched = self.gallery
+        self.matcher = BatchMatcher(searched, self.aggregation, self.top_k, rerank=self.search_rerank)
+        try:
+            self.faces_meta = self.store.load(self.gallery, UserIndex())
+            # Legacy data may lack metadata for some identities; list them anyway
+            for name in self.gallery.names():
+                if name not in self.faces_meta:
+                    self.faces_meta[name] = {"image_count": self.gallery.count(name)}
+            print(f"Loaded {len(self.gallery.names())} registered faces.")
+        except Exception as e:
+            # Never serve a half-loaded gallery: set the unreadable files aside and start
+            # an empty store, which stays writable; /ready reports the error until restart
+            print(f"Error loading faces: {e}")
+            self.gallery_error = (f"Failed to load registered faces: {e} "
+                                  f"(unreadable files renamed with suffix {CORRUPT_SUFFIX})")
+            self.faces_meta = self.store.reset(self.gallery, UserIndex())
 
     def save_faces(self):
-        """Save registered faces to disk."""
+        """Compact all registered faces into a new snapshot on disk."""
+        self._ensure_gallery()
         try:
-            with open(DATA_FILE, 'wb') as f:
-                pickle.dump(self.registered_faces, f)
-
-            with open(META_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.faces_meta, f, ensure_ascii=False, indent=2)
-
+            self.store.compact()
             print("Faces saved successfully.")
         except Exception as e:
             print(f"Error saving faces: {e}")
 
+    def _compact_if_needed(self):
+        if self.store.needs_compaction:
+            self.save_faces()
+
+    def sync_gallery(self) -> bool:
+        """Apply registrations, renames and deletions made by other worker processes."""
+        self._ensure_gallery()
+        with self._lock:
+            try:
+                return self.store.sync()
+            except Exception as e:
+                print(f"Error syncing faces: {e}")
+                return False
+
+    def _sync_loop(self):
+        while True:
+            time.sleep(config.GALLERY_SYNC_INTERVAL)
+            self.sync_gallery()
+
     def _save_thumbnail(self, name: str, img: np.ndarray, face_bbox):
         """Save a cropped face thumbnail for display."""
         try:
@@ -84,28 +278,24 @@ class FaceRecognitionService:
             # Resize thumbnail to fixed size
             thumb = cv2.resize(face_crop, (128, 128))
 
-            # Save as JPEG
-            thumb_path = os.path.join(THUMB_DIR, f"{name}.jpg")
-            cv2.imwrite(thumb_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            # Save as JPEG; replaced atomically since it may be served concurrently
+            ok, encoded = cv2.imencode(".jpg", thumb, [cv2.IMWRITE_JPEG_QUALITY, 85])
+            if not ok:
+                return None
+            thumb_path = self.thumbnails.path(name)
+            atomic_write(thumb_path, encoded.tobytes(), fsync=False)
+            self.thumbnails.invalidate(name)
 
             return thumb_path
         except Exception as e:
             print(f"Error saving thumbnail: {e}")
             return None
 
-    def get_thumbnail_base64(self, name: str) -> str | None:
-        """Get thumbnail as base64 string for API response."""
-        thumb_path = os.path.join(THUMB_DIR, f"{name}.jpg")
-        if os.path.exists(thumb_path):
-            try:
-                with open(thumb_path, 'rb') as f:
-                    data = f.read()
-                return f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
-            except Exception:
-                return None
-        return None
+    def get_thumbnail(self, name: str) -> tuple[bytes, str, float] | None:
+        """Get a user's thumbnail as (JPEG bytes, ETag, mtime), served from the LRU cache."""
+        return self.thumbnails.get(name)
 
-    def register_face(self, name: str, image_bytes: bytes):
+    def register_face(self, name: str, image_bytes: bytes, det_size: int | str | None = None):
         """
         Register a face from an image byte stream.
         Supports Korean (한글) names via UTF-8.
@@ -113,46 +303,27 @@ class FaceRecognitionService:
         """
         try:
             name = name.strip()
-            if not name:
-                return {"status": "error", "message": "Name cannot be empty"}
-
-            # Convert bytes to numpy array
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-            if img is None:
-                return {"status": "error", "message": "Failed to decode image"}
-
-            # Detect faces
-            faces = self.app.get(img)
-
-            if not faces:
-                return {"status": "error", "message": "No face detected in the image"}
+            det_size = resolve_det_size(det_size)
+            # Decode and detect; the largest face is the target and is the only one embedded
+            message, found = self._prepare_enrollment(name, image_bytes, det_size)
+            if message:
+                return {"status": "error", "message": message}
+            self._embed_enrollments([found])
+            img, scale, (_, target_face), _, _ = found
+
+            # Save embedding and update metadata
+            self._ensure_gallery()
+            with self._lock:
+                now = datetime.now().isoformat()
+                with metrics.stage("persist"):
+                    self.store.add(name, target_face.embedding, now)
+
+                # Save thumbnail (always update with latest face)
+                self._save_thumbnail(name, img, target_face.bbox / scale)
+
+                self._compact_if_needed()
+                count = self.gallery.count(name)
 
-            # For registration, assume the largest face is the target
-            target_face = max(faces, key=lambda x: (x.bbox[2] - x.bbox[0]) * (x.bbox[3] - x.bbox[1]))
-
-            # Save embedding (append to list)
-            if name not in self.registered_faces:
-                self.registered_faces[name] = []
-
-            self.registered_faces[name].append(target_face.embedding)
-
-            # Save thumbnail (always update with latest face)
-            self._save_thumbnail(name, img, target_face.bbox)
-
-            # Update metadata
-            if name not in self.faces_meta:
-                self.faces_meta[name] = {
-                    "created_at": datetime.now().isoformat(),
-                    "image_count": 0
-                }
-            self.faces_meta[name]["image_count"] = len(self.registered_faces[name])
-            self.faces_meta[name]["updated_at"] = datetime.now().isoformat()
-
-            self.save_faces()
-
-            count = len(self.registered_faces[name])
             print(f"Registered face for '{name}'. Total images: {count}")
             return {
                 "status": "success",
@@ -162,159 +333,566 @@ class FaceRecognitionService:
             }
 
         except Exception as e:
+            metrics.ERRORS.inc(operation="register")
             return {"status": "error", "message": str(e)}
 
-    def register_multiple_faces(self, name: str, images_bytes_list: list[bytes]):
-        """Register multiple face images at once for a person."""
-        results = []
-        for idx, image_bytes in enumerate(images_bytes_list):
-            result = self.register_face(name, image_bytes)
-            result["image_index"] = idx
-            results.append(result)
+    def register_multiple_faces(self, name: str, images_bytes_list: list[bytes],
+                                det_size: int | str | None = None):
+        """
+        Register multiple face images at once for a person.
+        Images are decoded and detected in parallel and embedded in one
+        batch, and the batch is persisted with a single append (see enroll).
+        """
+        try:
+            results = []
+            entries = ((name, f"image_{idx}", image_bytes) for idx, image_bytes in enumerate(images_bytes_list))
+            for idx, result in enumerate(self.enroll(entries, det_size)):
+                result["image_index"] = idx
+                results.append(result)
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
 
+        name = name.strip()
         success_count = sum(1 for r in results if r.get("status") == "success")
         return {
             "status": "success" if success_count > 0 else "error",
             "message": f"Registered {success_count}/{len(images_bytes_list)} images for '{name}'",
             "name": name,
-            "total_images": len(self.registered_faces.get(name, [])),
+            "total_images": self.gallery.count(name) if self._gallery_loaded else 0,
             "details": results
         }
 
-    def analyze_image(self, image_bytes: bytes):
+    # ─── Bulk enrollment ───────────────────────────────────────────
+
+    def enroll(self, entries: Iterable[tuple[str, str, bytes | SkippedImage]],
+               det_size: int | str | None = None) -> Iterator[dict]:
         """
-        Analyze image for faces and identify them.
-        Returns list of detected faces with bounding box, name, and similarity score.
+        Register (name, source, image bytes) entries, yielding one result per
+        entry in input order.
+
+        Entries are taken config.ENROLL_BATCH_SIZE at a time, so any number of
+        images (e.g. a whole archive) is enrolled in bounded memory. Per batch:
+        images are decoded and their largest face detected on
+        config.ENROLL_WORKERS threads, the recognition model runs once over
+        every crop, and the embeddings are persisted with one log append.
+        """
+        det_size = resolve_det_size(det_size)
+        self._ensure_gallery()
+        batch_size = max(1, config.ENROLL_BATCH_SIZE)
+        with ThreadPoolExecutor(max_workers=max(1, config.ENROLL_WORKERS), thread_name_prefix="enroll") as executor:
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) == batch_size:
+                    yield from self._enroll_batch(batch, det_size, executor)
+                    batch = []
+            if batch:
+                yield from self._enroll_batch(batch, det_size, executor)
+
+    def _prepare_enrollment(self, name: str, image_bytes: bytes | SkippedImage, det_size: int):
+        """
+        Decode one image and detect its largest face (runs on the enrollment
+        threads). Returns (error message, None) or
+        (None, (img, scale, (image, face), item_scale, cache key)).
+        A face found in the embedding cache already carries its embedding.
         """
         try:
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            if not name:
+                return "Name cannot be empty", None
+            if isinstance(image_bytes, SkippedImage):
+                return str(image_bytes), None
+            img, scale = decode_for_detection(image_bytes, det_size)
+            if img is None:
+                return "Failed to decode image", None
+
+            key = self.embedding_cache.key(image_bytes, det_size)
+            cached = self.embedding_cache.get(key)
+            if cached is not None:
+                # Still decoded above: the thumbnail is cut from the image
+                faces = self._cached_faces(cached)
+            else:
+                faces = self.detect_faces(img, det_size, scale)
+            if not faces:
+                return "No face detected in the image", None
+            target_face = max(faces, key=lambda x: (x.bbox[2] - x.bbox[0]) * (x.bbox[3] - x.bbox[1]))
+            if cached is not None:
+                return None, (img, scale, (img, target_face), scale, key)
+            items, scales = self._alignment_sources(image_bytes, img, scale, [target_face])
+            return None, (img, scale, items[0], scales[0], key)
+        except Exception as e:
+            return str(e), None
+
+    def _embed_enrollments(self, found: list[tuple]):
+        """Embed the prepared target faces not served from the cache, in one batch, and cache them."""
+        pending = [f for f in found if getattr(f[2][1], "embedding", None) is None]
+        if not pending:
+            return
+        self.embed_faces([f[2] for f in pending], [f[3] for f in pending])
+        for f in pending:
+            # Only the target face was embedded: a partial entry, reusable by registration only
+            self.embedding_cache.put(f[4], CachedFaces.from_faces([f[2][1]], complete=False))
+
+    def _enroll_batch(self, batch: list[tuple[str, str, bytes | SkippedImage]], det_size: int,
+                      executor: ThreadPoolExecutor) -> list[dict]:
+        names = [name.strip() for name, _, _ in batch]
+        prepared = list(executor.map(self._prepare_enrollment, names, [data for _, _, data in batch],
+                                     [det_size] * len(batch)))
+        ready = [(i, found) for i, (_, found) in enumerate(prepared) if found is not None]
+
+        error = None
+        if ready:
+            try:
+                self._embed_enrollments([found for _, found in ready])
+                with self._lock:
+                    now = datetime.now().isoformat()
+                    with metrics.stage("persist"):
+                        self.store.add_many([(names[i], found[2][1].embedding, now) for i, found in ready])
+                    # One thumbnail per person, from their last image in the batch
+                    latest = {names[i]: found for i, found in ready}
+                    for name, (img, scale, (_, face), _, _) in latest.items():
+                        self._save_thumbnail(name, img, face.bbox / scale)
+                    self._compact_if_needed()
+            except Exception as e:
+                print(f"Error enrolling batch: {e}")
+                metrics.ERRORS.inc(operation="enroll")
+                error = str(e)
+
+        results = []
+        for (_, source, _), name, (message, found) in zip(batch, names, prepared):
+            message = message or error
+            if message:
+                results.append({"status": "error", "message": message, "name": name, "source": source})
+            else:
+                results.append({
+                    "status": "success",
+                    "message": f"Face registered for '{name}'",
+                    "name": name,
+                    "source": source,
+                    "total_images": self.gallery.count(name)
+                })
+        if ready and error is None:
+            print(f"Enrolled {len(ready)}/{len(batch)} images for {len({names[i] for i, _ in ready})} people.")
+        return results
+
+    def register_bulk(self, entries: Iterable[tuple[str, str, bytes | SkippedImage]],
+                      det_size: int | str | None = None) -> dict:
+        """Enroll many people at once; reports per-person totals and only the failed images."""
+        registered: Counter = Counter()
+        failed = []
+        processed = 0
+        try:
+            for result in self.enroll(entries, det_size):
+                processed += 1
+                if result["status"] == "success":
+                    registered[result["name"]] += 1
+                else:
+                    failed.append({k: result[k] for k in ("source", "name", "message")})
+        except Exception as e:
+            return {"status": "error", "message": str(e)}
+
+        if processed == 0:
+            return {"status": "error", "message": "No images found; expected name/*.jpg entries"}
+        return {
+            "status": "success" if registered else "error",
+            "message": f"Registered {sum(registered.values())}/{processed} images for {len(registered)} people",
+            "registered_images": sum(registered.values()),
+            "users": {name: self.gallery.count(name) for name in registered},
+            "failed": failed
+        }
+
+    def register_archive(self, fileobj: BinaryIO, det_size: int | str | None = None) -> dict:
+        """Bulk-enroll a zip or tarball laid out as name/*.jpg."""
+        return self.register_bulk(iter_archive(fileobj, config.ENROLL_MAX_IMAGE_BYTES), det_size)
+
+    def register_folder(self, folder: str, det_size: int | str | None = None) -> dict:
+        """Bulk-enroll a server folder laid out as name/*.jpg, under config.ENROLL_IMPORT_ROOT."""
+        try:
+            path = resolve_import_folder(config.ENROLL_IMPORT_ROOT, folder)
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}
+        return self.register_bulk(iter_folder(path, config.ENROLL_MAX_IMAGE_BYTES), det_size)
+
+    # ─── Inference pipeline ────────────────────────────────────────
+
+    def detect_faces(self, img: np.ndarray, det_size: int | None = None, scale: float = 1.0) -> "list[Face]":
+        """
+        Run the detector only; returned faces have bbox, kps and det_score.
+        The detector resizes `img` to fit det_size x det_size (config.DET_SIZE
+        by default). `scale` maps bbox and kps back to original image
+        coordinates when `img` was decoded at reduced size.
+        """
+        from insightface.app.common import Face
+
+        input_size = (det_size, det_size) if det_size else None
+        det_model = self.app.det_model
+        with metrics.stage("detection"):
+            bboxes, kpss = det_model.detect(img, input_size=input_size, max_num=0, metric='default')
+        faces = []
+        for i in range(bboxes.shape[0]):
+            kps = kpss[i] * scale if kpss is not None else None
+            faces.append(Face(bbox=bboxes[i, 0:4] * scale, kps=kps, det_score=bboxes[i, 4]))
+        return faces
+
+    def _alignment_sources(self, image_bytes: bytes | None, img: np.ndarray, scale: float,
+                           faces: "list[Face]") -> tuple[list, list[float]]:
+        """
+        Choose the image each face is aligned from for recognition.
+        Faces that still span the recognizer's input size in the reduced
+        `img` use it; smaller ones use a full-resolution decode, made at most
+        once per image. Returns (items, scales) for embed_faces.
+        """
+        items, scales = [], []
+        full = None
+        min_side = self.app.models['recognition'].input_size[0]
+        for face in faces:
+            x1, y1, x2, y2 = face.bbox / scale
+            if scale > 1 and min(x2 - x1, y2 - y1) < min_side:
+                if full is None:
+                    full = decode_image(image_bytes)
+                if full is not None:
+                    items.append((full, face))
+                    scales.append(1.0)
+                    continue
+            items.append((img, face))
+            scales.append(scale)
+        return items, scales
+
+    def embed_faces(self, items: "list[tuple[np.ndarray, Face]]", scales: list[float] | None = None):
+        """
+        Compute embeddings for (image, face) pairs in one batched recognition call.
+        Sets `face.embedding` on every face. Face landmarks are in original image
+        coordinates; scales[i] is original pixels per pixel of items[i]'s image.
+        """
+        from insightface.utils import face_align
+
+        if not items:
+            return
+        scales = scales or [1.0] * len(items)
+        rec_model = self.app.models['recognition']
+        size = rec_model.input_size[0]
+        with metrics.stage("alignment"):
+            crops = [face_align.norm_crop(img, landmark=face.kps / s, image_size=size)
+                     for (img, face), s in zip(items, scales)]
+        with metrics.stage("recognition"):
+            embeddings = rec_model.get_feat(crops)
+        for (_, face), embedding in zip(items, embeddings):
+            face.embedding = embedding.flatten()
+
+    def _match(self, faces: "list[Face]") -> list[tuple[str | None, float]]:
+        """Search the gallery for embedded faces: (name, similarity) of each best identity."""
+        self._ensure_gallery()
+        with self._lock:
+            with metrics.stage("search"):
+                if self.prototype_index is not None:
+                    self.prototype_index.refresh()
+                return self.matcher.match(np.stack([face.embedding for face in faces]))
+
+    @staticmethod
+    def _cached_faces(cached: CachedFaces) -> "list[Face]":
+        """Rebuild Face objects, embeddings included, from an embedding cache entry."""
+        from insightface.app.common import Face
+
+        return [
+            Face(bbox=cached.bboxes[i], kps=cached.kpss[i] if cached.kpss is not None else None,
+                 det_score=cached.scores[i], embedding=cached.embeddings[i])
+            for i in range(len(cached))
+        ]
+
+    def _format_results(self, faces: "list[Face]", matches: list[tuple[str | None, float]]) -> list[dict]:
+        results = []
+        for face, (match_name, sim) in zip(faces, matches):
+            results.append({
+                "bbox": face.bbox.astype(int).tolist(),
+                "name": match_name if sim > MATCH_THRESHOLD else "Unknown",
+                "score": float(face.det_score),
+                "similarity": sim
+            })
+        return results
 
+    def _prepare_analysis(self, image_bytes: bytes | SkippedImage, det_size: int):
+        """
+        Cache lookup, decode and detection of one image (runs on the batch
+        threads). Returns {"error": message} or (cache key, faces, alignment
+        items, item scales); items are None when the faces came from the cache.
+        """
+        try:
+            if isinstance(image_bytes, SkippedImage):
+                return {"error": str(image_bytes)}
+            key = self.embedding_cache.key(image_bytes, det_size)
+            cached = self.embedding_cache.get(key, complete=True)
+            if cached is not None:
+                # Seen before: no decode, detection or recognition
+                return key, self._cached_faces(cached), None, None
+            img, scale = decode_for_detection(image_bytes, det_size)
             if img is None:
                 return {"error": "Failed to decode image"}
+            faces = self.detect_faces(img, det_size, scale)
+            items, scales = self._alignment_sources(image_bytes, img, scale, faces)
+            return key, faces, items, scales
+        except Exception as e:
+            return {"error": str(e)}
 
-            faces = self.app.get(img)
-            results = []
+    def _recognize_prepared(self, prepared: list) -> list:
+        """
+        Embed the faces of prepared images (see _prepare_analysis) in one
+        recognition batch, search the gallery once for all of them and cache
+        the new detections. Returns one entry per image, as analyze_image would.
+        """
+        detections = [p for p in prepared if not isinstance(p, dict)]
+        pending = [p for p in detections if p[2] is not None]
+        if any(p[2] for p in pending):
+            self.embed_faces([item for p in pending for item in p[2]], [s for p in pending for s in p[3]])
+
+        all_faces = [face for _, faces, _, _ in detections for face in faces]
+        # One matrix multiply against the gallery for all faces of all images
+        matches = self._match(all_faces) if all_faces else []
+
+        outputs = []
+        offset = 0
+        for p in prepared:
+            if isinstance(p, dict):
+                outputs.append(p)
+                continue
+            key, faces, items, _ = p
+            if items is not None:
+                self.embedding_cache.put(key, CachedFaces.from_faces(faces))
+            outputs.append(self._format_results(faces, matches[offset:offset + len(faces)]))
+            offset += len(faces)
+        return outputs
+
+    def analyze_images(self, images_bytes_list: list[bytes], det_size: int | str | None = None) -> list:
+        """
+        Analyze several images together: detection runs per image, then the
+        recognition model runs once over the aligned crops of every face and
+        the gallery is searched with a single matrix multiply.
+        Large JPEGs are decoded at reduced size for detection (see image_io).
+        Returns one entry per image, as analyze_image would.
+        """
+        try:
+            det_size = resolve_det_size(det_size)
+            return self._recognize_prepared([self._prepare_analysis(b, det_size) for b in images_bytes_list])
+        except Exception as e:
+            print(f"Error analyzing images: {e}")
+            metrics.ERRORS.inc(operation="analyze")
+            return [{"error": str(e)}] * len(images_bytes_list)
 
-            # Prepare for vectorized comparison
-            all_names = []
-            all_embeddings = []
-            for reg_name, embs in self.registered_faces.items():
-                for emb in embs:
-                    all_names.append(reg_name)
-                    all_embeddings.append(emb)
-            
-            all_embeddings = np.array(all_embeddings) if all_embeddings else None
-
-            for face in faces:
-                bbox = face.bbox.astype(int).tolist()
-                name = "Unknown"
-                max_similarity = 0.0
-
-                # Optimized comparison using Numpy vectorization
-                if all_embeddings is not None:
-                    # Normalize embeddings for cosine similarity
-                    face_norm = face.embedding / np.linalg.norm(face.embedding)
-                    regs_norm = all_embeddings / np.linalg.norm(all_embeddings, axis=1, keepdims=True)
-                    
-                    # Compute all similarities at once (dot product of normalized vectors)
-                    similarities = np.dot(regs_norm, face_norm)
-                    
-                    max_idx = np.argmax(similarities)
-                    sim = float(similarities[max_idx])
-                    
-                    if sim > 0.4:  # Threshold
-                        name = all_names[max_idx]
-                        max_similarity = sim
-                    else:
-                        max_similarity = sim
+    def analyze_many(self, entries: Iterable[tuple[str, bytes | SkippedImage]],
+                     det_size: int | str | None = None) -> Iterator[dict]:
+        """
+        Analyze (source, image bytes) entries, yielding
+        {"index", "source", "results"} or {"index", "source", "error"} per
+        entry in input order.
+
+        Like enroll, entries are taken config.BATCH_PREDICT_SIZE at a time so
+        any number of images is analyzed in bounded memory: per batch, images
+        are decoded and detected on config.BATCH_PREDICT_WORKERS threads and
+        analyzed together as in analyze_images. Results of a batch are yielded
+        as soon as it is done.
+        """
+        det_size = resolve_det_size(det_size)
+        batch_size = max(1, config.BATCH_PREDICT_SIZE)
+        index = 0
+        with ThreadPoolExecutor(max_workers=max(1, config.BATCH_PREDICT_WORKERS),
+                                thread_name_prefix="analyze") as executor:
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) == batch_size:
+                    yield from self._analyze_batch(batch, det_size, executor, index)
+                    index += len(batch)
+                    batch = []
+            if batch:
+                yield from self._analyze_batch(batch, det_size, executor, index)
+
+    def _analyze_batch(self, batch: list[tuple[str, bytes | SkippedImage]], det_size: int,
+                       executor: ThreadPoolExecutor, first_index: int) -> list[dict]:
+        prepared = list(executor.map(self._prepare_analysis, [data for _, data in batch], [det_size] * len(batch)))
+        try:
+            outputs = self._recognize_prepared(prepared)
+        except Exception as e:
+            print(f"Error analyzing batch: {e}")
+            metrics.ERRORS.inc(operation="analyze")
+            outputs = [{"error": str(e)}] * len(batch)
 
-                results.append({
-                    "bbox": bbox,
-                    "name": name,
-                    "score": float(face.det_score),
-                    "similarity": max_similarity
-                })
+        results = []
+        for i, ((source, _), output) in enumerate(zip(batch, outputs)):
+            result = {"index": first_index + i, "source": source}
+            if isinstance(output, dict):
+                result["error"] = output["error"]
+            else:
+                result["results"] = output
+            results.append(result)
+        return results
+
+    def analyze_archive(self, fileobj: BinaryIO, det_size: int | str | None = None) -> Iterator[dict]:
+        """
+        analyze_many over every image in a zip or tarball, in any folder layout.
+        Raises ValueError (on the first iteration) if it is not an archive.
+        """
+        entries = iter_archive(fileobj, config.ENROLL_MAX_IMAGE_BYTES, label=image_path)
+        return self.analyze_many(((path, data) for _, path, data in entries), det_size)
+
+    def analyze_tracked(self, image_bytes: bytes, tracker: FaceTracker,
+                        det_size: int | str | None = None) -> list | dict:
+        """
+        Analyze one frame of a stream. Detection runs on every frame, but only
+        faces whose track is new, due for a refresh or clearer than when last
+        embedded are embedded and searched; the others reuse their track's
+        identity. Results are as analyze_image's, plus a "track_id".
+        """
+        try:
+            det_size = resolve_det_size(det_size)
+            img, scale = decode_for_detection(image_bytes, det_size)
+            if img is None:
+                return {"error": "Failed to decode image"}
+            return self._recognize_tracked(img, scale, image_bytes, tracker, det_size)
 
+        except Exception as e:
+            metrics.ERRORS.inc(operation="analyze")
+            return {"error": str(e)}
 
+    def analyze_frame(self, img: np.ndarray, tracker: FaceTracker | None = None,
+                      det_size: int | str | None = None) -> list | dict:
+        """
+        Analyze an already decoded BGR frame, e.g. from a server-side camera
+        (src/camera/camera_stream.py). With a tracker this behaves like
+        analyze_tracked; without one every face is embedded.
+        """
+        try:
+            det_size = resolve_det_size(det_size)
+            results = self._recognize_tracked(img, 1.0, None, tracker or FaceTracker(), det_size)
+            if tracker is None:
+                for result in results:
+                    del result["track_id"]
             return results
 
         except Exception as e:
+            metrics.ERRORS.inc(operation="analyze")
             return {"error": str(e)}
 
-    def get_registered_users(self):
-        """Get all registered users with their metadata and thumbnails."""
-        users = []
-        for name, embeddings in self.registered_faces.items():
-            meta = self.faces_meta.get(name, {})
-            users.append({
-                "name": name,
-                "image_count": len(embeddings),
-                "created_at": meta.get("created_at", "N/A"),
-                "updated_at": meta.get("updated_at", "N/A"),
-                "thumbnail": self.get_thumbnail_base64(name)
-            })
-        return users
+    def _recognize_tracked(self, img: np.ndarray, scale: float, image_bytes: bytes | None,
+                           tracker: FaceTracker, det_size: int) -> list[dict]:
+        """Detect, embed the faces the tracker asks for and label every face with its track."""
+        faces = self.detect_faces(img, det_size, scale)
+        min_side = self.app.models['recognition'].input_size[0]
+        qualities = [face_quality(face.bbox, face.det_score, min_side) for face in faces]
+        tracked = tracker.update(np.array([face.bbox for face in faces]), qualities)
+
+        pending = [i for i, (_, needs_embedding) in enumerate(tracked) if needs_embedding]
+        if pending:
+            to_embed = [faces[i] for i in pending]
+            self.embed_faces(*self._alignment_sources(image_bytes, img, scale, to_embed))
+            matches = self._match(to_embed)
+            for i, (match_name, sim) in zip(pending, matches):
+                tracker.assign(tracked[i][0], match_name, sim, qualities[i])
+
+        results = self._format_results(faces, [(track.name, track.similarity) for track, _ in tracked])
+        for result, (track, _) in zip(results, tracked):
+            result["track_id"] = track.track_id
+        return results
+
+    def analyze_image(self, image_bytes: bytes, det_size: int | str | None = None):
+        """
+        Analyze image for faces and identify them.
+        Returns list of detected faces with bounding box, name, and similarity score.
+        """
+        return self.analyze_images([image_bytes], det_size)[0]
 
-    def get_user(self, name: str):
-        """Get a specific registered user info with thumbnail."""
-        if name not in self.registered_faces:
-            return None
+    def _user_info(self, name: str) -> dict:
         meta = self.faces_meta.get(name, {})
         return {
             "name": name,
-            "image_count": len(self.registered_faces[name]),
+            "image_count": self.gallery.count(name),
             "created_at": meta.get("created_at", "N/A"),
             "updated_at": meta.get("updated_at", "N/A"),
-            "thumbnail": self.get_thumbnail_base64(name)
+            "thumbnail_version": self.thumbnails.version(name)
         }
 
+    def get_registered_users(self, search: str | None = None, mode: str = "substring", sort: str = "name",
+                             order: str = "asc", offset: int = 0, limit: int | None = None,
+                             cursor: str | None = None) -> dict:
+        """
+        Get one page of registered users with their metadata, filtered by name
+        and sorted (see UserIndex.query). "thumbnail_version" is the
+        thumbnail's ETag (None without one), for building cacheable URLs.
+        Raises ValueError for an unknown sort field, order, mode or a bad cursor.
+        """
+        self._ensure_gallery()
+        with self._lock:
+            page = self.faces_meta.query(search, mode, sort, order, offset, limit, cursor)
+            users = [self._user_info(name) for name in page["names"] if name in self.gallery]
+        return {"users": users, "total": page["matched"], "next_cursor": page["next_cursor"]}
+
+    def get_user(self, name: str):
+        """Get a specific registered user info, with its thumbnail version."""
+        self._ensure_gallery()
+        with self._lock:
+            if name not in self.gallery:
+                return None
+            return self._user_info(name)
+
     def update_user_name(self, old_name: str, new_name: str):
         """Update a registered user's name (supports Korean names)."""
         new_name = new_name.strip()
         if not new_name:
             return {"status": "error", "message": "New name cannot be empty"}
 
-        if old_name not in self.registered_faces:
-            return {"status": "error", "message": f"User '{old_name}' not found"}
+        self._ensure_gallery()
+        with self._lock:
+            if old_name not in self.gallery:
+                return {"status": "error", "message": f"User '{old_name}' not found"}
 
-        if new_name in self.registered_faces and new_name != old_name:
-            return {"status": "error", "message": f"User '{new_name}' already exists"}
+            if new_name in self.gallery and new_name != old_name:
+                return {"status": "error", "message": f"User '{new_name}' already exists"}
 
-        # Transfer embeddings
-        self.registered_faces[new_name] = self.registered_faces.pop(old_name)
+            # Transfer embeddings and metadata
+            now = datetime.now().isoformat()
+            self.store.rename(old_name, new_name, now)
 
-        # Transfer metadata
-        if old_name in self.faces_meta:
-            self.faces_meta[new_name] = self.faces_meta.pop(old_name)
-            self.faces_meta[new_name]["updated_at"] = datetime.now().isoformat()
+            # Rename thumbnail
+            old_thumb = self.thumbnails.path(old_name)
+            new_thumb = self.thumbnails.path(new_name)
+            if os.path.exists(old_thumb):
+                os.replace(old_thumb, new_thumb)
+            self.thumbnails.invalidate(old_name)
+            self.thumbnails.invalidate(new_name)
 
-        # Rename thumbnail
-        old_thumb = os.path.join(THUMB_DIR, f"{old_name}.jpg")
-        new_thumb = os.path.join(THUMB_DIR, f"{new_name}.jpg")
-        if os.path.exists(old_thumb):
-            os.rename(old_thumb, new_thumb)
-
-        self.save_faces()
-        return {"status": "success", "message": f"Name updated from '{old_name}' to '{new_name}'"}
+            self._compact_if_needed()
+            return {"status": "success", "message": f"Name updated from '{old_name}' to '{new_name}'"}
 
     def delete_user(self, name: str):
         """Delete a registered user and all their data."""
-        if name not in self.registered_faces:
-            return {"status": "error", "message": f"User '{name}' not found"}
-
-        del self.registered_faces[name]
-        if name in self.faces_meta:
-            del self.faces_meta[name]
-
-        # Delete thumbnail
-        thumb_path = os.path.join(THUMB_DIR, f"{name}.jpg")
-        if os.path.exists(thumb_path):
-            os.remove(thumb_path)
-
-        self.save_faces()
-        return {"status": "success", "message": f"User '{name}' deleted successfully"}
-
-
-# Create a global instance
-face_service = FaceRecognitionService()
+        self._ensure_gallery()
+        with self._lock:
+            if name not in self.gallery:
+                return {"status": "error", "message": f"User '{name}' not found"}
+
+            self.store.remove(name)
+
+            # Delete thumbnail
+            thumb_path = self.thumbnails.path(name)
+            if os.path.exists(thumb_path):
+                os.remove(thumb_path)
+            self.thumbnails.invalidate(name)
+
+            self._compact_if_needed()
+            return {"status": "success", "message": f"User '{name}' deleted successfully"}
+
+
+def configured_service(**overrides) -> FaceRecognitionService:
+    """A service set up from config like the API's, with constructor arguments overridden (e.g. data_dir)."""
+    if config.SEARCH_CODEC and config.SEARCH_BACKEND not in CODEC_BACKENDS:
+        raise ValueError(f"FACE_SEARCH_CODEC only applies to the {' and '.join(CODEC_BACKENDS)} search backends, "
+                         f"not FACE_SEARCH_BACKEND={config.SEARCH_BACKEND}")
+    options = {
+        "search_backend": config.SEARCH_BACKEND,
+        "search_params": {"codec": config.SEARCH_CODEC} if config.SEARCH_CODEC else None,
+        "search_rerank": config.SEARCH_RERANK,
+        "prototypes": config.PROTOTYPES_PER_IDENTITY,
+    }
+    options.update(overrides)
+    return FaceRecognitionService(**options)
+
+
+# Create a global instance (cheap: models load on first use or warmup)
+face_service = configured_service()
@@ -0,0 +1,42 @@
+import asyncio
+
+
+class LatestFrame:
+    """
+    Single-slot mailbox between a WebSocket reader and the analysis loop.
+
+    `put` replaces a frame that has not been taken yet, counting it as
+    dropped, so a slow consumer always analyzes the newest frame and the
+    backlog never grows beyond one frame.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.dropped = 0
+        self._frame: bytes | None = None
+        self._seq = 0
+        self._closed = False
+        self._ready = asyncio.Event()
+
+    def put(self, frame: bytes):
+        if self._frame is not None:
+            self.dropped += 1
+        self.received += 1
+        self._frame = frame
+        self._seq = self.received
+        self._ready.set()
+
+    def close(self):
+        """Wake the consumer; `get` returns None once no frame is left."""
+        self._closed = True
+        self._ready.set()
+
+    async def get(self) -> tuple[int, bytes] | None:
+        """Wait for the newest frame and return (sequence number, frame), or None when closed."""
+        while self._frame is None:
+            if self._closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return self._seq, frame
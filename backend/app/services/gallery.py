@@ -0,0 +1,275 @@
+import tempfile
+
+import numpy as np
+
+from backend.app.services.search_index import ExactBackend, SearchBackend, l2_normalize
+
+EMBEDDING_DIM = 512
+
+
+class GalleryIndex:
+    """
+    In-memory gallery of registered face embeddings.
+
+    Holds one contiguous float32 matrix of L2-normalized embeddings and an
+    int32 label array, so that matching a query is a single matrix multiply
+    instead of rebuilding the gallery on every request.
+    Row i of `matrix` belongs to the identity `name_of(labels[i])`.
+
+    A SearchBackend (exact brute force by default) is kept in sync with
+    every add/remove and serves top-k candidate search.
+
+    With `spill_dir`, the matrix is kept in an unlinked scratch file there
+    (np.memmap) instead of on the heap, including when a memory-mapped
+    snapshot is first modified. For an approximate backend holding compact
+    codes, the float32 rows are then only paged in for re-ranking and the
+    OS may drop them again, so the codes are all that must stay resident.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, capacity: int = 256,
+                 backend: SearchBackend | None = None, spill_dir: str | None = None):
+        self.dim = dim
+        self.spill_dir = spill_dir
+        self._matrix = self._allocate(capacity)
+        self._labels = np.empty(capacity, dtype=np.int32)
+        self._size = 0
+        # Bumped whenever rows or labels change, so derived structures can be cached
+        self.version = 0
+
+        # Label id <-> name. Freed label ids are reused so labels stay dense.
+        self._names: list[str | None] = []
+        self._label_of: dict[str, int] = {}
+        self._free_labels: list[int] = []
+        self._counts: dict[str, int] = {}
+        # Called with each identity whose rows change, or None when all do (see subscribe)
+        self._listeners: list = []
+
+        # Not `backend or ...`: an empty backend has len() == 0 and would be replaced
+        self.backend: SearchBackend = backend if backend is not None else ExactBackend()
+        self.backend.build(self.matrix, self.labels)
+
+    @classmethod
+    def from_faces(cls, registered_faces: dict[str, list[np.ndarray]], dim: int = EMBEDDING_DIM,
+                   backend: SearchBackend | None = None):
+        """Build a gallery from the {name: [embedding, ...]} mapping."""
+        total = sum(len(embs) for embs in registered_faces.values())
+        gallery = cls(dim=dim, capacity=max(total, 256))
+        for name, embs in registered_faces.items():
+            if len(embs):
+                gallery.add(name, np.stack(embs))
+        # Build the backend once over all rows rather than incrementally
+        if backend is not None:
+            gallery.attach_backend(backend)
+        return gallery
+
+    def load_snapshot(self, matrix: np.ndarray, names: list[str], counts: list[int]):
+        """
+        Replace the contents with a snapshot whose rows are grouped by identity:
+        the first counts[0] rows belong to names[0], and so on.
+
+        `matrix` is used as-is (typically a read-only np.memmap of normalized
+        embeddings) and is only copied on the first modification.
+        """
+        self._matrix = matrix
+        self._size = matrix.shape[0]
+        self._labels = np.repeat(np.arange(len(names), dtype=np.int32), counts)
+        self._names = list(names)
+        self._label_of = {name: label for label, name in enumerate(names)}
+        self._free_labels = []
+        self._counts = dict(zip(names, (int(c) for c in counts)))
+        self.version += 1
+        self.backend.build(self.matrix, self.labels)
+        self._changed(None)
+
+    def grouped_rows(self) -> tuple[np.ndarray, list[str], list[int]]:
+        """Return (matrix, names, counts) with rows grouped by identity, as load_snapshot expects."""
+        order = np.argsort(self.labels, kind="stable")
+        by_label = sorted(self._label_of.items(), key=lambda item: item[1])
+        names = [name for name, _ in by_label]
+        counts = [self._counts[name] for name in names]
+        return np.ascontiguousarray(self.matrix[order]), names, counts
+
+    def embeddings(self, name: str) -> np.ndarray:
+        """Normalized embeddings registered for `name`, shape (count, dim)."""
+        label = self._label_of.get(name)
+        if label is None:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return self.matrix[self.labels == label]
+
+    def attach_backend(self, backend: SearchBackend):
+        """Use `backend` for candidate search, building it from the current rows."""
+        self.backend = backend
+        backend.build(self.matrix, self.labels)
+
+    def subscribe(self, listener):
+        """
+        Call listener(name) after the rows of identity `name` change (added,
+        removed, renamed from or to), and listener(None) after all may have.
+        For structures derived per identity, such as prototypes.
+        """
+        self._listeners.append(listener)
+
+    def _changed(self, name: str | None):
+        for listener in self._listeners:
+            listener(name)
+
+    # ─── Introspection ──────────────────────────────────────────────
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._label_of
+
+    @property
+    def matrix(self) -> np.ndarray:
+        """(N, dim) view of the normalized embeddings."""
+        return self._matrix[:self._size]
+
+    @property
+    def labels(self) -> np.ndarray:
+        """(N,) view of the identity label of each row."""
+        return self._labels[:self._size]
+
+    @property
+    def num_labels(self) -> int:
+        """Upper bound (exclusive) of label ids currently in use."""
+        return len(self._names)
+
+    def names(self) -> list[str]:
+        return list(self._label_of)
+
+    def name_of(self, label: int) -> str | None:
+        return self._names[label]
+
+    def label_of(self, name: str) -> int | None:
+        return self._label_of.get(name)
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+    # ─── Mutation ───────────────────────────────────────────────────
+
+    def _allocate(self, capacity: int) -> np.ndarray:
+        if self.spill_dir is None:
+            return np.empty((capacity, self.dim), dtype=np.float32)
+        # The mapping keeps its own descriptor, so the file is gone once the array is
+        with tempfile.TemporaryFile(dir=self.spill_dir) as f:
+            return np.memmap(f, dtype=np.float32, mode="w+", shape=(max(capacity, 1), self.dim))
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity and self._matrix.flags.writeable:
+            return
+        new_capacity = max(needed, capacity * 2)
+        matrix = self._allocate(new_capacity)
+        labels = np.empty(new_capacity, dtype=np.int32)
+        matrix[:self._size] = self._matrix[:self._size]
+        labels[:self._size] = self._labels[:self._size]
+        self._matrix, self._labels = matrix, labels
+
+    def _assign_label(self, name: str) -> int:
+        label = self._label_of.get(name)
+        if label is not None:
+            return label
+        if self._free_labels:
+            label = self._free_labels.pop()
+            self._names[label] = name
+        else:
+            label = len(self._names)
+            self._names.append(name)
+        self._label_of[name] = label
+        return label
+
+    def add(self, name: str, embeddings: np.ndarray) -> int:
+        """Append one (dim,) or several (k, dim) embeddings for `name`. Returns its label."""
+        vectors = l2_normalize(np.atleast_2d(embeddings))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected embeddings of size {self.dim}, got {vectors.shape[1]}")
+
+        label = self._assign_label(name)
+        k = vectors.shape[0]
+        self._reserve(k)
+        self._matrix[self._size:self._size + k] = vectors
+        self._labels[self._size:self._size + k] = label
+        self._size += k
+        self._counts[name] = self._counts.get(name, 0) + k
+        self.version += 1
+
+        if self.backend.exact:
+            self.backend.build(self.matrix, self.labels)
+        else:
+            self.backend.add(vectors, np.full(k, label, dtype=np.int32))
+        self._changed(name)
+        return label
+
+    def remove(self, name: str) -> bool:
+        """Drop every embedding of `name`, compacting the matrix in place."""
+        label = self._label_of.pop(name, None)
+        if label is None:
+            return False
+
+        self._reserve(0)  # copy-on-write for a memory-mapped snapshot
+        keep = self.labels != label
+        remaining = int(keep.sum())
+        self._matrix[:remaining] = self.matrix[keep]
+        self._labels[:remaining] = self.labels[keep]
+        self._size = remaining
+
+        self._names[label] = None
+        self._free_labels.append(label)
+        del self._counts[name]
+        self.version += 1
+
+        if self.backend.exact:
+            self.backend.build(self.matrix, self.labels)
+        else:
+            self.backend.remove(label)
+        self._changed(name)
+        return True
+
+    def rename(self, old_name: str, new_name: str) -> bool:
+        """Rename an identity. Only the label table changes; no rows move."""
+        if old_name not in self._label_of or new_name in self._label_of:
+            return False
+        label = self._label_of.pop(old_name)
+        self._label_of[new_name] = label
+        self._names[label] = new_name
+        self._counts[new_name] = self._counts.pop(old_name)
+        self._changed(old_name)
+        self._changed(new_name)
+        return True
+
+    def clear(self):
+        if not self._matrix.flags.writeable:
+            self._matrix = self._allocate(256)
+            self._labels = np.empty(256, dtype=np.int32)
+        self._size = 0
+        self._names.clear()
+        self._label_of.clear()
+        self._free_labels.clear()
+        self._counts.clear()
+        self.version += 1
+        self.backend.build(self.matrix, self.labels)
+        self._changed(None)
+
+    # ─── Search ─────────────────────────────────────────────────────
+
+    def similarity(self, queries: np.ndarray) -> np.ndarray:
+        """Cosine similarity of (Q, dim) queries against every row: (Q, N)."""
+        return l2_normalize(np.atleast_2d(queries)) @ self.matrix.T
+
+    def best_match(self, queries: np.ndarray) -> list[tuple[str | None, float]]:
+        """Return (name, similarity) of the closest row for each query."""
+        queries = np.atleast_2d(queries)
+        if self._size == 0:
+            return [(None, 0.0)] * queries.shape[0]
+
+        scores = self.similarity(queries)
+        best_rows = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(scores.shape[0]), best_rows]
+        return [
+            (self._names[self._labels[row]], float(score))
+            for row, score in zip(best_rows, best_scores)
+        ]
@@ -0,0 +1,102 @@
+import io
+import json
+import os
+import pickle
+
+import numpy as np
+
+from backend.app.services.embedding_store import LOG_FILE, SNAPSHOT_TABLE, EmbeddingStore, atomic_write
+from backend.app.services.gallery import EMBEDDING_DIM, GalleryIndex
+
+# Gallery storage formats backend/cli.py converts between:
+#   snapshot - an EmbeddingStore directory (snapshot + log), what the server uses
+#   legacy   - a directory with registered_faces.pkl + faces_meta.json, the pre-snapshot layout
+#   npz      - a single portable .npz file (grouped matrix, names, counts, metadata as JSON)
+FORMATS = ("snapshot", "legacy", "npz")
+LEGACY_FACES = "registered_faces.pkl"
+LEGACY_META = "faces_meta.json"
+
+
+def detect_format(path: str) -> str:
+    """Format of an existing gallery at `path`; a new one is a snapshot unless it ends in .npz."""
+    if path.lower().endswith(".npz"):
+        return "npz"
+    if (os.path.exists(os.path.join(path, LEGACY_FACES))
+            and not os.path.exists(os.path.join(path, SNAPSHOT_TABLE))
+            and not os.path.exists(os.path.join(path, LOG_FILE))):
+        return "legacy"
+    return "snapshot"
+
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'; expected one of {', '.join(FORMATS)}")
+
+
+def read_gallery(path: str, fmt: str | None = None) -> tuple[GalleryIndex, dict]:
+    """Load the gallery and per-user metadata stored at `path`."""
+    fmt = fmt or detect_format(path)
+    _check_format(fmt)
+    if fmt == "npz":
+        with np.load(path) as data:
+            matrix = data["matrix"]
+            gallery = GalleryIndex(dim=matrix.shape[1] if matrix.ndim == 2 else EMBEDDING_DIM)
+            gallery.load_snapshot(matrix, data["names"].tolist(), data["counts"].tolist())
+            meta = json.loads(str(data["meta"]))
+        return gallery, meta
+
+    if not os.path.isdir(path):
+        raise ValueError(f"'{path}' is not a directory")
+    if fmt == "snapshot":
+        gallery = GalleryIndex()
+        store = EmbeddingStore(path, fsync=False)
+        meta = dict(store.load(gallery))
+        store.close()
+        return gallery, meta
+
+    with open(os.path.join(path, LEGACY_FACES), 'rb') as f:
+        faces = {name: np.stack(embeddings) for name, embeddings in pickle.load(f).items() if len(embeddings)}
+    gallery = GalleryIndex(dim=next(iter(faces.values())).shape[1] if faces else EMBEDDING_DIM)
+    for name, embeddings in faces.items():
+        gallery.add(name, embeddings)
+    meta = {}
+    meta_path = os.path.join(path, LEGACY_META)
+    if os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+    return gallery, meta
+
+
+def write_gallery(gallery: GalleryIndex, meta: dict, path: str, fmt: str | None = None):
+    """
+    Write `gallery` and its metadata to `path`. A snapshot destination must
+    not already hold a store, so an existing gallery is never merged into.
+    """
+    fmt = fmt or detect_format(path)
+    _check_format(fmt)
+    matrix, names, counts = gallery.grouped_rows()
+    meta = {name: meta.get(name, {}) for name in names}
+
+    if fmt == "npz":
+        buffer = io.BytesIO()
+        np.savez(buffer, matrix=matrix, names=np.array(names, dtype=str),
+                 counts=np.array(counts, dtype=np.int64), meta=np.array(json.dumps(meta, ensure_ascii=False)))
+        atomic_write(path, buffer.getvalue())
+        return
+
+    os.makedirs(path, exist_ok=True)
+    if fmt == "snapshot":
+        if os.path.exists(os.path.join(path, SNAPSHOT_TABLE)) or os.path.exists(os.path.join(path, LOG_FILE)):
+            raise ValueError(f"'{path}' already holds an embedding store")
+        store = EmbeddingStore(path)
+        target = GalleryIndex(dim=gallery.dim)
+        store_meta = store.load(target)
+        target.load_snapshot(matrix, names, counts)
+        store_meta.update(meta)
+        store.compact()
+        store.close()
+        return
+
+    faces = {name: list(gallery.embeddings(name)) for name in names}
+    atomic_write(os.path.join(path, LEGACY_FACES), pickle.dumps(faces))
+    atomic_write(os.path.join(path, LEGACY_META), json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
@@ -0,0 +1,81 @@
+import struct
+
+import cv2
+import numpy as np
+
+from backend.app.services import metrics
+
+# cv2.imdecode flags decoding a JPEG directly at 1/2, 1/4 or 1/8 of its size.
+# libjpeg scales inside the DCT, so a reduced decode is much cheaper than a full one.
+REDUCED_DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Start-of-frame markers carrying the image size (SOF0..SOF15 minus DHT, JPG and DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data: bytes) -> tuple[int, int] | None:
+    """Read (width, height) from a JPEG header without decoding, or None if not a JPEG."""
+    if data[:2] != b'\xff\xd8':
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            pos += 2
+            continue
+        (length,) = struct.unpack('>H', data[pos + 2:pos + 4])
+        if marker in _SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height, width = struct.unpack('>HH', data[pos + 5:pos + 9])
+            return width, height
+        pos += 2 + length
+    return None
+
+
+def reduced_decode_factor(size: tuple[int, int] | None, min_side: int, max_factor: int = 4) -> int:
+    """
+    Largest JPEG decode reduction (1, 2, 4, ... up to `max_factor`) that keeps
+    the longer side of the image at least `min_side` pixels.
+    """
+    if size is None:
+        return 1
+    longest = max(size)
+    factor = 1
+    while factor * 2 <= max_factor and longest // (factor * 2) >= min_side:
+        factor *= 2
+    return factor
+
+
+def decode_image(image_bytes: bytes, reduce: int = 1) -> np.ndarray | None:
+    """Decode an encoded image (JPEG, PNG, ...) into a BGR array, or None. See REDUCED_DECODE_FLAGS."""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    with metrics.stage("decode"):
+        return cv2.imdecode(nparr, REDUCED_DECODE_FLAGS[reduce])
+
+
+def decode_for_detection(image_bytes: bytes, det_size: int) -> tuple[np.ndarray | None, float]:
+    """
+    Decode an image no larger than detection needs.
+
+    JPEGs whose longer side is several times `det_size` are decoded at a
+    reduced scale (the detector would shrink them to det_size anyway).
+    Returns (image, scale) where scale is original pixels per decoded pixel.
+    """
+    size = jpeg_size(image_bytes)
+    factor = reduced_decode_factor(size, det_size)
+    img = decode_image(image_bytes, factor)
+    if img is None or factor == 1:
+        return img, 1.0
+    # Longer sides compared: imdecode applies EXIF rotation, which may swap width and height
+    return img, max(size) / max(img.shape[:2])
@@ -0,0 +1,76 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.app.services import metrics
+
+
+class InferencePoolFull(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class InferencePool:
+    """
+    Runs blocking inference calls on worker threads so the event loop stays free.
+
+    At most `max_workers` calls run at once and up to `max_queue` more may
+    wait. Anything beyond that is rejected immediately with
+    InferencePoolFull, so callers can answer 503 instead of piling up latency.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 8):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Calls currently running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def queued(self) -> int:
+        """Calls waiting for a worker."""
+        return max(0, self._pending - self.max_workers)
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            raise InferencePoolFull(f"Inference queue is full ({self.max_queue} waiting)")
+        with self._lock:
+            self._pending += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    async def run(self, func, *args):
+        """
+        Run func(*args) on a worker thread and await its result. The call runs
+        in a copy of the caller's context (so stage timings reach its trace),
+        and its wait for a free worker is recorded as the "queue" stage.
+        """
+        self._acquire()
+        submitted = time.perf_counter()
+
+        def call():
+            metrics.record_stage("queue", time.perf_counter() - submitted)
+            return func(*args)
+
+        try:
+            future = self._executor.submit(contextvars.copy_context().run, call)
+        except BaseException:
+            self._release()
+            raise
+        # Release on the worker's future, not the awaiting task: a cancelled
+        # request must keep its slot until the thread actually finishes.
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,152 @@
+import numpy as np
+
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.search_index import l2_normalize
+
+# Ways to reduce per-sample similarities to a single score per identity
+AGGREGATIONS = ("max", "mean", "topk")
+
+
+class BatchMatcher:
+    """
+    Matches every face of an image against the gallery with one matrix product.
+
+    The (faces x samples) score matrix is reduced to (faces x identities) with
+    a segment reduction over the gallery's label array:
+      - "max":  best single enrolled sample (previous behaviour)
+      - "mean": average over all samples of the identity
+      - "topk": average of the identity's `top_k` best samples
+
+    When the gallery uses an approximate search backend, the backend first
+    proposes `candidates` nearest samples per face and only the identities
+    among them are re-ranked: scored and aggregated exactly against the
+    float32 embeddings. With `rerank` off, the backend's (possibly
+    quantized) scores of the proposed samples are aggregated instead, and
+    the float32 embeddings are not read at all.
+    """
+
+    def __init__(self, gallery: GalleryIndex, aggregation: str = "max", top_k: int = 3,
+                 candidates: int = 64, rerank: bool = True):
+        if aggregation not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{aggregation}', expected one of {AGGREGATIONS}")
+        if top_k < 1:
+            raise ValueError("top_k must be at least 1")
+        self.gallery = gallery
+        self.aggregation = aggregation
+        self.top_k = top_k
+        self.candidates = candidates
+        self.rerank = rerank
+
+        # Segment layout of the gallery, rebuilt only when the gallery version changes
+        self._segments_version = -1
+        self._order = None
+        self._starts = None
+        self._segment_labels = None
+        self._segment_sizes = None
+
+    def _segments(self):
+        if self._segments_version != self.gallery.version:
+            labels = self.gallery.labels
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+
+            self._order = order
+            self._starts = starts
+            self._segment_labels = sorted_labels[starts]
+            self._segment_sizes = np.diff(np.r_[starts, len(labels)])
+            self._segments_version = self.gallery.version
+        return self._order, self._starts, self._segment_labels, self._segment_sizes
+
+    def identity_scores(self, queries: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Score (Q, dim) queries against every identity.
+        Returns (scores (Q, M), labels (M,)) where column j belongs to labels[j].
+        """
+        queries = l2_normalize(np.atleast_2d(queries))
+        order, starts, segment_labels, sizes = self._segments()
+
+        # Single GEMM, then regroup columns so each identity is a contiguous segment
+        scores = (queries @ self.gallery.matrix.T)[:, order]
+        return self._reduce(scores, starts, sizes), segment_labels
+
+    def _reduce(self, scores: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        if self.aggregation == "max":
+            return np.maximum.reduceat(scores, starts, axis=1)
+        if self.aggregation == "mean":
+            return np.add.reduceat(scores, starts, axis=1) / sizes
+        return self._topk_mean(scores, starts, sizes)
+
+    def _topk_mean(self, scores: np.ndarray, starts: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        # Sort each row by (segment, -score) in one pass: scores lie in [-1, 1],
+        # so offsetting by 4 * segment index keeps segments apart.
+        segment_of_col = np.repeat(np.arange(len(starts)), sizes)
+        keys = segment_of_col * 4.0 - scores.astype(np.float64)
+        keys.sort(axis=1)
+        ranked = segment_of_col * 4.0 - keys
+
+        rank_in_segment = np.arange(scores.shape[1]) - starts[segment_of_col]
+        ranked[:, rank_in_segment >= self.top_k] = 0.0
+        totals = np.add.reduceat(ranked, starts, axis=1)
+        return (totals / np.minimum(sizes, self.top_k)).astype(np.float32)
+
+    def match(self, queries: np.ndarray) -> list[tuple[str | None, float]]:
+        """Return (name, aggregated similarity) of the best identity for each query."""
+        queries = np.atleast_2d(queries)
+        if len(self.gallery) == 0:
+            return [(None, 0.0)] * queries.shape[0]
+
+        if not self.gallery.backend.exact:
+            return self._match_candidates(queries)
+
+        scores, labels = self.identity_scores(queries)
+        best = np.argmax(scores, axis=1)
+        best_scores = scores[np.arange(scores.shape[0]), best]
+        return [
+            (self.gallery.name_of(int(labels[col])), float(score))
+            for col, score in zip(best, best_scores)
+        ]
+
+    def _match_candidates(self, queries: np.ndarray) -> list[tuple[str | None, float]]:
+        queries = l2_normalize(queries)
+        candidate_scores, candidates = self.gallery.backend.search(queries, self.candidates)
+        if not self.rerank:
+            return self._aggregate_candidates(candidate_scores, candidates)
+
+        order, starts, segment_labels, sizes = self._segments()
+
+        results = []
+        for query, found in zip(queries, candidates):
+            labels = np.unique(found[found >= 0])
+            if len(labels) == 0:
+                results.append((None, 0.0))
+                continue
+
+            # Gather every sample of the candidate identities, grouped per identity
+            segments = np.searchsorted(segment_labels, labels)
+            rows = np.concatenate([order[starts[s]:starts[s] + sizes[s]] for s in segments])
+            local_sizes = sizes[segments]
+            local_starts = np.r_[0, np.cumsum(local_sizes)[:-1]]
+
+            scores = self._reduce((query @ self.gallery.matrix[rows].T)[None, :], local_starts, local_sizes)[0]
+            best = int(np.argmax(scores))
+            results.append((self.gallery.name_of(int(labels[best])), float(scores[best])))
+        return results
+
+    def _aggregate_candidates(self, scores: np.ndarray, candidates: np.ndarray) -> list[tuple[str | None, float]]:
+        """Aggregate the backend's scores of the retrieved samples only, per identity."""
+        results = []
+        for row_scores, found in zip(scores, candidates):
+            valid = found >= 0
+            if not valid.any():
+                results.append((None, 0.0))
+                continue
+            # Sort by (label, -score) so each identity is a contiguous, best-first segment
+            order = np.lexsort((-row_scores[valid], found[valid]))
+            labels, ranked = found[valid][order], row_scores[valid][order][None, :]
+            starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+            sizes = np.diff(np.r_[starts, len(labels)])
+            aggregated = self._reduce(ranked, starts, sizes)[0]
+            best = int(np.argmax(aggregated))
+            results.append((self.gallery.name_of(int(labels[starts[best]])), float(aggregated[best])))
+        return results
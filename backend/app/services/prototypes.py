@@ -0,0 +1,95 @@
+import numpy as np
+
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.search_index import SearchBackend, l2_normalize
+
+
+def select_prototypes(embeddings: np.ndarray, k: int) -> np.ndarray:
+    """
+    Representatives of one identity's normalized embeddings: their
+    normalized mean (the centroid) followed by k exemplars chosen by
+    farthest-point selection, each the sample least similar to the centroid
+    and the exemplars chosen before it, so unusual photos (a profile view,
+    glasses) stay matchable. Identities with at most k + 1 samples are
+    returned as they are.
+    """
+    if len(embeddings) <= k + 1:
+        return embeddings
+    centroid = l2_normalize(embeddings.mean(axis=0))
+    # Similarity of each sample to its closest representative so far
+    closest = embeddings @ centroid
+    chosen = []
+    for _ in range(k):
+        i = int(np.argmin(closest))
+        chosen.append(i)
+        closest = np.maximum(closest, embeddings @ embeddings[i])
+    return np.vstack([centroid[None, :], embeddings[chosen]])
+
+
+class PrototypeIndex:
+    """
+    Search gallery holding at most k + 1 representatives per identity of a
+    source gallery of raw embeddings (see select_prototypes), so matching
+    cost grows with the number of people rather than of enrolled images.
+
+    The source gallery is still what the store persists, so this is only a
+    view: with prototypes turned off, matching uses every raw embedding
+    again. Identities changed in the source are recomputed by refresh().
+    """
+
+    def __init__(self, source: GalleryIndex, k: int, backend: SearchBackend | None = None):
+        if k < 1:
+            raise ValueError("k must be at least 1")
+        self.source = source
+        self.k = k
+        self.gallery = GalleryIndex(dim=source.dim, backend=backend)
+        self._dirty: set[str] = set()
+        self._rebuild = True
+        source.subscribe(self._on_change)
+
+    def _on_change(self, name: str | None):
+        if name is None:
+            self._rebuild = True
+            self._dirty.clear()
+        else:
+            self._dirty.add(name)
+
+    def refresh(self):
+        """Bring the representatives up to date with the source gallery."""
+        if self._rebuild:
+            self._rebuild = False
+            self._dirty.clear()
+            self._rebuild_all()
+            return
+        dirty, self._dirty = self._dirty, set()
+        for name in dirty:
+            self.gallery.remove(name)
+            if name in self.source:
+                self.gallery.add(name, select_prototypes(self.source.embeddings(name), self.k))
+
+    def _rebuild_all(self):
+        labels = self.source.labels
+        if len(labels) == 0:
+            self.gallery.clear()
+            return
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        sizes = np.diff(np.r_[starts, len(labels)])
+
+        # Identities small enough to keep are copied in runs; only large ones are reduced
+        matrix = self.source.matrix
+        pieces = []
+        kept_from = 0
+        for segment in np.flatnonzero(sizes > self.k + 1):
+            start, size = starts[segment], sizes[segment]
+            pieces.append(matrix[order[kept_from:start]])
+            pieces.append(select_prototypes(matrix[order[start:start + size]], self.k))
+            kept_from = start + size
+        pieces.append(matrix[order[kept_from:]])
+
+        names = [self.source.name_of(int(label)) for label in sorted_labels[starts]]
+        self.gallery.load_snapshot(np.concatenate(pieces), names, np.minimum(sizes, self.k + 1).tolist())
+
+    def __len__(self) -> int:
+        return len(self.gallery)
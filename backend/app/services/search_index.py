@@ -0,0 +1,420 @@
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Return float32 copies of `vectors` scaled to unit length along the last axis."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+# ─── Compact codes ──────────────────────────────────────────────────
+
+# How an index stores vectors: 4, 2 or ~1 bytes per dimension
+CODECS = ("float32", "float16", "int8")
+# Rows decoded to float32 at a time when scoring codes
+DECODE_BLOCK = 16384
+
+
+def encode(vectors: np.ndarray, codec: str) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Compact codes of normalized vectors: (codes, scales). int8 scales each
+    row to [-127, 127] and keeps that row's float32 scale (516 bytes per
+    512-d vector instead of 2048); the float codecs have no scales (None).
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if codec != "int8":
+        return vectors.astype(codec), None
+    scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.empty(0, dtype=np.float32)
+    scales[scales == 0] = 1.0
+    return np.rint(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def code_scores(queries: np.ndarray, codes: np.ndarray, scales: np.ndarray | None) -> np.ndarray:
+    """Inner products (Q, N) of float32 queries with encoded rows, decoding a block of rows at a time."""
+    if codes.dtype == np.float32:
+        scores = queries @ codes.T
+    else:
+        scores = np.empty((queries.shape[0], len(codes)), dtype=np.float32)
+        block = np.empty((min(DECODE_BLOCK, len(codes)), codes.shape[1]), dtype=np.float32)
+        for start in range(0, len(codes), DECODE_BLOCK):
+            rows = codes[start:start + DECODE_BLOCK]
+            np.copyto(block[:len(rows)], rows, casting="unsafe")
+            scores[:, start:start + len(rows)] = queries @ block[:len(rows)].T
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+class SearchBackend(ABC):
+    """
+    Interface of a nearest-neighbour index over L2-normalized embeddings.
+
+    Vectors are keyed by their identity label; `remove` drops every vector
+    of a label. `search` returns (scores (Q, k), labels (Q, k)) sorted by
+    descending cosine similarity, padded with -inf / -1 when fewer than k
+    vectors are reachable.
+    """
+
+    # True when search results are exact (the matcher can then skip re-scoring)
+    exact = False
+
+    @abstractmethod
+    def build(self, vectors: np.ndarray, labels: np.ndarray):
+        ...
+
+    @abstractmethod
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        ...
+
+    @abstractmethod
+    def remove(self, label: int):
+        ...
+
+    @abstractmethod
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    @property
+    @abstractmethod
+    def nbytes(self) -> int:
+        """Memory held by the index's vectors and labels."""
+
+
+def _top_k(scores: np.ndarray, labels: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Select the k best columns of each row of `scores`, padding when there are fewer."""
+    q, n = scores.shape
+    out_scores = np.full((q, k), -np.inf, dtype=np.float32)
+    out_labels = np.full((q, k), -1, dtype=np.int64)
+    if n == 0:
+        return out_scores, out_labels
+
+    kk = min(k, n)
+    idx = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    top = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-top, axis=1)
+    idx = np.take_along_axis(idx, order, axis=1)
+    out_scores[:, :kk] = np.take_along_axis(top, order, axis=1)
+    out_labels[:, :kk] = labels[idx]
+    return out_scores, out_labels
+
+
+class ExactBackend(SearchBackend):
+    """
+    Brute-force cosine search. The default backend.
+
+    `build` keeps references to the given arrays instead of copying them, so
+    attaching it to a GalleryIndex costs no extra memory: the gallery simply
+    re-binds its current matrix after every change.
+    """
+
+    exact = True
+
+    def __init__(self):
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int32)
+
+    def build(self, vectors: np.ndarray, labels: np.ndarray):
+        self._vectors = vectors
+        self._labels = labels
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        vectors = l2_normalize(np.atleast_2d(vectors))
+        if len(self._labels) == 0:
+            self._vectors = vectors
+            self._labels = np.asarray(labels)
+        else:
+            self._vectors = np.concatenate([self._vectors, vectors])
+            self._labels = np.concatenate([self._labels, labels])
+
+    def remove(self, label: int):
+        keep = self._labels != label
+        self._vectors = self._vectors[keep]
+        self._labels = self._labels[keep]
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = l2_normalize(np.atleast_2d(queries))
+        if len(self._labels) == 0:
+            return _top_k(np.empty((queries.shape[0], 0), dtype=np.float32), self._labels, k)
+        return _top_k(queries @ self._vectors.T, self._labels, k)
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    @property
+    def nbytes(self) -> int:
+        # Shared with the gallery when built from it
+        return self._vectors.nbytes + self._labels.nbytes
+
+
+class QuantizedBackend(SearchBackend):
+    """
+    Brute-force search over compact codes: "int8" (the default) needs about
+    a quarter of the memory of float32 and "float16" half.
+
+    Scores are approximate, so BatchMatcher re-ranks the candidate
+    identities against the gallery's float32 embeddings (unless re-ranking
+    is turned off). With numpy, decoding costs about as much as it saves in
+    memory traffic; the gain is memory, not speed. The service keeps the
+    float32 rows file-backed next to such a backend (GalleryIndex spill_dir),
+    so only the codes stay resident.
+    """
+
+    def __init__(self, codec: str = "int8"):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+        self.codec = codec
+        self._size = 0
+        self._codes, self._scales = encode(np.empty((0, 0), dtype=np.float32), codec)
+        self._labels = np.empty(0, dtype=np.int32)
+
+    def build(self, vectors: np.ndarray, labels: np.ndarray):
+        self._size = 0
+        self._codes, self._scales = encode(np.empty((0, 0), dtype=np.float32), self.codec)
+        self._labels = np.empty(0, dtype=np.int32)
+        if len(vectors):
+            self.add(vectors, labels)
+
+    def _reserve(self, dim: int, extra: int):
+        needed = self._size + extra
+        capacity = len(self._labels)
+        if needed <= capacity and self._codes.shape[1] == dim:
+            return
+        new_capacity = max(needed, capacity * 2)
+        codes = np.empty((new_capacity, dim), dtype=self.codec)
+        labels = np.empty(new_capacity, dtype=np.int32)
+        scales = np.empty(new_capacity, dtype=np.float32) if self._scales is not None else None
+        if self._size:
+            codes[:self._size] = self._codes[:self._size]
+            labels[:self._size] = self._labels[:self._size]
+            if scales is not None:
+                scales[:self._size] = self._scales[:self._size]
+        self._codes, self._labels, self._scales = codes, labels, scales
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        # Encoded in chunks so a large build needs no full-size float32 temporaries
+        vectors = np.atleast_2d(vectors)
+        labels = np.atleast_1d(np.asarray(labels))
+        self._reserve(vectors.shape[1], len(vectors))
+        for start in range(0, len(vectors), DECODE_BLOCK):
+            end = start + DECODE_BLOCK
+            codes, scales = encode(l2_normalize(vectors[start:end]), self.codec)
+            rows = slice(self._size, self._size + len(codes))
+            self._codes[rows] = codes
+            self._labels[rows] = labels[start:end]
+            if scales is not None:
+                self._scales[rows] = scales
+            self._size += len(codes)
+
+    def remove(self, label: int):
+        keep = self._labels[:self._size] != label
+        remaining = int(keep.sum())
+        self._codes[:remaining] = self._codes[:self._size][keep]
+        self._labels[:remaining] = self._labels[:self._size][keep]
+        if self._scales is not None:
+            self._scales[:remaining] = self._scales[:self._size][keep]
+        self._size = remaining
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = l2_normalize(np.atleast_2d(queries))
+        n = self._size
+        scales = self._scales[:n] if self._scales is not None else None
+        return _top_k(code_scores(queries, self._codes[:n], scales), self._labels[:n], k)
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        n = self._size
+        return self._codes[:n].nbytes + self._labels[:n].nbytes + (
+            self._scales[:n].nbytes if self._scales is not None else 0)
+
+
+class IVFBackend(SearchBackend):
+    """
+    Inverted-file index: a spherical k-means coarse quantizer plus one
+    inverted list of (vector, label) per centroid.
+
+    A query scans only the `nprobe` lists whose centroids are closest, so
+    cost is roughly nprobe / nlist of brute force. `nprobe` is the
+    recall/latency knob; nprobe == nlist is exact.
+
+    Until enough vectors have been seen to train the quantizer (`train_size`,
+    default 16 per list), vectors are kept in a flat buffer and searched
+    exhaustively.
+
+    The lists store vectors as `codec` codes ("float32", "float16" or
+    "int8"); only the probed lists are decoded, so a compact codec saves
+    memory at little search cost.
+    """
+
+    def __init__(self, nlist: int = 64, nprobe: int = 8, train_size: int | None = None,
+                 kmeans_iters: int = 10, seed: int = 0, codec: str = "float32"):
+        if nlist < 1 or nprobe < 1:
+            raise ValueError("nlist and nprobe must be at least 1")
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {CODECS}")
+        self.codec = codec
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 16
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+
+        self.centroids: np.ndarray | None = None
+        self._list_vectors: list[np.ndarray] = []
+        self._list_scales: list[np.ndarray] = []
+        self._list_labels: list[np.ndarray] = []
+        # label -> ids of the inverted lists holding its vectors, so remove touches only those
+        self._lists_of_label: dict[int, set[int]] = {}
+        self._pending_vectors: list[np.ndarray] = []
+        self._pending_labels: list[np.ndarray] = []
+
+    # ─── Training ───────────────────────────────────────────────────
+
+    def _kmeans(self, vectors: np.ndarray, k: int) -> np.ndarray:
+        rng = np.random.default_rng(self.seed)
+        centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, vectors)
+            empty = np.bincount(assign, minlength=k) == 0
+            # Re-seed empty clusters with random points
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+            centroids = l2_normalize(sums)
+        return centroids
+
+    def build(self, vectors: np.ndarray, labels: np.ndarray):
+        vectors = l2_normalize(np.atleast_2d(vectors)) if len(vectors) else np.asarray(vectors, np.float32)
+        labels = np.asarray(labels)
+        self.centroids = None
+        self._list_vectors, self._list_scales, self._list_labels = [], [], []
+        self._lists_of_label = {}
+        self._pending_vectors, self._pending_labels = [], []
+
+        if len(vectors) < self.train_size:
+            if len(vectors):
+                self._pending_vectors.append(vectors)
+                self._pending_labels.append(labels)
+            return
+
+        nlist = min(self.nlist, len(vectors))
+        self.centroids = self._kmeans(vectors, nlist)
+        self._list_vectors = [np.empty((0, vectors.shape[1]), dtype=self.codec) for _ in range(nlist)]
+        self._list_scales = [np.empty(0, dtype=np.float32) for _ in range(nlist)]
+        self._list_labels = [np.empty(0, dtype=labels.dtype) for _ in range(nlist)]
+        self._insert(vectors, labels)
+
+    def _insert(self, vectors: np.ndarray, labels: np.ndarray):
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        codes, scales = encode(vectors, self.codec)
+        for list_id in np.unique(assign):
+            mask = assign == list_id
+            self._list_vectors[list_id] = np.concatenate([self._list_vectors[list_id], codes[mask]])
+            if scales is not None:
+                self._list_scales[list_id] = np.concatenate([self._list_scales[list_id], scales[mask]])
+            self._list_labels[list_id] = np.concatenate([self._list_labels[list_id], labels[mask]])
+            for label in np.unique(labels[mask]):
+                self._lists_of_label.setdefault(int(label), set()).add(int(list_id))
+
+    # ─── Updates ────────────────────────────────────────────────────
+
+    def add(self, vectors: np.ndarray, labels: np.ndarray):
+        vectors = l2_normalize(np.atleast_2d(vectors))
+        labels = np.atleast_1d(np.asarray(labels))
+        if self.centroids is not None:
+            self._insert(vectors, labels)
+            return
+
+        self._pending_vectors.append(vectors)
+        self._pending_labels.append(labels)
+        if sum(len(v) for v in self._pending_vectors) >= self.train_size:
+            self.build(np.concatenate(self._pending_vectors), np.concatenate(self._pending_labels))
+
+    def remove(self, label: int):
+        if self.centroids is None:
+            for i, labels in enumerate(self._pending_labels):
+                keep = labels != label
+                self._pending_vectors[i] = self._pending_vectors[i][keep]
+                self._pending_labels[i] = labels[keep]
+            return
+
+        for list_id in self._lists_of_label.pop(int(label), ()):
+            keep = self._list_labels[list_id] != label
+            self._list_vectors[list_id] = self._list_vectors[list_id][keep]
+            if self.codec == "int8":
+                self._list_scales[list_id] = self._list_scales[list_id][keep]
+            self._list_labels[list_id] = self._list_labels[list_id][keep]
+
+    # ─── Search ─────────────────────────────────────────────────────
+
+    def search(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        queries = l2_normalize(np.atleast_2d(queries))
+
+        if self.centroids is None:
+            if not self._pending_vectors:
+                return _top_k(np.empty((queries.shape[0], 0), dtype=np.float32), np.empty(0, np.int64), k)
+            vectors = np.concatenate(self._pending_vectors)
+            return _top_k(queries @ vectors.T, np.concatenate(self._pending_labels), k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        all_scores = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        all_labels = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        for i, probe in enumerate(probes):
+            codes = np.concatenate([self._list_vectors[j] for j in probe])
+            scales = np.concatenate([self._list_scales[j] for j in probe]) if self.codec == "int8" else None
+            labels = np.concatenate([self._list_labels[j] for j in probe])
+            scores, found = _top_k(code_scores(queries[i:i + 1], codes, scales), labels, k)
+            all_scores[i], all_labels[i] = scores[0], found[0]
+        return all_scores, all_labels
+
+    def __len__(self) -> int:
+        return sum(len(labels) for labels in self._list_labels) + sum(len(l) for l in self._pending_labels)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = self._list_vectors + self._list_scales + self._list_labels
+        arrays += self._pending_vectors + self._pending_labels
+        if self.centroids is not None:
+            arrays.append(self.centroids)
+        return sum(a.nbytes for a in arrays)
+
+
+BACKENDS = {
+    "exact": ExactBackend,
+    "ivf": IVFBackend,
+    "quantized": QuantizedBackend,
+}
+# Backends that store compact codes and take a `codec` parameter
+CODEC_BACKENDS = ("ivf", "quantized")
+
+
+def make_backend(name: str = "exact", **params) -> SearchBackend:
+    """Create a search backend by name ("exact", "ivf" or "quantized") with backend-specific params."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}', expected one of {list(BACKENDS)}")
+    try:
+        return BACKENDS[name](**params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters {params} for search backend '{name}': {e}")
+
+
+def recall_at_1(backend: SearchBackend, reference: SearchBackend, queries: np.ndarray) -> float:
+    """Fraction of queries whose top-1 label from `backend` agrees with the exact `reference`."""
+    _, found = backend.search(queries, 1)
+    _, truth = reference.search(queries, 1)
+    return float(np.mean(found[:, 0] == truth[:, 0]))
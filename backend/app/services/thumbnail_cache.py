@@ -0,0 +1,82 @@
+import os
+import threading
+from collections import OrderedDict
+
+
+class ThumbnailCache:
+    """
+    LRU of thumbnail JPEG bytes, keyed by user name.
+
+    Every lookup stats the file and re-reads it only when its mtime or size
+    changed, so entries stay correct even when another worker process
+    rewrites a thumbnail. `invalidate` drops an entry right away after a
+    re-register, rename or delete in this process.
+    """
+
+    def __init__(self, thumb_dir: str, max_entries: int = 1024):
+        self.thumb_dir = thumb_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # name -> (stat signature, jpeg bytes, etag, mtime)
+        self._entries: OrderedDict[str, tuple] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.thumb_dir, f"{name}.jpg")
+
+    @staticmethod
+    def _etag(st: os.stat_result) -> str:
+        return f"{st.st_mtime_ns:x}-{st.st_size:x}"
+
+    def version(self, name: str) -> str | None:
+        """ETag of the current thumbnail (from stat alone), or None if there is none."""
+        try:
+            return self._etag(os.stat(self.path(name)))
+        except OSError:
+            return None
+
+    def get(self, name: str) -> tuple[bytes, str, float] | None:
+        """Return (jpeg bytes, etag, mtime) of a user's thumbnail, or None."""
+        path = self.path(name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.invalidate(name)
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry[1:]
+            self.misses += 1
+
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        entry = (signature, data, self._etag(st), st.st_mtime)
+        with self._lock:
+            self._entries[name] = entry
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry[1:]
+
+    def invalidate(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
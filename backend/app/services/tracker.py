@@ -0,0 +1,129 @@
+import numpy as np
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Pairwise intersection-over-union of (N, 4) and (M, 4) x1y1x2y2 boxes."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+def face_quality(bbox, det_score: float, min_side: int = 112) -> float:
+    """Detection confidence, discounted for faces smaller than the recognizer input."""
+    x1, y1, x2, y2 = bbox
+    return float(det_score) * min(1.0, min(x2 - x1, y2 - y1) / min_side)
+
+
+class Track:
+    """One face followed across frames, with the identity from its last embedding."""
+
+    def __init__(self, track_id: int, bbox: np.ndarray):
+        self.track_id = track_id
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.velocity = np.zeros(4, dtype=np.float32)
+        self.hits = 1
+        self.missed = 0
+        # Identity from the last embedding; None until the track is first embedded
+        self.name: str | None = None
+        self.similarity = 0.0
+        self.embedded_at = -1
+        self.embedded_quality = 0.0
+
+    def predict(self) -> np.ndarray:
+        """Box expected in the next frame under constant velocity."""
+        return self.bbox + self.velocity
+
+    def correct(self, bbox: np.ndarray, gain: float):
+        """Blend the new detection into the position and velocity (a fixed-gain alpha-beta filter)."""
+        bbox = np.asarray(bbox, dtype=np.float32)
+        self.velocity = (1 - gain) * self.velocity + gain * (bbox - self.bbox)
+        self.bbox = bbox
+        self.hits += 1
+        self.missed = 0
+
+
+class FaceTracker:
+    """
+    Associates detections across the frames of one stream so recognition
+    only runs when it can change the answer.
+
+    Detections are matched to the predicted boxes of live tracks greedily by
+    IoU. A face needs an embedding when its track is new, when
+    `refresh_every` frames have passed since its last embedding, or when its
+    quality (see face_quality) beats the quality it was embedded at by
+    `quality_gain`. Other faces reuse their track's identity.
+    Tracks unmatched for more than `max_missed` frames are dropped.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_missed: int = 5, refresh_every: int = 15,
+                 quality_gain: float = 0.1, velocity_gain: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.refresh_every = refresh_every
+        self.quality_gain = quality_gain
+        self.velocity_gain = velocity_gain
+
+        self.tracks: list[Track] = []
+        self.frame = 0
+        self._next_id = 1
+
+    def update(self, boxes: np.ndarray, qualities: list[float]) -> list[tuple[Track, bool]]:
+        """
+        Advance one frame with its detections. Returns one (track, needs_embedding)
+        per detection, in detection order.
+        """
+        self.frame += 1
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        assigned: list[Track | None] = [None] * len(boxes)
+        matched: set[int] = set()
+
+        if self.tracks and len(boxes):
+            predicted = np.stack([track.predict() for track in self.tracks])
+            overlaps = iou_matrix(predicted, boxes)
+            # Greedy assignment, best overlap first
+            for flat in np.argsort(-overlaps, axis=None):
+                t, d = np.unravel_index(flat, overlaps.shape)
+                if overlaps[t, d] < self.iou_threshold:
+                    break
+                if assigned[d] is not None or t in matched:
+                    continue
+                self.tracks[t].correct(boxes[d], self.velocity_gain)
+                matched.add(int(t))
+                assigned[d] = self.tracks[t]
+
+        for i, track in enumerate(self.tracks):
+            if i not in matched:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        results = []
+        for d, box in enumerate(boxes):
+            track = assigned[d]
+            if track is None:
+                track = Track(self._next_id, box)
+                self._next_id += 1
+                self.tracks.append(track)
+            results.append((track, self._needs_embedding(track, qualities[d])))
+        return results
+
+    def _needs_embedding(self, track: Track, quality: float) -> bool:
+        return (
+            track.embedded_at < 0
+            or self.frame - track.embedded_at >= self.refresh_every
+            or quality >= track.embedded_quality + self.quality_gain
+        )
+
+    def assign(self, track: Track, name: str | None, similarity: float, quality: float):
+        """Record the identity found for a freshly embedded track."""
+        track.name = name
+        track.similarity = similarity
+        track.embedded_at = self.frame
+        track.embedded_quality = quality
@@ -0,0 +1,218 @@
+import base64
+import json
+import unicodedata
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import MutableMapping
+
+# Fields /users can be sorted by
+SORT_FIELDS = ("name", "created_at", "updated_at", "image_count")
+
+# Initial consonants (choseong) of Hangul syllables, in Unicode order
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_HANGUL_START, _HANGUL_END = 0xAC00, 0xD7A3
+
+
+def normalize(text: str) -> str:
+    """Case- and composition-insensitive form used for searching (NFC + casefold)."""
+    return unicodedata.normalize("NFC", text).casefold()
+
+
+def initials(text: str) -> str:
+    """Replace each Hangul syllable by its initial consonant: "홍길동" -> "ㅎㄱㄷ"."""
+    out = []
+    for ch in text:
+        code = ord(ch)
+        if _HANGUL_START <= code <= _HANGUL_END:
+            out.append(_CHOSEONG[(code - _HANGUL_START) // 588])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _is_initials_query(query: str) -> bool:
+    return any(ch in _CHOSEONG for ch in query) and all(ch in _CHOSEONG or ch.isspace() for ch in query)
+
+
+def encode_cursor(key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, ensure_ascii=False).encode('utf-8')).decode()
+
+
+def decode_cursor(cursor: str, field: str) -> tuple:
+    """Index key in `cursor`, checked against the key shape of sort `field`."""
+    try:
+        key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    value_type = int if field == "image_count" else str
+    if (len(key) != 2 or not isinstance(key[1], str)
+            or not isinstance(key[0], value_type) or isinstance(key[0], bool)):
+        raise ValueError(f"Invalid cursor for sort field '{field}'")
+    return key
+
+
+class UserIndex(MutableMapping):
+    """
+    User metadata {name: {"created_at", "updated_at", "image_count"}} with
+    sorted indexes for listing, maintained incrementally.
+
+    One sorted list of (sort value, name) per field in SORT_FIELDS is updated
+    with bisect on every set or delete, so a page of a sorted listing is a
+    slice instead of a sort of the whole roster. Entries must be replaced,
+    not mutated in place, for the indexes to see the change (see
+    embedding_store.apply_add).
+
+    Search matches a name prefix by bisecting the name index, or a
+    substring anywhere in the name. Both ignore case and Unicode
+    composition, and a query made of Hangul initial consonants (e.g. "ㅎㄱ")
+    matches names by their initials ("홍길동").
+    """
+
+    def __init__(self, entries: dict[str, dict] | None = None):
+        self._entries: dict[str, dict] = {}
+        self._sorted: dict[str, list[tuple]] = {field: [] for field in SORT_FIELDS}
+        # name -> (normalized name, initials), precomputed for searching
+        self._search_keys: dict[str, tuple[str, str]] = {}
+        if entries:
+            self.update(entries)
+
+    # ─── Mapping ────────────────────────────────────────────────────
+
+    @staticmethod
+    def _key(field: str, name: str, entry: dict) -> tuple:
+        if field == "name":
+            return normalize(name), name
+        if field == "image_count":
+            return int(entry.get("image_count") or 0), name
+        value = entry.get(field)
+        return (value if isinstance(value, str) and value != "N/A" else ""), name
+
+    def __getitem__(self, name: str) -> dict:
+        return self._entries[name]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def __setitem__(self, name: str, entry: dict):
+        old = self._entries.get(name)
+        if old is not None:
+            self._unindex(name, old)
+        self._entries[name] = entry
+        for field in SORT_FIELDS:
+            insort(self._sorted[field], self._key(field, name, entry))
+        normalized = normalize(name)
+        self._search_keys[name] = (normalized, initials(normalized))
+
+    def __delitem__(self, name: str):
+        entry = self._entries.pop(name)
+        self._unindex(name, entry)
+        del self._search_keys[name]
+
+    def _unindex(self, name: str, entry: dict):
+        for field in SORT_FIELDS:
+            keys = self._sorted[field]
+            key = self._key(field, name, entry)
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    def clear(self):
+        self._entries.clear()
+        self._search_keys.clear()
+        for keys in self._sorted.values():
+            keys.clear()
+
+    def update(self, other=(), /, **kwargs):
+        """Bulk insert; into an empty index each sorted list is built with one sort."""
+        items = dict(other, **kwargs)
+        if self._entries:
+            for name, entry in items.items():
+                self[name] = entry
+            return
+        self._entries.update(items)
+        for name in items:
+            normalized = normalize(name)
+            self._search_keys[name] = (normalized, initials(normalized))
+        for field in SORT_FIELDS:
+            self._sorted[field] = sorted(self._key(field, name, entry) for name, entry in items.items())
+
+    # ─── Queries ────────────────────────────────────────────────────
+
+    def _matches(self, search: str, mode: str) -> set[str] | None:
+        """Names matching `search`, or None for no filter."""
+        query = normalize(search.strip())
+        if not query:
+            return None
+        if _is_initials_query(query):
+            query = query.replace(" ", "")
+            if mode == "prefix":
+                return {n for n, (_, ini) in self._search_keys.items() if ini.startswith(query)}
+            return {n for n, (_, ini) in self._search_keys.items() if query in ini}
+        if mode == "prefix":
+            keys = self._sorted["name"]
+            start = bisect_left(keys, (query,))
+            end = bisect_left(keys, (query + "\U0010ffff",))
+            return {name for _, name in keys[start:end]}
+        return {n for n, (norm, _) in self._search_keys.items() if query in norm}
+
+    def query(self, search: str | None = None, mode: str = "substring", sort: str = "name",
+              order: str = "asc", offset: int = 0, limit: int | None = None,
+              cursor: str | None = None) -> dict:
+        """
+        One page of user names.
+
+        `search` filters by name (`mode` "prefix" or "substring"); results are
+        sorted by `sort` in `order`. Page with `offset`/`limit`, or pass the
+        `next_cursor` of the previous page as `cursor`, which stays stable
+        while users are added or removed. Returns {"names", "matched",
+        "next_cursor"}.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"Unknown sort field '{sort}', expected one of {list(SORT_FIELDS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be 'asc' or 'desc'")
+        if mode not in ("prefix", "substring"):
+            raise ValueError("mode must be 'prefix' or 'substring'")
+
+        keys = self._sorted[sort]
+        matched = self._matches(search, mode) if search else None
+        total = len(keys) if matched is None else len(matched)
+
+        # Position in the sorted index where the page starts
+        descending = order == "desc"
+        if cursor:
+            after = decode_cursor(cursor, sort)
+            start = bisect_left(keys, after) - 1 if descending else bisect_right(keys, after)
+        else:
+            start = len(keys) - 1 if descending else 0
+            if matched is None:
+                start = start - offset if descending else start + offset
+                offset = 0
+        step = -1 if descending else 1
+
+        page: list[tuple] = []
+        i = start
+        has_more = False
+        while 0 <= i < len(keys):
+            key = keys[i]
+            i += step
+            if matched is not None and key[1] not in matched:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            if limit is not None and len(page) == limit:
+                has_more = True
+                break
+            page.append(key)
+
+        return {
+            "names": [name for _, name in page],
+            "matched": total,
+            "next_cursor": encode_cursor(page[-1]) if has_more and page else None,
+        }
@@ -0,0 +1,412 @@
+"""
+Offline tools: recognize a folder of images or a video file, re-embed the
+gallery after a model change, and convert the gallery between formats.
+
+Usage:
+    python -m backend.cli recognize photos/ --output results.csv --workers 4
+    python -m backend.cli recognize entrance.mp4 --every 10 --output results.parquet
+    python -m backend.cli reembed enrollment_photos/ --output backend/data.new
+    python -m backend.cli convert backend/data gallery.npz
+
+recognize and reembed save their progress as they go; run them again with
+--resume after an interruption to skip the work already done.
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+
+# One row per detected face; images and frames without faces (or that
+# failed) get a single row with an empty face column, so every input is in the output
+COLUMNS = ["source", "frame", "time_s", "face", "name", "similarity", "det_score", "x1", "y1", "x2", "y2", "error"]
+
+
+class Progress:
+    """Prints done/total, rate and ETA to stderr at most every `interval` seconds."""
+
+    def __init__(self, total: int, done: int = 0, unit: str = "images", interval: float = 2.0):
+        self.total = total
+        self.done = done
+        self.unit = unit
+        self.interval = interval
+        self._started = time.perf_counter()
+        self._new = 0
+        self._printed = 0.0
+
+    def update(self, count: int):
+        self.done += count
+        self._new += count
+        now = time.perf_counter()
+        if now - self._printed >= self.interval or self.done >= self.total:
+            self._printed = now
+            self._print(now)
+
+    def _print(self, now: float):
+        elapsed = now - self._started
+        rate = self._new / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else 0.0
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        print(f"{self.done}/{self.total} {self.unit} ({percent:.1f}%), {rate:.1f}/s, ETA {eta:.0f}s",
+              file=sys.stderr, flush=True)
+
+
+# ─── Result files ──────────────────────────────────────────────────
+
+class CsvResults:
+    """
+    CSV results appended one chunk at a time. After each chunk, the file
+    size and the chunk's inputs are appended to `<output>.progress`; on
+    resume the CSV is cut back to the last recorded size, dropping rows of
+    a chunk that was interrupted, and the recorded inputs are skipped.
+    """
+
+    def __init__(self, path: str, resume: bool):
+        self.progress_path = path + ".progress"
+        self.done: set[tuple[str, int | None]] = set()
+        offset = self._read_progress() if resume and os.path.exists(path) else None
+        if offset is None:
+            self.done.clear()
+            self.file = open(path, 'wb')
+            self.file.write(self._encode([], header=True))
+            self.progress = open(self.progress_path, 'w', encoding='utf-8')
+        else:
+            self.file = open(path, 'r+b')
+            self.file.truncate(offset)
+            self.file.seek(offset)
+            self.progress = open(self.progress_path, 'a', encoding='utf-8')
+
+    def _read_progress(self) -> int | None:
+        if not os.path.exists(self.progress_path):
+            return None
+        offset = None
+        with open(self.progress_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn last line
+                offset = record["offset"]
+                self.done.update((source, frame) for source, frame in record["inputs"])
+        return offset
+
+    @staticmethod
+    def _encode(rows: list[dict], header: bool = False) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, COLUMNS, lineterminator="\n")
+        if header:
+            writer.writeheader()
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def write(self, inputs: list[tuple[str, int | None]], rows: list[dict]):
+        self.file.write(self._encode(rows))
+        self.file.flush()
+        self.progress.write(json.dumps({"offset": self.file.tell(), "inputs": inputs}, ensure_ascii=False) + "\n")
+        self.progress.flush()
+
+    def close(self):
+        self.file.close()
+        self.progress.close()
+
+
+class ParquetResults:
+    """
+    Parquet dataset: a directory with one part file per chunk, each written
+    atomically (readable as one table with pyarrow.dataset or pandas). On
+    resume the inputs already in the part files are skipped.
+    """
+
+    def __init__(self, path: str, resume: bool):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self.pa, self.pq = pa, pq
+        self.schema = pa.schema([
+            ("source", pa.string()), ("frame", pa.int64()), ("time_s", pa.float64()), ("face", pa.int64()),
+            ("name", pa.string()), ("similarity", pa.float64()), ("det_score", pa.float64()),
+            ("x1", pa.int64()), ("y1", pa.int64()), ("x2", pa.int64()), ("y2", pa.int64()), ("error", pa.string()),
+        ])
+        self.path = path
+        self.done: set[tuple[str, int | None]] = set()
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+        for part in parts:
+            if resume:
+                table = pq.read_table(part, columns=["source", "frame"])
+                self.done.update(zip(table.column("source").to_pylist(), table.column("frame").to_pylist()))
+            else:
+                os.remove(part)
+        self.parts = len(parts) if resume else 0
+
+    def write(self, inputs: list[tuple[str, int | None]], rows: list[dict]):
+        part = os.path.join(self.path, f"part-{self.parts:06d}.parquet")
+        self.pq.write_table(self.pa.Table.from_pylist(rows, schema=self.schema), part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self.parts += 1
+
+    def close(self):
+        pass
+
+
+def open_results(path: str, resume: bool) -> CsvResults | ParquetResults:
+    if path.lower().endswith(".parquet"):
+        return ParquetResults(path, resume)
+    return CsvResults(path, resume)
+
+
+# ─── recognize ─────────────────────────────────────────────────────
+
+def list_images(root: str) -> list[str]:
+    """Relative paths of the images under `root`, in sorted order."""
+    from backend.app.services.enrollment import image_path
+
+    images = []
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for filename in sorted(files):
+            relative = os.path.relpath(os.path.join(directory, filename), root)
+            if image_path(relative) is not None:
+                images.append(relative)
+    return images
+
+
+def video_info(path: str) -> tuple[int, float]:
+    """(frame count, frames per second) of a video file."""
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise SystemExit(f"Cannot open video '{path}'")
+        return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)), capture.get(cv2.CAP_PROP_FPS) or 0.0
+    finally:
+        capture.release()
+
+
+def result_rows(source: str, frame: int | None, time_s: float | None, output: list | dict) -> list[dict]:
+    base = {"source": source, "frame": frame, "time_s": time_s}
+    if isinstance(output, dict):
+        return [{**base, "error": output["error"]}]
+    if not output:
+        return [base]
+    return [
+        {**base, "face": i, "name": face["name"], "similarity": round(face["similarity"], 4),
+         "det_score": round(face["score"], 4), "x1": face["bbox"][0], "y1": face["bbox"][1],
+         "x2": face["bbox"][2], "y2": face["bbox"][3]}
+        for i, face in enumerate(output)
+    ]
+
+
+# Per worker process: its own service (ONNX sessions) over the shared, memory-mapped gallery
+_service = None
+_det_size = None
+
+
+def _init_worker(data_dir: str | None, det_size: str | None):
+    global _service, _det_size
+    from backend.app.services.face_recognition import configured_service
+
+    _service = configured_service(data_dir=data_dir)
+    _det_size = det_size
+
+
+def _read_frames(path: str, frames: list[int]):
+    """Yield (frame number, BGR image or None) for increasing frame numbers, seeking once."""
+    import cv2
+
+    capture = cv2.VideoCapture(path)
+    try:
+        capture.set(cv2.CAP_PROP_POS_FRAMES, frames[0])
+        position = frames[0]
+        for frame in frames:
+            while position < frame:
+                capture.grab()
+                position += 1
+            ok, img = capture.read()
+            position += 1
+            yield frame, img if ok else None
+    finally:
+        capture.release()
+
+
+def _recognize_chunk(task: tuple) -> tuple[list, list[dict]]:
+    """
+    Analyze one chunk of inputs in a worker: images are recognized together
+    (one recognition batch), video frames one at a time.
+    Returns (the chunk's inputs, result rows).
+    """
+    path, fps, inputs = task
+    rows = []
+    if fps is None:
+        images, outputs = [], {}
+        for i, (source, _) in enumerate(inputs):
+            try:
+                with open(os.path.join(path, source), 'rb') as f:
+                    images.append(f.read())
+            except OSError as e:
+                images.append(b"")
+                outputs[i] = {"error": str(e)}
+        analyzed = _service.analyze_images(images, _det_size)
+        for i, ((source, _), output) in enumerate(zip(inputs, analyzed)):
+            rows += result_rows(source, None, None, outputs.get(i, output))
+    else:
+        source = inputs[0][0]
+        for frame, img in _read_frames(path, [frame for _, frame in inputs]):
+            output = _service.analyze_frame(img, det_size=_det_size) if img is not None else {
+                "error": "Failed to read frame"}
+            rows += result_rows(source, frame, round(frame / fps, 3) if fps else None, output)
+    return inputs, rows
+
+
+def recognize(args):
+    if os.path.isdir(args.input):
+        fps = None
+        inputs = [(source, None) for source in list_images(args.input)]
+        unit = "images"
+    elif args.input.lower().endswith(VIDEO_EXTENSIONS):
+        frame_count, fps = video_info(args.input)
+        source = os.path.basename(args.input)
+        inputs = [(source, frame) for frame in range(0, frame_count, max(1, args.every))]
+        unit = "frames"
+    else:
+        raise SystemExit(f"'{args.input}' is neither a folder nor a video file ({', '.join(VIDEO_EXTENSIONS)})")
+
+    results = open_results(args.output, args.resume)
+    pending = [item for item in inputs if item not in results.done]
+    progress = Progress(len(inputs), len(inputs) - len(pending), unit)
+    if len(pending) < len(inputs):
+        print(f"Resuming: {len(inputs) - len(pending)} {unit} already done.", file=sys.stderr)
+    tasks = [(args.input, fps, pending[i:i + args.chunk]) for i in range(0, len(pending), args.chunk)]
+
+    try:
+        if args.workers > 0 and tasks:
+            # Workers inherit the environment; split the cores between their ONNX sessions
+            os.environ.setdefault("FACE_ORT_THREADS", str(max(1, (os.cpu_count() or 1) // args.workers)))
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(args.workers, _init_worker, (args.data_dir, args.det_size)) as pool:
+                for chunk, rows in pool.imap(_recognize_chunk, tasks):
+                    results.write(chunk, rows)
+                    progress.update(len(chunk))
+        else:
+            _init_worker(args.data_dir, args.det_size)
+            for chunk, rows in map(_recognize_chunk, tasks):
+                results.write(chunk, rows)
+                progress.update(len(chunk))
+    finally:
+        results.close()
+    print(f"Recognized {len(inputs)} {unit}; results in {args.output}")
+
+
+# ─── reembed ───────────────────────────────────────────────────────
+
+def reembed(args):
+    """
+    Build a fresh gallery in --output by enrolling every name/*.jpg photo
+    under the images folder with the current model pack. The store keeps
+    only embeddings, so a model change needs the original photos.
+
+    Enrolled photos are appended to `reembed.progress` in the output after
+    each batch is persisted; after a crash at most one batch is enrolled twice.
+    """
+    from backend.app import config
+    from backend.app.services.enrollment import identity_of, iter_folder
+    from backend.app.services.face_recognition import configured_service
+
+    if not os.path.isdir(args.images):
+        raise SystemExit(f"'{args.images}' is not a directory")
+    service = configured_service(data_dir=args.output, model_pack=args.model_pack)
+    service._ensure_gallery()
+    progress_path = os.path.join(args.output, "reembed.progress")
+    done = set()
+    if args.resume and os.path.exists(progress_path):
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            done = {line.rstrip("\n") for line in f}
+    elif len(service.gallery):
+        raise SystemExit(f"'{args.output}' already holds a gallery; pass --resume to continue filling it")
+
+    total = sum(identity_of(source) is not None for source in list_images(args.images))
+    progress = Progress(total, len(done))
+    failed = 0
+    with open(progress_path, 'a' if args.resume else 'w', encoding='utf-8') as log:
+        for result in service.enroll(iter_folder(args.images, config.ENROLL_MAX_IMAGE_BYTES, skip=done),
+                                     args.det_size):
+            log.write(result["source"] + "\n")
+            if result["status"] != "success":
+                failed += 1
+                print(f"{result['source']}: {result['message']}", file=sys.stderr)
+            progress.update(1)
+            log.flush()
+    service.store.compact()
+    service.store.close()
+    print(f"Re-embedded {len(service.gallery)} images of {len(service.gallery.names())} people into "
+          f"{args.output} ({failed} failed). Replace backend/data with it to serve the new gallery.")
+
+
+# ─── convert ───────────────────────────────────────────────────────
+
+def convert(args):
+    from backend.app.services.gallery_io import detect_format, read_gallery, write_gallery
+
+    source_format = args.source_format or detect_format(args.source)
+    target_format = args.to or detect_format(args.destination)
+    try:
+        gallery, meta = read_gallery(args.source, source_format)
+        write_gallery(gallery, meta, args.destination, target_format)
+    except (OSError, ValueError, KeyError) as e:
+        raise SystemExit(f"Conversion failed: {e}")
+    print(f"Converted {len(gallery)} embeddings of {len(gallery.names())} people: "
+          f"{args.source} ({source_format}) -> {args.destination} ({target_format})")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Face Recognition - offline tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("recognize", help="Recognize faces in a folder of images or a video file")
+    p.add_argument("input", help="Folder (searched recursively) or video file")
+    p.add_argument("--output", required=True, help="Results file: .csv, or .parquet (a directory of parts)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                   help="Worker processes, each with its own models (0 = run in this process)")
+    p.add_argument("--chunk", type=int, default=32, help="Images or frames per worker task")
+    p.add_argument("--every", type=int, default=1, help="Analyze every Nth video frame")
+    p.add_argument("--det-size", default=None, help="Detection size in pixels or a profile name")
+    p.add_argument("--data-dir", default=None, help="Gallery to match against (default: backend/data)")
+    p.add_argument("--resume", action="store_true", help="Skip inputs already in the output")
+    p.set_defaults(func=recognize)
+
+    p = commands.add_parser("reembed", help="Rebuild the gallery from the enrollment photos with the current model")
+    p.add_argument("images", help="Folder laid out as name/*.jpg")
+    p.add_argument("--output", required=True, help="Data directory for the new gallery")
+    p.add_argument("--model-pack", default=None, help="InsightFace pack (default: FACE_MODEL_PACK)")
+    p.add_argument("--det-size", default=None, help="Detection size in pixels or a profile name")
+    p.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    p.set_defaults(func=reembed)
+
+    from backend.app.services.gallery_io import FORMATS
+    p = commands.add_parser("convert", help="Convert the gallery between storage formats")
+    p.add_argument("source", help="Data directory or .npz file")
+    p.add_argument("destination", help="New data directory or .npz file")
+    p.add_argument("--from", dest="source_format", choices=FORMATS, default=None,
+                   help="Source format (default: detected)")
+    p.add_argument("--to", choices=FORMATS, default=None,
+                   help="Destination format (default: npz for .npz paths, otherwise snapshot)")
+    p.set_defaults(func=convert)
+    return parser
+
+
+def main(argv: list[str] | None = None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
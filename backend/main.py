@@ -1,12 +1,41 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.api.endpoints import router as api_router
+from fastapi.responses import JSONResponse, Response
+from backend.app import config
+from backend.app.api.endpoints import router as api_router, inference_pool, predict_batchers
+from backend.app.services import metrics
+from backend.app.services.face_recognition import face_service
 import uvicorn
 
+# Measured from import so the readiness report includes interpreter + app import time
+_process_started = time.perf_counter()
+
+
+async def _warmup():
+    loop = asyncio.get_running_loop()
+    ready = await loop.run_in_executor(None, face_service.warmup)
+    if ready:
+        print(f"Face models ready {time.perf_counter() - _process_started:.2f}s after startup.")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: /health answers at once while /ready reports progress
+    warmup_task = asyncio.create_task(_warmup()) if config.WARMUP_ON_STARTUP else None
+    yield
+    if warmup_task is not None:
+        warmup_task.cancel()
+    inference_pool.shutdown()
+
+
 app = FastAPI(
     title="Face Recognition Dashboard API",
     description="얼굴 인식 대시보드 백엔드 API - InsightFace 기반 얼굴 감지, 식별, 등록",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Setup CORS to allow frontend requests
@@ -19,7 +48,60 @@ app.add_middleware(
 )
 
 # Include API router
-app.include_router(api_router, prefix="/api")
+API_PREFIX = "/api"
+app.include_router(api_router, prefix=API_PREFIX)
+
+
+# ─── Metrics ────────────────────────────────────────────────────────
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request; with FACE_DEBUG_TIMING, report its stages in Server-Timing."""
+    trace = metrics.start_trace()
+    started = request.state.started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    # Label by route template, not the raw path, so /users/{name} is one series
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    if route is not None and route in api_router.routes and not path.startswith(API_PREFIX):
+        path = API_PREFIX + path
+    metrics.HTTP_REQUESTS.inc(method=request.method, route=path, status=response.status_code)
+    metrics.HTTP_SECONDS.observe(elapsed, method=request.method, route=path)
+    if config.DEBUG_TIMING_HEADER:
+        response.headers["Server-Timing"] = metrics.server_timing(trace, elapsed)
+    return response
+
+
+# Read at scrape time. Each worker process of backend/serve.py reports its own values.
+metrics.REGISTRY.collect("face_inference_pending", "Inference calls running or waiting for a worker",
+                         lambda: inference_pool.pending)
+metrics.REGISTRY.collect("face_inference_queued", "Inference calls waiting for a worker",
+                         lambda: inference_pool.queued)
+metrics.REGISTRY.collect("face_predict_batch_waiting", "/predict images waiting for their batch",
+                         lambda: {(str(size),): b.pending for size, b in predict_batchers.items()},
+                         ("det_size",))
+metrics.REGISTRY.collect("face_gallery_identities", "Registered people", lambda: len(face_service.gallery.names()))
+metrics.REGISTRY.collect("face_gallery_embeddings", "Registered face embeddings", lambda: len(face_service.gallery))
+metrics.REGISTRY.collect("face_models_ready", "1 once the models and gallery are loaded",
+                         lambda: int(face_service.is_ready))
+metrics.REGISTRY.collect("face_embedding_cache_hits_total", "Embedding cache hits",
+                         lambda: face_service.embedding_cache.hits, kind="counter")
+metrics.REGISTRY.collect("face_embedding_cache_misses_total", "Embedding cache misses",
+                         lambda: face_service.embedding_cache.misses, kind="counter")
+metrics.REGISTRY.collect("face_embedding_cache_bytes", "Bytes held by the embedding cache",
+                         lambda: face_service.embedding_cache.nbytes)
+metrics.REGISTRY.collect("face_thumbnail_cache_hits_total", "Thumbnail cache hits",
+                         lambda: face_service.thumbnails.hits, kind="counter")
+metrics.REGISTRY.collect("face_thumbnail_cache_misses_total", "Thumbnail cache misses",
+                         lambda: face_service.thumbnails.misses, kind="counter")
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.get("/")
@@ -29,12 +111,18 @@ def read_root():
         "docs": "/docs",
         "endpoints": {
             "predict": "POST /api/predict",
+            "predict_batch": "POST /api/predict/batch",
+            "stream": "WS /api/stream",
             "register": "POST /api/register",
             "register_multiple": "POST /api/register/multiple",
+            "register_bulk": "POST /api/register/bulk",
             "list_users": "GET /api/users",
             "get_user": "GET /api/users/{name}",
             "update_user": "PUT /api/users/{name}",
             "delete_user": "DELETE /api/users/{name}",
+            "cache_stats": "GET /api/cache",
+            "ready": "GET /ready",
+            "metrics": "GET /metrics",
         }
     }
 
@@ -44,5 +132,13 @@ def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe: 200 once the models and gallery are loaded, 503 while warming up."""
+    report = face_service.readiness()
+    report["status"] = "ready" if report["ready"] else "loading"
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
 if __name__ == "__main__":
     uvicorn.run("backend.main:app", host="127.0.0.1", port=8000, reload=True)
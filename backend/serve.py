@@ -0,0 +1,38 @@
+"""
+Production launcher: runs several uvicorn worker processes.
+
+Each worker loads its own ONNX sessions and serves inference on its own
+cores. All workers share the gallery through the memory-mapped snapshot in
+backend/data and follow each other's registrations through the change log
+(FACE_GALLERY_SYNC_INTERVAL).
+
+Usage:
+    python -m backend.serve --workers 4 --host 0.0.0.0 --port 8000
+"""
+import argparse
+import os
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face Recognition API - multi-process server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--sync-interval", type=float, default=0.5,
+                        help="Seconds between gallery change checks in each worker")
+    args = parser.parse_args()
+
+    # Workers inherit the environment; split the cores between their ONNX sessions
+    threads = max(1, (os.cpu_count() or 1) // args.workers)
+    os.environ.setdefault("FACE_ORT_THREADS", str(threads))
+    if args.workers > 1:
+        os.environ.setdefault("FACE_GALLERY_SYNC_INTERVAL", str(args.sync_interval))
+
+    print(f"Starting {args.workers} worker(s), {os.environ['FACE_ORT_THREADS']} ONNX thread(s) each.")
+    uvicorn.run("backend.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
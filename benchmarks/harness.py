@@ -0,0 +1,143 @@
+"""
+Timing, result files and baseline comparison for the benchmarks.
+"""
+import json
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+RESULTS_VERSION = 1
+
+
+def summarize(latencies: list[float], wall: float) -> dict:
+    """Latency percentiles (milliseconds) and throughput of one scenario run."""
+    ms = np.asarray(latencies, dtype=np.float64) * 1000
+    return {
+        "iterations": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "qps": round(len(ms) / wall, 2) if wall > 0 else None,
+    }
+
+
+def measure(fn, iterations: int, warmup: int = 3, concurrency: int = 1, before=None) -> dict:
+    """
+    Call fn(i) `iterations` times after `warmup` untimed calls and summarize.
+    With concurrency > 1 the calls run on that many threads, so QPS reflects
+    batching and pooling, and each latency includes time spent queued.
+    `before(i)`, if given, runs untimed before each call (e.g. to clear a cache).
+    """
+    for i in range(warmup):
+        if before is not None:
+            before(i)
+        fn(i)
+
+    def timed(i):
+        if before is not None:
+            before(i)
+        started = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as executor:
+            latencies = list(executor.map(timed, range(iterations)))
+    else:
+        latencies = [timed(i) for i in range(iterations)]
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5, check=True).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment() -> dict:
+    """Where the numbers came from; results are only comparable on similar machines."""
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def result_key(result: dict) -> str:
+    """Identifies a scenario run across result files, e.g. "search[exact]@10000"."""
+    variant = f"[{result['variant']}]" if result.get("variant") else ""
+    return f"{result['scenario']}{variant}@{result['gallery_size']}"
+
+
+def write_results(path: str, results: list[dict], settings: dict):
+    report = {
+        "version": RESULTS_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": environment(),
+        "settings": settings,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+def load_results(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float = 0.2) -> list[dict]:
+    """
+    Compare results with a baseline report, scenario by scenario.
+    A scenario regresses when its p95 latency grows, or its QPS drops, by
+    more than `tolerance` (a fraction) relative to the baseline. Scenarios
+    missing from the baseline are skipped.
+    """
+    previous = {result_key(r): r for r in baseline.get("results", [])}
+    rows = []
+    for result in results:
+        base = previous.get(result_key(result))
+        if base is None:
+            continue
+        p95_change = result["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        qps_change = result["qps"] / base["qps"] - 1 if base.get("qps") and result.get("qps") else 0.0
+        rows.append({
+            "key": result_key(result),
+            "p95_ms": result["p95_ms"],
+            "baseline_p95_ms": base["p95_ms"],
+            "p95_change": round(p95_change, 3),
+            "qps": result.get("qps"),
+            "baseline_qps": base.get("qps"),
+            "qps_change": round(qps_change, 3),
+            "regressed": p95_change > tolerance or qps_change < -tolerance,
+        })
+    return rows
+
+
+def format_table(results: list[dict]) -> str:
+    lines = [f"{'scenario':<44}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'QPS':>12}  notes"]
+    for r in results:
+        notes = ", ".join(f"{k}={v}" for k, v in r.get("extra", {}).items())
+        lines.append(f"{result_key(r):<44}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+                     f"{r['qps'] or 0:>12.1f}  {notes}")
+    return "\n".join(lines)
+
+
+def format_comparison(rows: list[dict]) -> str:
+    lines = [f"{'scenario':<44}{'p95 change':>12}{'QPS change':>12}"]
+    for row in rows:
+        flag = "  REGRESSED" if row["regressed"] else ""
+        lines.append(f"{row['key']:<44}{row['p95_change']:>+12.1%}{row['qps_change']:>+12.1%}{flag}")
+    return "\n".join(lines)
@@ -0,0 +1,328 @@
+"""
+Offline benchmarks of the recognition service and the API, run in-process
+on synthetic galleries. Reports p50/p95/p99 latency and QPS per scenario and
+gallery size, writes them as JSON and compares them with a baseline.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios search --gallery-sizes 1000000 --backends exact,quantized:codec=int8
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exit code 1 on a regression
+    python -m benchmarks.run --output benchmarks/baseline.json     # record a new baseline
+
+Without the InsightFace model packs (--models auto), detection and
+recognition are replaced by instant stand-ins, so predict and register
+measure everything around the models: decode, caching, search, storage
+and HTTP. Numbers are only comparable between runs on the same machine.
+"""
+import argparse
+import contextlib
+import glob
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backend.app.services.enrollment import IMAGE_EXTENSIONS
+from backend.app.services.face_recognition import FaceRecognitionService
+from backend.app.services.matcher import BatchMatcher
+from backend.app.services.prototypes import PrototypeIndex
+from backend.app.services.search_index import make_backend, recall_at_1
+from benchmarks import harness
+from benchmarks.synthetic import (
+    identity_embeddings, make_gallery, make_image, make_queries, seed_store, use_synthetic_models
+)
+
+DEFAULT_OUTPUT = os.path.join("benchmarks", "results", "latest.json")
+
+
+class Bench:
+    """Shared state of one gallery size: the synthetic embeddings and a service over them."""
+
+    def __init__(self, args, gallery_size: int, data_dir: str):
+        self.args = args
+        self.gallery_size = gallery_size
+        self.embeddings, self.labels = identity_embeddings(gallery_size, args.per_identity, seed=args.seed)
+        self.data_dir = data_dir
+        self.images = load_images(args.images, args.image_count, args.seed)
+        self._service = None
+
+    @property
+    def service(self) -> FaceRecognitionService:
+        """Service on a store seeded with the synthetic gallery, created on first use."""
+        if self._service is None:
+            seed_store(self.data_dir, self.embeddings, self.labels)
+            self._service = open_service(self.data_dir, self.args.models, self.args.service_backend)
+        return self._service
+
+    def result(self, scenario: str, stats: dict, variant: str | None = None, **extra) -> dict:
+        return {"scenario": scenario, "variant": variant, "gallery_size": self.gallery_size,
+                **stats, "extra": extra}
+
+
+def models_available(pack: str) -> bool:
+    root = os.environ.get("INSIGHTFACE_HOME", os.path.join(os.path.expanduser("~"), ".insightface"))
+    return os.path.isdir(os.path.join(root, "models", pack))
+
+
+def open_service(data_dir: str, models: str, backend: str) -> FaceRecognitionService:
+    service = FaceRecognitionService(data_dir=data_dir, search_backend=backend)
+    if models == "auto":
+        models = "real" if models_available(service.model_pack) else "synthetic"
+    if models == "synthetic":
+        use_synthetic_models(service)
+        service._ensure_gallery()
+    elif not service.warmup():
+        raise SystemExit(f"Could not load the {service.model_pack} models: {service.load_error}")
+    service.models_mode = models
+    return service
+
+
+def load_images(folder: str | None, count: int, seed: int) -> list[bytes]:
+    """Images from `folder` (e.g. real photos for --models real), else synthetic JPEGs."""
+    if folder:
+        paths = sorted(p for p in glob.glob(os.path.join(folder, "*"))
+                       if os.path.splitext(p)[1].lower() in IMAGE_EXTENSIONS)
+        if not paths:
+            raise SystemExit(f"No images found in {folder}")
+        images = []
+        for path in paths[:count]:
+            with open(path, 'rb') as f:
+                images.append(f.read())
+        return images
+    return [make_image(seed=seed + i) for i in range(count)]
+
+
+# ─── Scenarios ──────────────────────────────────────────────────────
+
+def parse_backend(spec: str):
+    """Backend from "name[:param=value...]", e.g. "ivf:nprobe=16:codec=int8"."""
+    name, *pairs = spec.split(":")
+    params = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        params[key] = int(value) if value.isdigit() else value
+    return make_backend(name, **params)
+
+
+def _accuracy(matcher: BatchMatcher, queries: np.ndarray, truth: list[str]) -> float:
+    found = [name for name, _ in matcher.match(queries)]
+    return round(float(np.mean([a == b for a, b in zip(found, truth)])), 4)
+
+
+def bench_search(bench: Bench) -> list[dict]:
+    """
+    Gallery search of single faces through BatchMatcher, per search backend,
+    with the memory of each index and its accuracy with and without
+    re-ranking the candidates against the float32 embeddings. With
+    --prototypes, each backend is also run over per-identity prototypes.
+    """
+    args = bench.args
+    results = []
+    reference = make_gallery(bench.embeddings, bench.labels).backend
+    queries, truth = make_queries(make_gallery(bench.embeddings, bench.labels), args.iterations,
+                                  seed=args.seed + 1)
+    variants = [(spec, 0) for spec in args.backends]
+    if args.prototypes:
+        variants += [(spec, args.prototypes) for spec in args.backends]
+    for spec, prototypes in variants:
+        started = time.perf_counter()
+        if prototypes:
+            index = PrototypeIndex(make_gallery(bench.embeddings, bench.labels), prototypes, parse_backend(spec))
+            index.refresh()
+            gallery, spec = index.gallery, f"{spec}+prototypes={prototypes}"
+        else:
+            gallery = make_gallery(bench.embeddings, bench.labels, parse_backend(spec))
+        extra = {"build_s": round(time.perf_counter() - started, 3), "rows": len(gallery),
+                 "memory_mb": round(gallery.backend.nbytes / 2 ** 20, 1)}
+        matcher = BatchMatcher(gallery, args.aggregation)
+        stats = harness.measure(lambda i: matcher.match(queries[i:i + 1]), args.iterations)
+        extra["accuracy"] = _accuracy(matcher, queries, truth)
+        if not gallery.backend.exact:
+            extra["accuracy_no_rerank"] = _accuracy(BatchMatcher(gallery, args.aggregation, rerank=False),
+                                                    queries, truth)
+            if not prototypes:  # labels of a prototype gallery differ from the reference's
+                extra["recall_at_1"] = round(recall_at_1(gallery.backend, reference, queries), 4)
+        results.append(bench.result("search", stats, spec, **extra))
+    return results
+
+
+def bench_predict(bench: Bench) -> list[dict]:
+    """analyze_image on images never seen before (the embedding cache is cleared before each call)."""
+    service, images = bench.service, bench.images
+    stats = harness.measure(lambda i: service.analyze_image(images[i % len(images)]), bench.args.iterations,
+                            before=lambda i: service.embedding_cache.clear())
+    return [bench.result("predict", stats, models=service.models_mode)]
+
+
+def bench_predict_cached(bench: Bench) -> list[dict]:
+    """analyze_image on a re-sent image, answered from the embedding cache."""
+    service, image = bench.service, bench.images[0]
+    stats = harness.measure(lambda i: service.analyze_image(image), bench.args.iterations)
+    return [bench.result("predict_cached", stats, models=service.models_mode)]
+
+
+def bench_list(bench: Bench) -> list[dict]:
+    """One page of /users data: sorted by name, by registration date, and filtered by a name prefix."""
+    service = bench.service
+    names = service.gallery.names()
+    variants = {
+        "name": lambda i: service.get_registered_users(limit=50, offset=(i * 50) % max(len(names), 1)),
+        "created": lambda i: service.get_registered_users(sort="created_at", order="desc", limit=50),
+        "search": lambda i: service.get_registered_users(search=names[i % len(names)][:-2], mode="prefix",
+                                                         limit=50),
+    }
+    return [bench.result("list", harness.measure(fn, bench.args.iterations), variant)
+            for variant, fn in variants.items()]
+
+
+def bench_register(bench: Bench) -> list[dict]:
+    """register_face of new people, each a durable log append plus a thumbnail."""
+    service, images = bench.service, bench.images
+    names = itertools.count()
+    stats = harness.measure(
+        lambda i: service.register_face(f"bench_{bench.gallery_size}_{next(names):06d}", images[i % len(images)]),
+        bench.args.iterations, before=lambda i: service.embedding_cache.clear()
+    )
+    return [bench.result("register", stats, models=service.models_mode)]
+
+
+@contextlib.contextmanager
+def serving(service: FaceRecognitionService):
+    """
+    In-process client of the FastAPI app, routed to `service`. The app's
+    lifespan is not run: no model warmup, and the shared inference pool
+    stays up for the next gallery size.
+    """
+    from fastapi.testclient import TestClient
+
+    import backend.main as main
+    from backend.app.api import endpoints
+
+    previous = endpoints.face_service, main.face_service
+    endpoints.face_service = main.face_service = service
+    endpoints.predict_batchers.clear()
+    try:
+        yield TestClient(main.app)
+    finally:
+        endpoints.face_service, main.face_service = previous
+        endpoints.predict_batchers.clear()
+
+
+def _ok(response):
+    if response.status_code >= 400:
+        raise RuntimeError(f"{response.request.method} {response.request.url.path}: "
+                           f"{response.status_code} {response.text[:200]}")
+    return response
+
+
+def bench_http(bench: Bench) -> list[dict]:
+    """The same operations through the API: upload parsing, batching, pool hand-off and JSON."""
+    service, images, args = bench.service, bench.images, bench.args
+    names = itertools.count()
+    results = []
+    with serving(service) as client:
+        def predict(i):
+            _ok(client.post("/api/predict", files={"file": ("frame.jpg", images[i % len(images)], "image/jpeg")}))
+
+        stats = harness.measure(predict, args.iterations, concurrency=args.concurrency,
+                                before=lambda i: service.embedding_cache.clear())
+        results.append(bench.result("http_predict", stats, models=service.models_mode,
+                                    concurrency=args.concurrency))
+
+        stats = harness.measure(lambda i: _ok(client.get("/api/users", params={"limit": 50})), args.iterations,
+                                concurrency=args.concurrency)
+        results.append(bench.result("http_list", stats, concurrency=args.concurrency))
+
+        def register(i):
+            _ok(client.post("/api/register", data={"name": f"http_{bench.gallery_size}_{next(names):06d}"},
+                            files={"file": ("face.jpg", images[i % len(images)], "image/jpeg")}))
+
+        stats = harness.measure(register, args.iterations, before=lambda i: service.embedding_cache.clear())
+        results.append(bench.result("http_register", stats, models=service.models_mode))
+    return results
+
+
+# Run in this order: register and http add identities to the gallery
+SCENARIOS = {
+    "search": bench_search,
+    "predict": bench_predict,
+    "predict_cached": bench_predict_cached,
+    "list": bench_list,
+    "register": bench_register,
+    "http": bench_http,
+}
+
+
+def _csv(cast):
+    return lambda value: [cast(v.strip()) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the face recognition service in-process.")
+    parser.add_argument("--scenarios", type=_csv(str), default=list(SCENARIOS),
+                        help=f"Comma-separated subset of {','.join(SCENARIOS)}")
+    parser.add_argument("--gallery-sizes", type=_csv(int), default=[1000, 10000, 100000],
+                        help="Comma-separated numbers of gallery embeddings (1000000 needs ~2 GB per copy)")
+    parser.add_argument("--per-identity", type=int, default=4, help="Embeddings per synthetic person")
+    parser.add_argument("--iterations", type=int, default=200, help="Timed calls per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads for the http scenarios")
+    parser.add_argument("--backends", type=_csv(str),
+                        default=["exact", "ivf", "ivf:codec=int8", "quantized", "quantized:codec=float16"],
+                        help="Search backends compared by the search scenario, as name[:param=value...]")
+    parser.add_argument("--prototypes", type=int, default=0,
+                        help="Also search a centroid + this many exemplars per person (try with --per-identity 20)")
+    parser.add_argument("--service-backend", default="exact", help="Search backend of the benchmarked service")
+    parser.add_argument("--aggregation", default="max", help="BatchMatcher aggregation for the search scenario")
+    parser.add_argument("--models", choices=("auto", "real", "synthetic"), default="auto",
+                        help="auto uses the InsightFace models when installed, else synthetic stand-ins")
+    parser.add_argument("--images", help="Folder of images for predict/register (default: synthetic JPEGs)")
+    parser.add_argument("--image-count", type=int, default=32, help="Distinct images cycled through")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed p95 growth / QPS drop relative to the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios {sorted(unknown)}, expected some of {list(SCENARIOS)}")
+    return args
+
+
+def run(args) -> list[dict]:
+    results = []
+    for size in args.gallery_sizes:
+        with tempfile.TemporaryDirectory(prefix="face-bench-") as data_dir:
+            bench = Bench(args, size, data_dir)
+            for scenario in args.scenarios:
+                started = time.perf_counter()
+                results += SCENARIOS[scenario](bench)
+                print(f"  {scenario}@{size} done in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            if bench._service is not None:
+                bench._service.store.close()
+    return results
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    # Read first: --output may name the baseline file itself, to record a new one
+    baseline = harness.load_results(args.baseline) if args.baseline else None
+    results = run(args)
+    settings = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+    harness.write_results(args.output, results, settings)
+    print(harness.format_table(results))
+    print(f"\nResults written to {args.output}")
+
+    if baseline is not None:
+        rows = harness.compare(results, baseline, args.tolerance)
+        print(f"\nCompared with {args.baseline} (tolerance {args.tolerance:.0%}):")
+        print(harness.format_comparison(rows))
+        if any(row["regressed"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
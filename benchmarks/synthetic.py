@@ -0,0 +1,116 @@
+"""
+Synthetic data for the benchmarks: galleries of random embeddings, test
+images, and stand-in models for machines without the InsightFace packs.
+"""
+import hashlib
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from backend.app.services.embedding_store import EmbeddingStore
+from backend.app.services.gallery import EMBEDDING_DIM, GalleryIndex
+from backend.app.services.search_index import l2_normalize
+
+
+def identity_embeddings(num_embeddings: int, per_identity: int = 4, dim: int = EMBEDDING_DIM,
+                        noise: float = 0.5, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Random normalized embeddings clustered by identity, like several photos
+    of each person. Returns (embeddings (N, dim) float32, labels (N,) int32)
+    with each identity's rows contiguous.
+    """
+    rng = np.random.default_rng(seed)
+    num_identities = max(1, num_embeddings // per_identity)
+    labels = np.minimum(np.arange(num_embeddings) // per_identity, num_identities - 1).astype(np.int32)
+    centers = l2_normalize(rng.standard_normal((num_identities, dim), dtype=np.float32))
+    # Generated in chunks so a million-row gallery needs no float64 temporaries
+    embeddings = np.empty((num_embeddings, dim), dtype=np.float32)
+    for start in range(0, num_embeddings, 65536):
+        end = min(start + 65536, num_embeddings)
+        chunk = rng.standard_normal((end - start, dim), dtype=np.float32) * (noise / np.sqrt(dim))
+        embeddings[start:end] = l2_normalize(centers[labels[start:end]] + chunk)
+    return embeddings, labels
+
+
+def identity_name(label: int) -> str:
+    return f"person_{label:07d}"
+
+
+def _names_and_counts(labels: np.ndarray) -> tuple[list[str], list[int]]:
+    counts = np.bincount(labels).tolist()
+    return [identity_name(i) for i in range(len(counts))], counts
+
+
+def make_gallery(embeddings: np.ndarray, labels: np.ndarray, backend=None) -> GalleryIndex:
+    """GalleryIndex over identity_embeddings() output, loaded in bulk like a snapshot (no copy)."""
+    gallery = GalleryIndex(backend=backend)
+    gallery.load_snapshot(embeddings, *_names_and_counts(labels))
+    return gallery
+
+
+def seed_store(data_dir: str, embeddings: np.ndarray, labels: np.ndarray):
+    """Write a synthetic gallery to `data_dir` as an embedding store snapshot."""
+    store = EmbeddingStore(data_dir, fsync=False)
+    gallery = GalleryIndex()
+    meta = store.load(gallery)
+    gallery.load_snapshot(embeddings, *_names_and_counts(labels))
+    timestamp = "2024-01-01T00:00:00"
+    meta.update({name: {"created_at": timestamp, "updated_at": timestamp, "image_count": gallery.count(name)}
+                 for name in gallery.names()})
+    store.compact()
+    store.close()
+
+
+def make_queries(gallery: GalleryIndex, count: int, noise: float = 0.5, seed: int = 1) -> tuple[np.ndarray, list[str]]:
+    """Queries near random gallery rows (a new photo of a known person), with their true names."""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(gallery), count)
+    noisy = gallery.matrix[rows] + rng.standard_normal((count, gallery.dim), dtype=np.float32) * (
+        noise / np.sqrt(gallery.dim))
+    return l2_normalize(noisy), [gallery.name_of(int(label)) for label in gallery.labels[rows]]
+
+
+def make_image(width: int = 640, height: int = 480, faces: int = 1, seed: int = 0) -> bytes:
+    """JPEG of a noisy background with face-like ellipses (real detectors may or may not fire on it)."""
+    rng = np.random.default_rng(seed)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    for i in range(faces):
+        cx = int(width * (i + 1) / (faces + 1))
+        cy, axes = height // 2, (width // (3 * faces + 3), height // 4)
+        cv2.ellipse(img, (cx, cy), axes, 0, 0, 360, (150, 180, 220), -1)
+        for dx in (-axes[0] // 3, axes[0] // 3):
+            cv2.circle(img, (cx + dx, cy - axes[1] // 4), max(2, axes[0] // 8), (40, 40, 40), -1)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def use_synthetic_models(service, faces_per_image: int = 1):
+    """
+    Replace the detector and recognizer of `service` with instant stand-ins,
+    so the rest of the pipeline (decode, caching, gallery search, storage,
+    HTTP) can be benchmarked without the model packs. Embeddings are derived
+    from the image bytes, so the same photo always gets the same embedding.
+    """
+    def detect_faces(img, det_size=None, scale=1.0):
+        h, w = img.shape[:2]
+        side = min(w // (faces_per_image + 1), h // 2)
+        return [
+            SimpleNamespace(
+                bbox=np.array([x, h // 4, x + side, h // 4 + side], dtype=np.float32) * scale,
+                kps=None, det_score=np.float32(0.99),
+                seed=int(hashlib.blake2b(img[::16, ::16].tobytes(), digest_size=4).hexdigest(), 16) + i,
+            )
+            for i, x in enumerate(range(side // 2, w - side, w // (faces_per_image + 1))[:faces_per_image])
+        ]
+
+    def alignment_sources(image_bytes, img, scale, faces):
+        return [(img, face) for face in faces], [scale] * len(faces)
+
+    def embed_faces(items, scales=None):
+        for _, face in items:
+            face.embedding = l2_normalize(
+                np.random.default_rng(face.seed).standard_normal(EMBEDDING_DIM).astype(np.float32))
+
+    service.detect_faces = detect_faces
+    service._alignment_sources = alignment_sources
+    service.embed_faces = embed_faces
@@ -1,6 +1,6 @@
 import React, { useRef, useState, useEffect, useCallback } from 'react';
 import Webcam from 'react-webcam';
-import { analyzeImage } from '../services/api';
+import { analyzeImage, openRecognitionStream } from '../services/api';
 
 const videoConstraints = {
     width: 1280,
@@ -14,6 +14,8 @@ const CameraView = ({ isDetecting, onFacesDetected, onFrameProcessed }) => {
     const containerRef = useRef(null);
     const animationRef = useRef(null);
     const detectionInterval = useRef(null);
+    const streamRef = useRef(null);
+    const requestInFlight = useRef(false);
     const [cameraReady, setCameraReady] = useState(false);
     const [fps, setFps] = useState(0);
     const lastFrameTime = useRef(Date.now());
@@ -143,35 +145,71 @@ const CameraView = ({ isDetecting, onFacesDetected, onFrameProcessed }) => {
         });
     }, []);
 
+    const handleResult = useCallback((result) => {
+        if (result?.results) {
+            const faces = Array.isArray(result.results) ? result.results : [];
+            drawOverlay(faces);
+            onFacesDetected?.(faces);
+            frameCount.current++;
+        }
+        onFrameProcessed?.();
+    }, [drawOverlay, onFacesDetected, onFrameProcessed]);
+
     // Process frame: capture -> send to backend -> draw result
     const processFrame = useCallback(async () => {
         if (!webcamRef.current || !isDetecting) return;
 
+        // Stream over the WebSocket when connected, otherwise fall back to POST /predict
+        const socket = streamRef.current;
+        const streaming = socket?.readyState === WebSocket.OPEN;
+        // Skip while the previous frame is still being uploaded or analyzed
+        if (streaming ? socket.bufferedAmount > 0 : requestInFlight.current) return;
+
         const imageSrc = webcamRef.current.getScreenshot();
         if (!imageSrc) return;
 
+        if (!streaming) requestInFlight.current = true;
         try {
             const res = await fetch(imageSrc);
             const blob = await res.blob();
-            const file = new File([blob], 'capture.jpg', { type: 'image/jpeg' });
 
-            const result = await analyzeImage(file);
-            if (result?.results) {
-                const faces = Array.isArray(result.results) ? result.results : [];
-                drawOverlay(faces);
-                onFacesDetected?.(faces);
-                frameCount.current++;
+            if (streaming) {
+                socket.send(blob);
+                return;
             }
-            onFrameProcessed?.();
+            const file = new File([blob], 'capture.jpg', { type: 'image/jpeg' });
+            handleResult(await analyzeImage(file));
         } catch (error) {
             console.error('Detection error:', error);
+        } finally {
+            if (!streaming) requestInFlight.current = false;
         }
-    }, [isDetecting, drawOverlay, onFacesDetected, onFrameProcessed]);
+    }, [isDetecting, handleResult]);
+
+    // Latest handler for stream messages, so a new callback does not reopen the socket
+    const resultHandler = useRef(handleResult);
+    useEffect(() => {
+        resultHandler.current = handleResult;
+    }, [handleResult]);
+
+    // Open the recognition stream while detecting
+    useEffect(() => {
+        if (!isDetecting || !cameraReady) return;
+        const socket = openRecognitionStream((result) => resultHandler.current(result), () => {
+            if (streamRef.current === socket) streamRef.current = null;
+        });
+        streamRef.current = socket;
+        return () => {
+            streamRef.current = null;
+            socket.close();
+        };
+    }, [isDetecting, cameraReady]);
 
     // Start/stop detection loop
     useEffect(() => {
         if (isDetecting && cameraReady) {
-            detectionInterval.current = setInterval(processFrame, 500); // ~2 FPS analysis
+            // The server drops stale frames, so streaming can send faster than POST polling
+            detectionInterval.current = setInterval(processFrame, 200); // ~5 FPS
         } else {
             if (detectionInterval.current) {
                 clearInterval(detectionInterval.current);
@@ -3,24 +3,49 @@ import { getUsers, deleteUser } from '../services/api';
 
 const RegisteredUsers = ({ refreshTrigger, onToast }) => {
     const [users, setUsers] = useState([]);
+    const [total, setTotal] = useState(0);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [search, setSearch] = useState('');
     const [loading, setLoading] = useState(false);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     const fetchUsers = useCallback(async () => {
         setLoading(true);
         try {
-            const data = await getUsers();
+            const data = await getUsers(search.trim() ? { search: search.trim() } : {});
             setUsers(data.users || []);
+            setTotal(data.total || 0);
+            setNextCursor(data.next_cursor || null);
         } catch (error) {
             console.error('Failed to fetch users:', error);
         } finally {
             setLoading(false);
         }
-    }, []);
+    }, [search]);
 
     useEffect(() => {
-        fetchUsers();
+        // Debounce typing in the search box
+        const timer = setTimeout(fetchUsers, 250);
+        return () => clearTimeout(timer);
     }, [fetchUsers, refreshTrigger]);
 
+    const handleLoadMore = async () => {
+        if (!nextCursor) return;
+        setLoadingMore(true);
+        try {
+            const params = { cursor: nextCursor };
+            if (search.trim()) params.search = search.trim();
+            const data = await getUsers(params);
+            setUsers((prev) => [...prev, ...(data.users || [])]);
+            setTotal(data.total || 0);
+            setNextCursor(data.next_cursor || null);
+        } catch (error) {
+            onToast?.({ type: 'error', message: `목록 불러오기 실패: ${error.message}` });
+        } finally {
+            setLoadingMore(false);
+        }
+    };
+
     const handleDelete = async (name) => {
         if (!window.confirm(`'${name}' 사용자를 삭제하시겠습니까?\n등록된 모든 얼굴 데이터와 썸네일이 삭제됩니다.`)) return;
 
@@ -51,9 +76,18 @@ const RegisteredUsers = ({ refreshTrigger, onToast }) => {
         <div className="card">
             <div className="card-header">
                 <h3 className="card-title">👥 등록된 사용자</h3>
-                <span className="card-badge">{users.length}</span>
+                <span className="card-badge">{total}</span>
             </div>
 
+            <input
+                type="search"
+                className="modal-input"
+                placeholder="이름 검색 (예: 홍길동, ㅎㄱㄷ)"
+                value={search}
+                onChange={(e) => setSearch(e.target.value)}
+                id="user-search-input"
+            />
+
             {loading ? (
                 <div className="empty-state">
                     <div className="loading-spinner" />
@@ -61,10 +95,14 @@ const RegisteredUsers = ({ refreshTrigger, onToast }) => {
             ) : users.length === 0 ? (
                 <div className="empty-state">
                     <div className="empty-state-icon">📋</div>
-                    <p className="empty-state-text">
-                        등록된 사용자가 없습니다.<br />
-                        얼굴을 등록하세요.
-                    </p>
+                    {search.trim() ? (
+                        <p className="empty-state-text">검색 결과가 없습니다.</p>
+                    ) : (
+                        <p className="empty-state-text">
+                            등록된 사용자가 없습니다.<br />
+                            얼굴을 등록하세요.
+                        </p>
+                    )}
                 </div>
             ) : (
                 <ul className="user-list" id="registered-users-list">
@@ -75,6 +113,7 @@ const RegisteredUsers = ({ refreshTrigger, onToast }) => {
                                     <img
                                         src={user.thumbnail}
                                         alt={user.name}
+                                        loading="lazy"
                                         className="user-avatar-thumb"
                                     />
                                 ) : (
@@ -100,6 +139,17 @@ const RegisteredUsers = ({ refreshTrigger, onToast }) => {
                     ))}
                 </ul>
             )}
+
+            {!loading && nextCursor && (
+                <button
+                    className="btn btn-ghost"
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    id="load-more-users"
+                >
+                    {loadingMore ? '불러오는 중...' : `더 보기 (${users.length}/${total})`}
+                </button>
+            )}
         </div>
     );
 };
@@ -19,6 +19,17 @@ export const analyzeImage = async (imageFile) => {
     return response.data;
 };
 
+// Continuous recognition over a WebSocket: send JPEG Blobs with socket.send(),
+// results arrive as { frame, results, dropped }. The server analyzes only the
+// newest frame, so sending faster than it keeps up never builds a backlog.
+export const openRecognitionStream = (onResults, onClose) => {
+    const socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/stream`);
+    socket.binaryType = 'arraybuffer';
+    socket.onmessage = (event) => onResults(JSON.parse(event.data));
+    socket.onclose = () => onClose?.();
+    return socket;
+};
+
 // ─── Register ──────────────────────────────────────────────────
 
 export const registerFace = async (name, imageFile) => {
@@ -45,8 +56,9 @@ export const registerMultipleFaces = async (name, imageFiles) => {
 
 // ─── User Management ───────────────────────────────────────────
 
-export const getUsers = async () => {
-    const response = await api.get('/users');
+// params: { search, mode, sort, order, limit, cursor } — see GET /api/users
+export const getUsers = async (params = {}) => {
+    const response = await api.get('/users', { params });
     return response.data;
 };
 
@@ -1,11 +1,265 @@
+import queue
+import threading
+import time
+
+import cv2
+
+from src.utils.config import VIDEO_SOURCE
+
+
+class StageTimer:
+    """Running count, mean and max duration of one pipeline stage."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            mean = self.total / self.count if self.count else 0.0
+            return {"count": self.count, "avg_ms": round(mean * 1000, 2), "max_ms": round(self.max * 1000, 2)}
+
+
 class CameraStream:
-    """Class to manage camera stream capture."""
-    def __init__(self, source=0):
+    """
+    Server-side capture-and-inference pipeline for a USB camera, RTSP URL or video file.
+
+    Two threads, timed per stage (see stats):
+      capture   - grabs every frame from the source so a live stream never
+                  lags, and decodes only frames the inference stage will
+                  actually use (the "decode" stage runs on this thread)
+      inference - runs `analyze(frame) -> results` (see face_recognizer)
+
+    The frame slot between capture and inference holds one frame: for live
+    sources a frame arriving while inference is busy is not decoded, and a
+    newer frame replaces one not yet taken (both counted as dropped), so
+    results describe the present. With `drop_frames=False` (default for
+    video files) capture waits instead and every frame is analyzed.
+    `max_fps` caps how often frames are decoded: live sources skip the
+    frames in between, files are paced to that rate.
+
+    Results go to a bounded queue read with `get_result`; when nobody reads
+    it the oldest results are discarded. With `pull=True` and no `analyze`,
+    frames are left in the slot for an external consumer instead
+    (`take_frame`, see scheduler.py).
+    """
+
+    def __init__(self, source=VIDEO_SOURCE, analyze=None, drop_frames: bool | None = None,
+                 result_queue_size: int = 32, max_fps: float | None = None, pull: bool = False):
         self.source = source
+        self.analyze = analyze
+        # Whether decoded frames go through the slot to a consumer, or only to read_frame
+        self._feeds_slot = analyze is not None or pull
+        # Files are finite and can wait for inference; cameras cannot
+        self.drop_frames = drop_frames if drop_frames is not None else not self._is_file(source)
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
 
-    def read_frame(self):
-        # TODO: Implement frame reading from OpenCV
-        pass
+        self.capture = None
+        self.timers = {stage: StageTimer() for stage in ("capture", "decode", "inference")}
+        self.frames_read = 0
+        self.frames_dropped = 0
+        self.results_dropped = 0
+
+        self._results: queue.Queue = queue.Queue(maxsize=result_queue_size)
+        self._slot = None  # (frame index, timestamp, frame) awaiting inference
+        self._busy = False  # inference stage is analyzing a frame
+        self._latest = None  # newest decoded frame, for read_frame
+        self._last_decode = 0.0
+        self._cond = threading.Condition()
+        self._running = False
+        self._finished = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    @staticmethod
+    def _is_file(source) -> bool:
+        return isinstance(source, str) and "://" not in source
+
+    # ─── Lifecycle ──────────────────────────────────────────────────
+
+    def start(self) -> "CameraStream":
+        """Open the source and start the pipeline threads."""
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Cannot open video source {self.source!r}")
+        self._running = True
+        self._finished.clear()
+        self._threads = [threading.Thread(target=self._capture_loop, name="camera-capture", daemon=True)]
+        if self.analyze is not None:
+            self._threads.append(threading.Thread(target=self._inference_loop, name="camera-inference", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
 
     def release(self):
-        pass
+        """Stop the pipeline and close the source."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until a finite source has been fully read and analyzed."""
+        return self._finished.wait(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.release()
+
+    # ─── Stages ─────────────────────────────────────────────────────
+
+    def _capture_loop(self):
+        try:
+            while self._running:
+                started = time.perf_counter()
+                if not self.capture.grab():
+                    break
+                self.timers["capture"].record(time.perf_counter() - started)
+                index = self.frames_read
+                self.frames_read += 1
+
+                if self.min_interval:
+                    wait = self._last_decode + self.min_interval - time.perf_counter()
+                    if wait > 0:
+                        if self.drop_frames:
+                            continue
+                        time.sleep(wait)
+
+                with self._cond:
+                    if self.drop_frames:
+                        if self._busy:
+                            # Inference is still busy with an older frame: skip decoding this one
+                            self.frames_dropped += 1
+                            continue
+                    elif self._feeds_slot:
+                        while self._slot is not None and self._running:
+                            self._cond.wait()
+                        if not self._running:
+                            break
+
+                started = time.perf_counter()
+                ok, frame = self.capture.retrieve()
+                self._last_decode = time.perf_counter()
+                self.timers["decode"].record(self._last_decode - started)
+                if not ok:
+                    continue
+
+                with self._cond:
+                    self._latest = frame
+                    if self._feeds_slot:
+                        if self._slot is not None:
+                            self.frames_dropped += 1
+                        self._slot = (index, time.time(), frame)
+                        self._cond.notify_all()
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
+            if self.analyze is None:
+                self._finished.set()
+
+    def _inference_loop(self):
+        while True:
+            with self._cond:
+                while self._slot is None and self._running:
+                    self._cond.wait()
+                if self._slot is None:
+                    break
+                index, timestamp, frame = self._slot
+                self._slot = None
+                self._busy = True
+
+            started = time.perf_counter()
+            try:
+                results = self.analyze(frame)
+            except Exception as e:
+                print(f"Error analyzing frame {index}: {e}")
+                results = {"error": str(e)}
+            self.timers["inference"].record(time.perf_counter() - started)
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+            self._put_result({"frame": index, "timestamp": timestamp, "results": results})
+        self._finished.set()
+
+    def _put_result(self, item: dict):
+        while True:
+            try:
+                self._results.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._results.get_nowait()
+                    self.results_dropped += 1
+                except queue.Empty:
+                    pass
+
+    # ─── Consumers ──────────────────────────────────────────────────
+
+    def read_frame(self):
+        """Latest decoded frame (BGR), or None before the first one."""
+        with self._cond:
+            return self._latest
+
+    def take_frame(self) -> tuple[int, float, object] | None:
+        """
+        Remove and return the frame waiting in the slot as (index, timestamp, frame),
+        or None. For external consumers when the stream has no `analyze` stage.
+        """
+        with self._cond:
+            item, self._slot = self._slot, None
+            self._cond.notify_all()
+            return item
+
+    @property
+    def has_frame(self) -> bool:
+        """A frame is waiting in the slot."""
+        return self._slot is not None
+
+    @property
+    def exhausted(self) -> bool:
+        """The source has ended (or the stream was released) and no frame is left to take."""
+        return not self._running and self._slot is None
+
+    def get_result(self, timeout: float | None = None) -> dict | None:
+        """Next {"frame", "timestamp", "results"} from the inference stage, or None on timeout."""
+        try:
+            return self._results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def stats(self) -> dict:
+        """Frame counters and per-stage timing."""
+        return {
+            "frames_read": self.frames_read,
+            "frames_dropped": self.frames_dropped,
+            "results_dropped": self.results_dropped,
+            "stages": {name: timer.snapshot() for name, timer in self.timers.items()},
+        }
+
+
+def face_recognizer(track: bool = True, det_size=None):
+    """
+    Inference stage feeding frames to the backend FaceRecognitionService,
+    tracking faces across frames so unchanged faces are not re-embedded.
+    """
+    from backend.app.services.face_recognition import face_service
+    from backend.app.services.tracker import FaceTracker
+
+    tracker = FaceTracker() if track else None
+    return lambda frame: face_service.analyze_frame(frame, tracker, det_size)
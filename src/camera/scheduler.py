@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from src.camera.camera_stream import CameraStream, face_recognizer
+from src.utils.config import CAMERA_SOURCES, SCHEDULER_POLICY, SCHEDULER_WORKERS
+
+POLICIES = ("deadline", "round_robin")
+
+
+class ScheduledCamera:
+    """One camera of the scheduler: its stream, pacing and achieved rate."""
+
+    def __init__(self, name: str, source, fps: float, priority: int, analyze):
+        if fps <= 0 or priority < 1:
+            raise ValueError(f"Camera '{name}': fps must be positive and priority at least 1")
+        self.name = name
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.priority = priority
+        self.analyze = analyze
+        # Decoding is paced to the target rate, so frames the scheduler will not use are never decoded
+        self.stream = CameraStream(source, max_fps=fps, pull=True)
+
+        self.next_due = 0.0
+        self.in_flight = False
+        self.analyzed = 0
+        self.deadline_misses = 0
+        self.latest_result: dict | None = None
+        # Completion times of recent frames, for the achieved FPS
+        self._completions: deque = deque(maxlen=max(2, int(fps * 5)))
+
+    def ready(self, now: float) -> bool:
+        return not self.in_flight and now >= self.next_due and self.stream.has_frame
+
+    def achieved_fps(self) -> float:
+        if len(self._completions) < 2:
+            return 0.0
+        span = self._completions[-1] - self._completions[0]
+        return (len(self._completions) - 1) / span if span > 0 else 0.0
+
+
+class CameraScheduler:
+    """
+    Shares a pool of inference workers fairly between several cameras.
+
+    Each camera decodes frames at most at its target `fps`, and a dispatcher
+    thread hands them to `workers` threads, never more than one frame per
+    camera at a time (so a camera's frames reach its tracker in order):
+
+      deadline    - the camera whose next frame is due earliest goes first,
+                    higher `priority` breaking ties. A camera served more
+                    than a period late records a deadline miss and restarts
+                    its schedule from now instead of bursting to catch up.
+      round_robin - ready cameras take turns, `priority` turns per cycle.
+
+    A camera can never take more than its own target rate, so a busy one
+    cannot starve the others; when capacity runs short, frames are dropped
+    at the cameras (see CameraStream) rather than queued.
+    """
+
+    def __init__(self, cameras: list[dict] | None = None, workers: int = SCHEDULER_WORKERS,
+                 policy: str = SCHEDULER_POLICY, make_analyze=None, on_result=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy '{policy}', expected one of {list(POLICIES)}")
+        if make_analyze is None:
+            # One recognizer (and face tracker) per camera
+            make_analyze = lambda camera: face_recognizer(det_size=camera.get("det_size"))
+        self.cameras = [
+            ScheduledCamera(c["name"], c["source"], c.get("fps", 5), c.get("priority", 1), make_analyze(c))
+            for c in (cameras if cameras is not None else CAMERA_SOURCES)
+        ]
+        self.policy = policy
+        self.workers = workers
+        self.on_result = on_result
+
+        # Weighted round-robin order: each camera spread evenly `priority` times per cycle
+        turns = [((k + 0.5) / cam.priority, i, cam) for i, cam in enumerate(self.cameras) for k in range(cam.priority)]
+        self._turns = [cam for _, _, cam in sorted(turns, key=lambda t: t[:2])]
+        self._turn = 0
+
+        self._pool: ThreadPoolExecutor | None = None
+        self._free = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+        self._finished = threading.Event()
+        self._dispatcher: threading.Thread | None = None
+
+    # ─── Lifecycle ──────────────────────────────────────────────────
+
+    def start(self) -> "CameraScheduler":
+        """Open every camera and start dispatching frames."""
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="camera-inference")
+        now = time.perf_counter()
+        for camera in self.cameras:
+            camera.next_due = now
+            camera.stream.start()
+        self._running = True
+        self._finished.clear()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="camera-scheduler", daemon=True)
+        self._dispatcher.start()
+        return self
+
+    def stop(self):
+        """Stop dispatching, wait for frames in flight and close every camera."""
+        self._running = False
+        self._wakeup.set()
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        for camera in self.cameras:
+            camera.stream.release()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until every (finite) source is exhausted and analyzed."""
+        return self._finished.wait(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ─── Dispatching ────────────────────────────────────────────────
+
+    def _pick(self, now: float) -> ScheduledCamera | None:
+        if self.policy == "deadline":
+            ready = [camera for camera in self.cameras if camera.ready(now)]
+            return min(ready, key=lambda c: (c.next_due, -c.priority)) if ready else None
+
+        for offset in range(len(self._turns)):
+            camera = self._turns[(self._turn + offset) % len(self._turns)]
+            if camera.ready(now):
+                self._turn = (self._turn + offset + 1) % len(self._turns)
+                return camera
+        return None
+
+    def _dispatch_loop(self):
+        while self._running:
+            if not self._free.acquire(timeout=0.1):
+                continue
+            with self._lock:
+                now = time.perf_counter()
+                camera = self._pick(now)
+                item = camera.stream.take_frame() if camera is not None else None
+                if item is not None:
+                    if now - camera.next_due > camera.period:
+                        camera.deadline_misses += 1
+                        camera.next_due = now + camera.period
+                    else:
+                        camera.next_due += camera.period
+                    camera.in_flight = True
+                done = all(c.stream.exhausted and not c.in_flight for c in self.cameras)
+
+            if item is None:
+                self._free.release()
+                if done:
+                    self._finished.set()
+                    return
+                # Nothing ready: sleep until the next camera is due or a worker frees up
+                with self._lock:
+                    due = min(c.next_due for c in self.cameras)
+                self._wakeup.wait(min(max(due - now, 0.002), 0.01))
+                self._wakeup.clear()
+                continue
+            self._pool.submit(self._analyze, camera, item)
+
+    def _analyze(self, camera: ScheduledCamera, item: tuple):
+        index, timestamp, frame = item
+        try:
+            results = camera.analyze(frame)
+        except Exception as e:
+            print(f"Error analyzing frame {index} of '{camera.name}': {e}")
+            results = {"error": str(e)}
+        result = {"camera": camera.name, "frame": index, "timestamp": timestamp, "results": results}
+
+        with self._lock:
+            camera.in_flight = False
+            camera.analyzed += 1
+            camera._completions.append(time.perf_counter())
+            camera.latest_result = result
+        self._free.release()
+        self._wakeup.set()
+        if self.on_result is not None:
+            self.on_result(result)
+
+    # ─── Reporting ──────────────────────────────────────────────────
+
+    def stats(self) -> dict:
+        """Per-camera target vs. achieved FPS, frame and drop counts, and stage timing."""
+        report = {}
+        with self._lock:
+            for camera in self.cameras:
+                stream = camera.stream.stats()
+                report[camera.name] = {
+                    "target_fps": camera.fps,
+                    "achieved_fps": round(camera.achieved_fps(), 2),
+                    "priority": camera.priority,
+                    "analyzed": camera.analyzed,
+                    "frames_read": stream["frames_read"],
+                    "frames_dropped": stream["frames_dropped"],
+                    "deadline_misses": camera.deadline_misses,
+                    "stages": stream["stages"],
+                }
+        return report
@@ -1,3 +1,14 @@
 VIDEO_SOURCE = 0
 MODEL_NAME = "face-detection"
 DEBUG = True
+
+# Cameras served by src/camera/scheduler.py. "source" is a device index, an
+# RTSP/HTTP URL or a video file; "fps" is the target analysis rate and
+# "priority" breaks ties when inference capacity runs short (higher first).
+CAMERA_SOURCES = [
+    {"name": "camera0", "source": VIDEO_SOURCE, "fps": 5, "priority": 1},
+]
+# "deadline" (earliest deadline first) or "round_robin" (weighted by priority)
+SCHEDULER_POLICY = "deadline"
+# Frames analyzed concurrently across all cameras
+SCHEDULER_WORKERS = 2
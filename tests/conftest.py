@@ -0,0 +1,54 @@
+"""
+공용 테스트 픽스처 - 임시 데이터 디렉터리의 서비스와 모델 대역(stub), 테스트용 JPEG 생성
+"""
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from backend.app.services.face_recognition import FaceRecognitionService
+
+
+@pytest.fixture
+def jpeg():
+    """jpeg(seed): a flat 64x64 JPEG whose brightness is seed * 10; seed 0 is black (no face)."""
+    def make(seed):
+        img = np.full((64, 64, 3), seed * 10 % 256, dtype=np.uint8)
+        return cv2.imencode(".jpg", img)[1].tobytes()
+    return make
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """
+    Service on a temporary data directory, with the models replaced by a
+    one-face detector (no face in a black image) and a recognizer whose
+    embedding depends on the image brightness. Counts detector and
+    recognizer calls in `calls` and recognition batch sizes in `embed_batches`.
+    """
+    svc = FaceRecognitionService(data_dir=str(tmp_path))
+    svc._ensure_gallery()
+    svc.store.fsync = False
+    svc.calls = {"detect": 0, "embed": 0}
+    svc.embed_batches = []
+
+    def detect_faces(img, det_size=None, scale=1.0):
+        svc.calls["detect"] += 1
+        if img.mean() < 5:
+            return []
+        return [SimpleNamespace(bbox=np.array([8, 8, 56, 56], dtype=np.float32), kps=None,
+                                det_score=np.float32(0.9), seed=float(img.mean()))]
+
+    def embed_faces(items, scales=None):
+        svc.calls["embed"] += 1
+        svc.embed_batches.append(len(items))
+        for _, face in items:
+            face.embedding = np.random.default_rng(int(face.seed)).standard_normal(512).astype(np.float32)
+
+    monkeypatch.setattr(svc, "detect_faces", detect_faces)
+    monkeypatch.setattr(svc, "_alignment_sources", lambda data, img, scale, faces: ([(img, f) for f in faces],
+                                                                                    [scale] * len(faces)))
+    monkeypatch.setattr(svc, "embed_faces", embed_faces)
+    yield svc
+    svc.store.close()
@@ -0,0 +1,70 @@
+"""
+배치 예측 테스트 - 이미지 목록/아카이브 분석, 배치 단위 인식, /api/predict/batch NDJSON 스트리밍 검증
+"""
+import io
+import json
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from backend.app.api import endpoints
+from backend.app.services.enrollment import image_path
+
+
+def test_image_path():
+    assert image_path("photos/2024/a.JPG") == "photos/2024/a.JPG"
+    assert image_path("a.png") == "a.png"
+    assert image_path("notes.txt") is None
+    assert image_path("__MACOSX/._a.jpg") is None
+
+
+def test_analyze_many_batches_and_keeps_order(service, jpeg, monkeypatch):
+    monkeypatch.setattr("backend.app.config.BATCH_PREDICT_SIZE", 3)
+    assert service.register_face("user1", jpeg(1))["status"] == "success"
+    service.embed_batches.clear()
+
+    entries = [(f"{i}.jpg", jpeg(i)) for i in range(1, 6)]
+    entries.insert(2, ("broken.jpg", b"not an image"))
+    results = list(service.analyze_many(entries))
+
+    assert [r["index"] for r in results] == list(range(6))
+    assert [r["source"] for r in results] == [source for source, _ in entries]
+    assert results[2]["error"] == "Failed to decode image"
+    assert results[0]["results"][0]["name"] == "user1"
+    assert results[1]["results"][0]["name"] == "Unknown"
+    # Recognition runs once per batch, over the faces found in it
+    assert service.embed_batches == [2, 3]
+
+    # Re-sent images come from the embedding cache and match analyze_images
+    again = list(service.analyze_many(entries[:2]))
+    assert service.embed_batches == [2, 3]
+    assert [r["results"] for r in again] == service.analyze_images([data for _, data in entries[:2]])
+
+
+def test_batch_endpoint_streams_ndjson(service, jpeg, monkeypatch):
+    monkeypatch.setattr(endpoints, "face_service", service)
+    monkeypatch.setattr("backend.app.config.BATCH_PREDICT_SIZE", 2)
+    from backend.main import app
+    client = TestClient(app)
+
+    files = [("files", (f"{i}.jpg", jpeg(i), "image/jpeg")) for i in range(1, 4)]
+    files.append(("files", ("bad.jpg", b"junk", "image/jpeg")))
+    response = client.post("/api/predict/batch", files=files)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("source") for line in lines[:4]] == ["1.jpg", "2.jpg", "3.jpg", "bad.jpg"]
+    assert all(len(line["results"]) == 1 for line in lines[:3]) and "error" in lines[3]
+    assert lines[4] == {"summary": {"images": 4, "failed": 1}}
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("camera/2024/a.jpg", jpeg(1))
+        archive.writestr("b.jpg", jpeg(2))
+        archive.writestr("README.txt", b"skip")
+    response = client.post("/api/predict/batch", files={"file": ("batch.zip", buffer.getvalue())})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line.get("source") for line in lines] == ["camera/2024/a.jpg", "b.jpg", None]
+
+    assert client.post("/api/predict/batch", files={"file": ("x.zip", b"not an archive")}).status_code == 400
+    assert client.post("/api/predict/batch").status_code == 400
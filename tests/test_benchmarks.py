@@ -0,0 +1,46 @@
+"""
+벤치마크 하네스 테스트 - 백분위 통계, 기준선 비교(회귀 판정), 합성 모델로 소규모 전체 실행 검증
+"""
+import json
+
+from benchmarks import harness, run
+
+
+def test_summarize_percentiles_and_qps():
+    stats = harness.summarize([i / 1000 for i in range(1, 101)], wall=2.0)
+    assert stats["iterations"] == 100
+    assert stats["p50_ms"] == 50.5 and stats["p99_ms"] == 99.01
+    assert stats["qps"] == 50.0
+
+
+def test_compare_flags_regressions():
+    def result(p95, qps):
+        return {"scenario": "search", "variant": "exact", "gallery_size": 1000, "p95_ms": p95, "qps": qps}
+
+    baseline = {"results": [result(10.0, 100.0)]}
+    assert not harness.compare([result(11.0, 95.0)], baseline, tolerance=0.2)[0]["regressed"]
+    assert harness.compare([result(13.0, 100.0)], baseline, tolerance=0.2)[0]["regressed"]
+    assert harness.compare([result(10.0, 70.0)], baseline, tolerance=0.2)[0]["regressed"]
+    other = dict(result(50.0, 1.0), gallery_size=10000)
+    assert harness.compare([other], baseline) == []
+
+
+def test_synthetic_run_writes_results(tmp_path):
+    output = tmp_path / "results.json"
+    argv = ["--gallery-sizes", "200", "--iterations", "5", "--models", "synthetic", "--image-count", "2",
+            "--output", str(output)]
+    assert run.main(argv) == 0
+
+    report = json.loads(output.read_text(encoding="utf-8"))
+    keys = {harness.result_key(r) for r in report["results"]}
+    assert {"search[exact]@200", "search[ivf]@200", "predict@200", "predict_cached@200", "list[name]@200",
+            "register@200", "http_predict@200", "http_list@200", "http_register@200"} <= keys
+    assert all(r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"] for r in report["results"])
+    assert report["environment"]["python"]
+
+    # Against a much faster baseline every scenario regresses
+    for r in report["results"]:
+        r["p95_ms"] /= 100
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps(report), encoding="utf-8")
+    assert run.main(argv + ["--baseline", str(baseline), "--tolerance", "0.5"]) == 1
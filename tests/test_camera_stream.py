@@ -0,0 +1,96 @@
+"""
+CameraStream 테스트 - 로컬에서 생성한 동영상 파일로 캡처/디코드/추론 파이프라인 검증
+"""
+import threading
+
+import cv2
+import numpy as np
+
+from src.camera.camera_stream import CameraStream
+
+
+def write_video(path, frames=30, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), 30, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 8, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_video_file_is_analyzed_frame_by_frame(tmp_path):
+    source = write_video(tmp_path / "clip.avi")
+    stream = CameraStream(source, analyze=lambda frame: float(frame.mean()))
+    with stream:
+        assert stream.wait(timeout=10)
+        results = [stream.get_result(timeout=1) for _ in range(30)]
+
+    assert [r["frame"] for r in results] == list(range(30))
+    brightness = [r["results"] for r in results]
+    assert brightness == sorted(brightness)
+    stats = stream.stats()
+    assert stats["frames_read"] == 30 and stats["frames_dropped"] == 0
+    assert stats["stages"]["inference"]["count"] == 30
+    assert stats["stages"]["decode"]["count"] == 30
+
+
+class LiveCapture:
+    """Stand-in for cv2.VideoCapture of a live camera: frame i is grabbed only once `ready(i)` is set."""
+
+    def __init__(self, frames, ready):
+        self.frames = frames
+        self.ready = ready
+        self.index = -1
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        if self.index + 1 >= self.frames:
+            return False
+        self.index += 1
+        self.ready(self.index).wait(timeout=10)
+        return True
+
+    def retrieve(self):
+        return True, np.full((48, 64, 3), self.index * 8, dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_slow_inference_drops_stale_frames(monkeypatch):
+    analyzing, finish = threading.Event(), threading.Event()
+    free = threading.Event()
+    free.set()
+
+    def ready(index):
+        # Frames 1-5 arrive while the first frame is being analyzed; frame 6 ends that analysis
+        if 1 <= index <= 5:
+            return analyzing
+        if index == 6:
+            finish.set()
+        return free
+
+    def slow(frame):
+        analyzing.set()
+        finish.wait(timeout=10)
+        return float(frame.mean())
+
+    monkeypatch.setattr("src.camera.camera_stream.cv2.VideoCapture", lambda source: LiveCapture(30, ready))
+    stream = CameraStream("rtsp://camera", analyze=slow)
+    with stream:
+        assert stream.wait(timeout=10)
+
+    stats = stream.stats()
+    assert stats["frames_read"] == 30 and stats["frames_dropped"] >= 5
+    # Frames arriving while inference is busy are not decoded
+    assert stats["stages"]["decode"]["count"] <= stats["frames_read"] - 5
+    assert stats["stages"]["inference"]["count"] == stats["frames_read"] - stats["frames_dropped"]
+
+
+def test_read_frame_without_inference(tmp_path):
+    source = write_video(tmp_path / "clip.avi", frames=5)
+    with CameraStream(source) as stream:
+        assert stream.wait(timeout=10)
+        frame = stream.read_frame()
+    assert frame.shape == (48, 64, 3)
@@ -0,0 +1,87 @@
+"""
+CLI 테스트 - 폴더 인식 결과(CSV) 및 재개(resume), 갤러리 재임베딩, 저장 형식(snapshot/legacy/npz) 변환 검증
+"""
+import csv
+import os
+
+import numpy as np
+import pytest
+
+from backend import cli
+from backend.app.services.embedding_store import EmbeddingStore
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.gallery_io import detect_format, read_gallery, write_gallery
+
+
+def write_images(jpeg, root, names):
+    for i, name in enumerate(names):
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(jpeg(i + 1) if not name.startswith("broken") else b"junk")
+
+
+@pytest.fixture
+def stub_service(service, monkeypatch):
+    monkeypatch.setattr("backend.app.services.face_recognition.configured_service", lambda **kwargs: service)
+    return service
+
+
+def test_recognize_folder_and_resume(stub_service, jpeg, tmp_path):
+    photos = tmp_path / "photos"
+    write_images(jpeg, photos, ["a/1.jpg", "a/2.jpg", "b.jpg", "broken.jpg"])
+    output = str(tmp_path / "results.csv")
+    cli.main(["recognize", str(photos), "--output", output, "--workers", "0", "--chunk", "2"])
+
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["source"] for row in rows] == ["b.jpg", "broken.jpg", os.path.join("a", "1.jpg"),
+                                               os.path.join("a", "2.jpg")]
+    assert rows[0]["name"] == "Unknown" and rows[0]["face"] == "0"
+    assert rows[1]["error"] == "Failed to decode image" and rows[1]["face"] == ""
+    assert stub_service.embed_batches == [1, 2]
+
+    # An interrupted chunk: rows written past the last recorded offset are dropped on resume
+    with open(output, "a", encoding="utf-8") as f:
+        f.write("c.jpg,,,0,torn")
+    write_images(jpeg, photos, ["a/1.jpg", "a/2.jpg", "b.jpg", "broken.jpg", "c.jpg"])
+    cli.main(["recognize", str(photos), "--output", output, "--workers", "0", "--resume"])
+    with open(output, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["source"] for row in rows][3:] == [os.path.join("a", "2.jpg"), "c.jpg"]
+    assert rows[4]["name"] == "Unknown"
+    assert stub_service.embed_batches == [1, 2, 1]
+
+
+def test_reembed_skips_enrolled_photos_on_resume(stub_service, jpeg, tmp_path):
+    photos = tmp_path / "photos"
+    write_images(jpeg, photos, ["kim/1.jpg", "kim/2.jpg", "lee/1.jpg"])
+    (tmp_path / "reembed.progress").write_text(os.path.join("kim", "1.jpg") + "\n", encoding="utf-8")
+    cli.main(["reembed", str(photos), "--output", str(tmp_path), "--resume"])
+
+    gallery = GalleryIndex()
+    EmbeddingStore(str(tmp_path)).load(gallery)
+    assert gallery.count("kim") == 1 and gallery.count("lee") == 1
+    assert (tmp_path / "reembed.progress").read_text(encoding="utf-8").split() == [
+        os.path.join("kim", "1.jpg"), os.path.join("kim", "2.jpg"), os.path.join("lee", "1.jpg")]
+
+
+def test_convert_between_formats(tmp_path):
+    rng = np.random.default_rng(0)
+    gallery = GalleryIndex()
+    gallery.add("홍길동", rng.standard_normal((3, 512)).astype(np.float32))
+    gallery.add("kim", rng.standard_normal((1, 512)).astype(np.float32))
+    meta = {"홍길동": {"image_count": 3}, "kim": {"image_count": 1}}
+    write_gallery(gallery, meta, str(tmp_path / "data"))
+
+    cli.main(["convert", str(tmp_path / "data"), str(tmp_path / "gallery.npz")])
+    cli.main(["convert", str(tmp_path / "gallery.npz"), str(tmp_path / "legacy"), "--to", "legacy"])
+    assert detect_format(str(tmp_path / "legacy")) == "legacy"
+    cli.main(["convert", str(tmp_path / "legacy"), str(tmp_path / "again")])
+
+    converted, converted_meta = read_gallery(str(tmp_path / "again"))
+    assert converted_meta == meta
+    for name in ("홍길동", "kim"):
+        np.testing.assert_allclose(converted.embeddings(name), gallery.embeddings(name), atol=1e-6)
+
+    with pytest.raises(SystemExit):
+        cli.main(["convert", str(tmp_path / "legacy"), str(tmp_path / "again")])
@@ -0,0 +1,97 @@
+"""
+임베딩 캐시 테스트 - 내용 해시 키, LRU 개수/바이트 제한, TTL, 재전송 이미지의 추론 생략 검증
+"""
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from backend.app.services import embedding_cache
+from backend.app.services.embedding_cache import CachedFaces, EmbeddingCache
+
+
+def faces(n, complete=True):
+    rng = np.random.default_rng(n)
+    face_list = [
+        SimpleNamespace(bbox=np.array([0, 0, 10, 10], dtype=np.float32), kps=np.zeros((5, 2)), det_score=0.9,
+                        embedding=rng.standard_normal(512).astype(np.float32))
+        for _ in range(n)
+    ]
+    return CachedFaces.from_faces(face_list, complete)
+
+
+def test_key_covers_bytes_and_det_size():
+    assert EmbeddingCache.key(b"image", 640) == EmbeddingCache.key(b"image", 640)
+    assert EmbeddingCache.key(b"image", 640) != EmbeddingCache.key(b"image", 320)
+    assert EmbeddingCache.key(b"image", 640) != EmbeddingCache.key(b"image2", 640)
+
+
+def test_lru_respects_entry_and_byte_limits():
+    cache = EmbeddingCache(max_entries=2)
+    for key in (b"a", b"b"):
+        cache.put(key, faces(1))
+    cache.get(b"a")
+    cache.put(b"c", faces(1))
+    assert cache.get(b"b") is None and cache.get(b"a") is not None
+    assert cache.evictions == 1
+
+    one = faces(1).nbytes
+    cache = EmbeddingCache(max_entries=100, max_bytes=3 * one)
+    for key in (b"a", b"b", b"c", b"d"):
+        cache.put(key, faces(1))
+    assert cache.stats()["entries"] == 3 and cache.nbytes <= 3 * one
+    cache.put(b"huge", faces(10))  # larger than the whole cache: not stored
+    assert cache.get(b"huge") is None
+
+
+def test_ttl_and_partial_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    cache = EmbeddingCache(ttl=10)
+
+    cache.put(b"k", faces(2, complete=False))
+    assert cache.get(b"k") is not None
+    assert cache.get(b"k", complete=True) is None
+    cache.put(b"k", faces(2))
+    assert cache.get(b"k", complete=True) is not None
+    cache.put(b"k", faces(1, complete=False))  # a partial entry never replaces a complete one
+    assert len(cache.get(b"k")) == 2
+
+    now[0] += 11
+    assert cache.get(b"k") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (3, 2)
+
+
+def test_resent_images_skip_inference(service):
+    image = cv2.imencode(".jpg", np.full((64, 64, 3), 120, dtype=np.uint8))[1].tobytes()
+
+    first = service.analyze_image(image)
+    assert service.analyze_image(image) == first
+    assert service.calls == {"detect": 1, "embed": 1}
+
+    # Registering the same photo reuses the cached embedding
+    assert service.register_face("kim", image)["status"] == "success"
+    assert service.register_face("kim", image)["total_images"] == 2
+    assert service.calls == {"detect": 1, "embed": 1}
+    assert service.analyze_image(image)[0]["name"] == "kim"
+    assert service.embedding_cache.stats()["hits"] == 4
+
+
+def test_faceless_images_are_cached_as_empty(service, jpeg):
+    assert CachedFaces.from_faces([]).embeddings.shape == (0, 512)
+
+    # On its own: a miss, then a hit, both without faces
+    assert service.analyze_image(jpeg(0)) == []
+    assert service.analyze_image(jpeg(0)) == []
+    assert service.calls["detect"] == 1
+
+    # In a batch, the face-less image does not fail the image next to it
+    service.embedding_cache.clear()
+    for _ in range(2):
+        results = service.analyze_images([jpeg(12), jpeg(0)])
+        assert results[1] == []
+        assert len(results[0]) == 1 and results[0][0]["name"] == "Unknown"
+    assert service.calls["detect"] == 3
+    results = list(service.analyze_many([("face.jpg", jpeg(12)), ("empty.jpg", jpeg(0))]))
+    assert [r["results"] for r in results] == [service.analyze_images([jpeg(12)])[0], []]
@@ -0,0 +1,178 @@
+"""
+EmbeddingStore 단위 테스트 - memmap 스냅샷 + append-only 로그 재생, 손상된 저장소 복구 검증
+"""
+import json
+import os
+import pickle
+
+import numpy as np
+
+from backend.app.services.embedding_store import CORRUPT_SUFFIX, EmbeddingStore, LOG_FILE, SNAPSHOT_TABLE
+from backend.app.services.face_recognition import FaceRecognitionService
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.search_index import l2_normalize
+
+
+def embedding(seed):
+    return np.random.default_rng(seed).standard_normal(512).astype(np.float32)
+
+
+def load(path, **kwargs):
+    store = EmbeddingStore(str(path), fsync=False, **kwargs)
+    gallery = GalleryIndex()
+    meta = store.load(gallery)
+    return store, gallery, meta
+
+
+def test_log_replay_restores_state(tmp_path):
+    store, gallery, meta = load(tmp_path)
+    assert len(gallery) == 0 and meta == {}
+
+    store.add("홍길동", embedding(1), "2026-01-01T00:00:00")
+    store.add("홍길동", embedding(2), "2026-01-02T00:00:00")
+    store.add("kim", embedding(3), "2026-01-03T00:00:00")
+    store.rename("kim", "김철수", "2026-01-04T00:00:00")
+    store.add("lee", embedding(4), "2026-01-05T00:00:00")
+    store.remove("lee")
+    store.close()
+
+    _, gallery, meta = load(tmp_path)
+    assert sorted(gallery.names()) == ["김철수", "홍길동"]
+    np.testing.assert_allclose(gallery.embeddings("홍길동")[1], l2_normalize(embedding(2)))
+    assert meta["홍길동"] == {
+        "created_at": "2026-01-01T00:00:00",
+        "image_count": 2,
+        "updated_at": "2026-01-02T00:00:00",
+    }
+    assert meta["김철수"]["updated_at"] == "2026-01-04T00:00:00"
+
+
+def test_torn_record_is_discarded(tmp_path):
+    store, _, _ = load(tmp_path)
+    store.add("a", embedding(1), "t1")
+    store.add("b", embedding(2), "t2")
+    store.close()
+
+    log_path = os.path.join(tmp_path, LOG_FILE)
+    size = os.path.getsize(log_path)
+    with open(log_path, 'r+b') as f:
+        f.truncate(size - 10)
+
+    store, gallery, _ = load(tmp_path)
+    assert gallery.names() == ["a"]
+
+    # Appending after recovery continues from the last valid record
+    store.add("c", embedding(3), "t3")
+    store.close()
+    _, gallery, _ = load(tmp_path)
+    assert gallery.names() == ["a", "c"]
+
+
+def test_compaction_is_not_replayed_twice(tmp_path):
+    store, gallery, meta = load(tmp_path, compact_every=2)
+    for i, name in enumerate(["a", "b"]):
+        store.add(name, embedding(i), "t")
+    assert store.needs_compaction
+
+    # Simulate a crash after the snapshot swap but before the fresh log is written
+    stale_log = open(os.path.join(tmp_path, LOG_FILE), 'rb').read()
+    store.compact()
+    store.close()
+    with open(os.path.join(tmp_path, LOG_FILE), 'wb') as f:
+        f.write(stale_log)
+
+    store, gallery, meta = load(tmp_path)
+    assert {name: gallery.count(name) for name in gallery.names()} == {"a": 1, "b": 1}
+    assert meta["b"]["image_count"] == 1
+    assert store.log_records == 0
+
+
+def test_legacy_files_are_imported(tmp_path):
+    legacy_faces = os.path.join(tmp_path, "registered_faces.pkl")
+    legacy_meta = os.path.join(tmp_path, "faces_meta.json")
+    with open(legacy_faces, 'wb') as f:
+        pickle.dump({"문성호": [embedding(1)]}, f)
+    with open(legacy_meta, 'w', encoding='utf-8') as f:
+        json.dump({"문성호": {"created_at": "t0", "image_count": 1, "updated_at": "t0"}}, f)
+
+    _, gallery, meta = load(tmp_path, legacy_faces_file=legacy_faces, legacy_meta_file=legacy_meta)
+    assert gallery.names() == ["문성호"]
+    assert meta["문성호"]["image_count"] == 1
+
+
+def test_snapshot_is_memory_mapped_and_copied_on_write(tmp_path):
+    store, gallery, meta = load(tmp_path)
+    for i in range(6):
+        store.add(f"user{i % 3}", embedding(i), f"t{i}")
+    store.remove("user1")
+    expected = {name: gallery.embeddings(name) for name in gallery.names()}
+    store.compact()
+    store.close()
+
+    store, gallery, meta = load(tmp_path)
+    assert isinstance(gallery.matrix, np.memmap)
+    assert sorted(gallery.names()) == ["user0", "user2"]
+    for name, embs in expected.items():
+        np.testing.assert_array_equal(gallery.embeddings(name), embs)
+    assert meta["user2"]["image_count"] == 2
+
+    # First modification copies the mapped matrix instead of writing through it
+    store.add("user3", embedding(10), "t10")
+    store.remove("user0")
+    assert gallery.matrix.flags.writeable
+    assert sorted(gallery.names()) == ["user2", "user3"]
+
+
+def test_stores_sharing_a_directory_follow_each_other(tmp_path):
+    # Two stores on one directory behave like two worker processes
+    store_a, gallery_a, meta_a = load(tmp_path)
+    store_b, gallery_b, meta_b = load(tmp_path)
+
+    store_a.add("a", embedding(1), "t1")
+    assert store_b.sync()
+    assert gallery_b.names() == ["a"] and meta_b["a"]["image_count"] == 1
+    assert not store_b.sync()
+
+    # B writes after A: B catches up first, so both logs agree on order
+    store_a.add("b", embedding(2), "t2")
+    store_b.rename("b", "비", "t3")
+    assert store_a.sync()
+    assert sorted(gallery_a.names()) == ["a", "비"]
+
+    # Compaction by A makes B reload the new snapshot
+    store_a.compact()
+    assert store_b.sync()
+    assert store_b.generation == store_a.generation
+    store_b.add("c", embedding(3), "t4")
+    assert store_a.sync()
+    assert sorted(gallery_a.names()) == sorted(gallery_b.names()) == ["a", "c", "비"]
+    np.testing.assert_allclose(gallery_a.embeddings("c"), gallery_b.embeddings("c"))
+
+
+def test_corrupt_snapshot_resets_the_service_store(service, jpeg, monkeypatch):
+    assert service.register_face("kim", jpeg(3))["status"] == "success"
+    service.save_faces()
+    service.store.close()
+    table = os.path.join(service.data_dir, SNAPSHOT_TABLE)
+    with open(table, "w", encoding="utf-8") as f:
+        f.write("{not json")
+
+    restarted = FaceRecognitionService(data_dir=service.data_dir)
+    for attr in ("detect_faces", "_alignment_sources", "embed_faces"):
+        monkeypatch.setattr(restarted, attr, getattr(service, attr))
+    restarted._ensure_gallery()
+    restarted.store.fsync = False
+    restarted._app = object()  # models "loaded": only the gallery error keeps it from being ready
+    assert not restarted.is_ready
+    assert "Failed to load registered faces" in restarted.readiness()["error"]
+    assert os.path.exists(table + CORRUPT_SUFFIX)
+
+    # The reset store is writable and its metadata is what /users lists
+    assert restarted.register_face("lee", jpeg(5))["status"] == "success"
+    assert [user["name"] for user in restarted.get_registered_users()["users"]] == ["lee"]
+    restarted.store.close()
+
+    # The next start loads the registrations made after the reset
+    store, gallery, meta = load(service.data_dir)
+    assert gallery.names() == ["lee"] and list(meta) == ["lee"]
+    store.close()
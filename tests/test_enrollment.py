@@ -0,0 +1,107 @@
+"""
+대량 등록 테스트 - 아카이브/폴더(name/*.jpg) 읽기, 배치 임베딩 및 배치당 1회 저장 검증
+"""
+import io
+import os
+import tarfile
+import unicodedata
+import zipfile
+
+import numpy as np
+import pytest
+
+from backend.app.services.embedding_store import EmbeddingStore
+from backend.app.services.enrollment import (
+    SkippedImage, identity_of, iter_archive, iter_folder, resolve_import_folder
+)
+from backend.app.services.gallery import GalleryIndex
+
+
+def test_identity_of():
+    assert identity_of("people/홍길동/1.jpg") == "홍길동"
+    assert identity_of("kim/a.PNG") == "kim"
+    assert identity_of(unicodedata.normalize("NFD", "이영희/1.jpg")) == "이영희"
+    assert identity_of("1.jpg") is None
+    assert identity_of("kim/notes.txt") is None
+    assert identity_of("__MACOSX/kim/._1.jpg") is None
+
+
+def test_iter_zip_and_tar():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("홍길동/1.jpg", b"a")
+        archive.writestr("홍길동/2.jpg", b"b" * 100)
+        archive.writestr("README.txt", b"skip")
+    entries = list(iter_archive(buffer, max_bytes=10))
+    assert [(name, path) for name, path, _ in entries] == [("홍길동", "홍길동/1.jpg"), ("홍길동", "홍길동/2.jpg")]
+    assert entries[0][2] == b"a" and isinstance(entries[1][2], SkippedImage)
+
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        info = tarfile.TarInfo("batch/kim/1.jpg")
+        info.size = 3
+        archive.addfile(info, io.BytesIO(b"abc"))
+    assert list(iter_archive(buffer, max_bytes=10)) == [("kim", "batch/kim/1.jpg", b"abc")]
+
+    with pytest.raises(ValueError):
+        list(iter_archive(io.BytesIO(b"not an archive"), max_bytes=10))
+
+
+def test_iter_folder_and_import_root(tmp_path):
+    for name, files in {"kim": ["2.jpg", "1.jpg"], "lee": ["1.jpg"]}.items():
+        os.makedirs(tmp_path / "import" / name)
+        for filename in files:
+            (tmp_path / "import" / name / filename).write_bytes(b"x")
+    root = str(tmp_path)
+    folder = resolve_import_folder(root, "import")
+    assert [path for _, path, _ in iter_folder(folder, max_bytes=10)] == [
+        os.path.join("kim", "1.jpg"), os.path.join("kim", "2.jpg"), os.path.join("lee", "1.jpg")
+    ]
+    for bad_root, bad_folder in ((None, "import"), (root, "../"), (root, "missing")):
+        with pytest.raises(ValueError):
+            resolve_import_folder(bad_root, bad_folder)
+
+
+def test_store_add_many_is_one_append(tmp_path):
+    store = EmbeddingStore(str(tmp_path), fsync=False)
+    store.load(GalleryIndex())
+    rng = np.random.default_rng(0)
+    store.add_many([(name, rng.standard_normal(512).astype(np.float32), "t") for name in ("a", "a", "b")])
+    assert store.log_records == 3
+    store.close()
+
+    gallery = GalleryIndex()
+    meta = EmbeddingStore(str(tmp_path), fsync=False).load(gallery)
+    assert gallery.count("a") == 2 and meta["b"]["image_count"] == 1
+
+
+def test_enroll_batches_and_persists_once_per_batch(service, jpeg, monkeypatch):
+    monkeypatch.setattr("backend.app.config.ENROLL_BATCH_SIZE", 4)
+    commits = []
+    original = service.store._commit_many
+    monkeypatch.setattr(service.store, "_commit_many", lambda ops: (commits.append(len(ops)), original(ops)))
+
+    entries = [(f"user{i % 3}", f"user{i % 3}/{i}.jpg", jpeg(i + 1)) for i in range(9)]
+    entries.append(("black", "black/1.jpg", jpeg(0)))
+    entries.append(("broken", "broken/1.jpg", b"not an image"))
+    result = service.register_bulk(entries)
+
+    assert result["registered_images"] == 9
+    assert result["users"] == {"user0": 3, "user1": 3, "user2": 3}
+    assert {f["source"]: f["message"] for f in result["failed"]} == {
+        "black/1.jpg": "No face detected in the image",
+        "broken/1.jpg": "Failed to decode image",
+    }
+    # Recognition runs once per batch and each batch is one log append
+    assert service.embed_batches == [4, 4, 1]
+    assert commits == [4, 4, 1]
+    assert service.faces_meta["user0"]["image_count"] == 3
+    assert service.thumbnails.version("user1") is not None
+
+
+def test_register_multiple_faces_reports_each_image(service, jpeg):
+    result = service.register_multiple_faces(" 홍길동 ", [jpeg(1), jpeg(0), jpeg(2)])
+    assert result["status"] == "success"
+    assert result["name"] == "홍길동" and result["total_images"] == 2
+    assert [d["status"] for d in result["details"]] == ["success", "error", "success"]
+    assert [d["image_index"] for d in result["details"]] == [0, 1, 2]
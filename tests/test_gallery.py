@@ -0,0 +1,118 @@
+"""
+GalleryIndex 단위 테스트 (모델 없이 임의 임베딩으로 검증)
+"""
+import numpy as np
+
+from backend.app.services.gallery import GalleryIndex, l2_normalize
+from backend.app.services.matcher import BatchMatcher
+
+
+def random_embeddings(n, dim=512, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def test_matrix_is_normalized_and_contiguous():
+    gallery = GalleryIndex(capacity=2)
+    gallery.add("홍길동", random_embeddings(3, seed=1))
+    gallery.add("kim", random_embeddings(2, seed=2))
+
+    assert len(gallery) == 5
+    assert gallery.matrix.dtype == np.float32
+    assert gallery.matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(np.linalg.norm(gallery.matrix, axis=1), 1.0, rtol=1e-5)
+    assert gallery.count("홍길동") == 3
+
+
+def test_best_match_matches_naive_search():
+    faces = {f"user{i}": list(random_embeddings(3, seed=i)) for i in range(10)}
+    gallery = GalleryIndex.from_faces(faces)
+    queries = random_embeddings(4, seed=99)
+    queries[0] = faces["user7"][1] + 0.01
+
+    names = [n for n, embs in faces.items() for _ in embs]
+    stacked = l2_normalize(np.stack([e for embs in faces.values() for e in embs]))
+    expected = l2_normalize(queries) @ stacked.T
+
+    for (name, score), row in zip(gallery.best_match(queries), expected):
+        assert name == names[int(np.argmax(row))]
+        assert abs(score - float(row.max())) < 1e-5
+    assert gallery.best_match(queries[:1])[0][0] == "user7"
+
+
+def test_remove_and_rename_update_incrementally():
+    gallery = GalleryIndex()
+    a, b = random_embeddings(2, seed=3)
+    gallery.add("a", a)
+    gallery.add("b", b)
+
+    assert gallery.rename("a", "에이")
+    assert gallery.best_match(a)[0][0] == "에이"
+
+    assert gallery.remove("에이")
+    assert len(gallery) == 1
+    assert "에이" not in gallery
+    assert gallery.best_match(a)[0][0] == "b"
+
+    # Freed label ids are reused
+    gallery.add("c", a)
+    assert gallery.num_labels == 2
+
+
+def test_empty_gallery_returns_no_match():
+    assert GalleryIndex().best_match(random_embeddings(2)) == [(None, 0.0), (None, 0.0)]
+
+
+def test_batch_matcher_aggregations_match_naive_reduction():
+    faces = {f"user{i}": list(random_embeddings(i % 4 + 1, seed=i)) for i in range(12)}
+    gallery = GalleryIndex.from_faces(faces)
+    gallery.add("user3", random_embeddings(1, seed=50))  # rows of one identity not contiguous
+    faces["user3"].append(random_embeddings(1, seed=50)[0])
+    queries = random_embeddings(25, seed=7)
+
+    def naive(reduce):
+        per_name = {
+            name: l2_normalize(queries) @ l2_normalize(np.stack(embs)).T
+            for name, embs in faces.items()
+        }
+        return {name: reduce(s) for name, s in per_name.items()}
+
+    expected = {
+        "max": naive(lambda s: s.max(axis=1)),
+        "mean": naive(lambda s: s.mean(axis=1)),
+        "topk": naive(lambda s: np.sort(s, axis=1)[:, ::-1][:, :2].mean(axis=1)),
+    }
+    for aggregation, reference in expected.items():
+        scores, labels = BatchMatcher(gallery, aggregation, top_k=2).identity_scores(queries)
+        for col, label in enumerate(labels):
+            np.testing.assert_allclose(scores[:, col], reference[gallery.name_of(label)], atol=1e-5)
+
+
+def test_batch_matcher_tracks_gallery_changes():
+    gallery = GalleryIndex()
+    matcher = BatchMatcher(gallery, "mean")
+    a, b = random_embeddings(2, seed=11)
+    assert matcher.match(a) == [(None, 0.0)]
+
+    gallery.add("a", a)
+    gallery.add("b", b)
+    assert matcher.match(np.stack([a, b]))[1][0] == "b"
+
+    gallery.remove("b")
+    assert matcher.match(b)[0][0] == "a"
+
+
+def test_spilled_gallery_keeps_snapshot_rows_off_the_heap(tmp_path):
+    snapshot = l2_normalize(random_embeddings(6, seed=3))
+    path = tmp_path / "snapshot.npy"
+    np.save(path, snapshot)
+    gallery = GalleryIndex(spill_dir=str(tmp_path))
+    gallery.load_snapshot(np.load(path, mmap_mode="r"), ["a", "b"], [4, 2])
+
+    # Copy-on-write goes to a scratch memmap, not the heap; the scratch file is already unlinked
+    gallery.add("c", random_embeddings(1, seed=4))
+    gallery.remove("a")
+    assert isinstance(gallery._matrix, np.memmap)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["snapshot.npy"]
+    np.testing.assert_allclose(gallery.embeddings("b"), snapshot[4:])
+    assert gallery.best_match(snapshot[5])[0][0] == "b"
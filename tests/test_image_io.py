@@ -0,0 +1,49 @@
+"""
+이미지 디코딩 단위 테스트 - JPEG 헤더 크기 파싱, 축소 디코딩 배율, 검출 크기 프로필
+"""
+import cv2
+import numpy as np
+import pytest
+
+from backend.app.services.face_recognition import resolve_det_size
+from backend.app.services.image_io import decode_for_detection, jpeg_size, reduced_decode_factor
+
+
+def encode(width, height, ext=".jpg"):
+    img = np.random.default_rng(0).integers(0, 255, (height, width, 3), dtype=np.uint8)
+    ok, buf = cv2.imencode(ext, img)
+    assert ok
+    return buf.tobytes()
+
+
+def test_jpeg_size_reads_header():
+    assert jpeg_size(encode(1000, 600)) == (1000, 600)
+    assert jpeg_size(encode(64, 48, ".png")) is None
+    assert jpeg_size(b"\xff\xd8\xff") is None
+
+
+def test_reduced_decode_factor():
+    assert reduced_decode_factor((4032, 3024), 640) == 4
+    assert reduced_decode_factor((1600, 1200), 640) == 2
+    assert reduced_decode_factor((1000, 800), 640) == 1
+    assert reduced_decode_factor(None, 640) == 1
+
+
+def test_large_jpeg_is_decoded_reduced():
+    img, scale = decode_for_detection(encode(2600, 1300), 640)
+    assert img.shape[:2] == (325, 650)
+    assert scale == pytest.approx(4.0)
+
+    # PNGs have no cheap reduced decode
+    img, scale = decode_for_detection(encode(2600, 1300, ".png"), 640)
+    assert img.shape[:2] == (1300, 2600) and scale == 1.0
+
+
+def test_resolve_det_size():
+    assert resolve_det_size("kiosk") == 320
+    assert resolve_det_size("480") == 480
+    assert resolve_det_size(None) == resolve_det_size("default")
+    with pytest.raises(ValueError):
+        resolve_det_size(500)
+    with pytest.raises(ValueError):
+        resolve_det_size("tiny")
@@ -0,0 +1,106 @@
+"""
+InferencePool / MicroBatcher 단위 테스트 - 큐 포화 시 거절, 동시 요청 배치 처리 확인
+"""
+import asyncio
+import threading
+
+import pytest
+
+from backend.app.services.batcher import MicroBatcher
+from backend.app.services.inference_pool import InferencePool, InferencePoolFull
+
+
+def test_pool_runs_off_loop_and_rejects_when_full():
+    pool = InferencePool(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    def blocking(value):
+        release.wait(5)
+        return value * 2
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(blocking, 1))
+        waiting = asyncio.ensure_future(pool.run(blocking, 2))
+        await asyncio.sleep(0.05)
+        assert pool.pending == 2 and pool.queued == 1
+
+        # The event loop is still responsive, and a third call is rejected at once
+        with pytest.raises(InferencePoolFull):
+            await pool.run(blocking, 3)
+
+        release.set()
+        assert await running == 2
+        assert await waiting == 4
+        assert pool.pending == 0
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_micro_batcher_coalesces_concurrent_requests():
+    pool = InferencePool(max_workers=2, max_queue=4)
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(process, pool, max_batch=3, max_wait_ms=20)
+
+    async def scenario():
+        submitted = [asyncio.ensure_future(batcher.submit(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        # The first three went out as a full batch; two wait for max_wait
+        assert batcher.pending == 2
+        results = await asyncio.gather(*submitted)
+        assert results == [0, 10, 20, 30, 40] and batcher.pending == 0
+
+    asyncio.run(scenario())
+    # Full batch flushed immediately, the remainder after max_wait
+    assert batches == [[0, 1, 2], [3, 4]]
+    pool.shutdown()
+
+
+def test_micro_batcher_propagates_errors_to_every_caller():
+    pool = InferencePool(max_workers=1, max_queue=1)
+
+    def process(items):
+        raise RuntimeError("model failed")
+
+    batcher = MicroBatcher(process, pool, max_batch=4, max_wait_ms=1)
+
+    async def scenario():
+        results = await asyncio.gather(batcher.submit(1), batcher.submit(2), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    asyncio.run(scenario())
+    pool.shutdown()
+
+
+def test_user_endpoints_do_not_block_the_event_loop(tmp_path, monkeypatch):
+    import httpx
+
+    from backend.app.api import endpoints
+    from backend.app.services.face_recognition import FaceRecognitionService
+    from backend.main import app
+
+    service = FaceRecognitionService(data_dir=str(tmp_path))
+    service._ensure_gallery()
+    monkeypatch.setattr(endpoints, "face_service", service)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # A writer holding the service lock (e.g. persisting and compacting)
+            service._lock.acquire()
+            try:
+                users = asyncio.ensure_future(client.get("/api/users"))
+                await asyncio.sleep(0.05)
+                health = await asyncio.wait_for(client.get("/health"), timeout=2)
+                assert health.status_code == 200 and not users.done()
+            finally:
+                service._lock.release()
+            assert (await users).json()["total"] == 0
+
+    asyncio.run(scenario())
+    service.store.close()
@@ -0,0 +1,70 @@
+"""
+메트릭 테스트 - 히스토그램/카운터 Prometheus 출력, 요청별 단계 타이밍(Server-Timing), /metrics 검증
+"""
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.app.api import endpoints
+from backend.app.services import metrics
+from backend.app.services.batcher import MicroBatcher
+from backend.app.services.inference_pool import InferencePool
+
+
+def test_histogram_and_counter_render():
+    registry = metrics.MetricsRegistry()
+    latency = registry.histogram("test_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, stage="detect")
+    requests = registry.counter("test_requests_total", "Test requests", ("route",))
+    requests.inc(route='/a"b')
+    registry.collect("test_depth", "Test depth", lambda: 3)
+
+    text = registry.render()
+    assert '# TYPE test_seconds histogram' in text
+    assert 'test_seconds_bucket{stage="detect",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="detect",le="1"} 2' in text
+    assert 'test_seconds_bucket{stage="detect",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="detect"} 3' in text
+    assert 'test_requests_total{route="/a\\"b"} 1' in text
+    assert 'test_depth 3' in text
+
+
+def test_pool_calls_record_into_callers_trace():
+    pool = InferencePool(max_workers=1, max_queue=2)
+
+    def work():
+        with metrics.stage("detection"):
+            return 42
+
+    async def scenario():
+        trace = metrics.start_trace()
+        assert await pool.run(work) == 42
+        return trace
+
+    trace = asyncio.run(scenario())
+    pool.shutdown()
+    assert set(trace) == {"queue", "detection"}
+
+
+def test_predict_reports_stage_timings(monkeypatch):
+    def analyze(frames):
+        metrics.record_stage("detection", 0.002)
+        return [[] for _ in frames]
+
+    size = endpoints.resolve_det_size(None)
+    monkeypatch.setitem(endpoints.predict_batchers, size, MicroBatcher(analyze, endpoints.inference_pool))
+    monkeypatch.setattr("backend.app.config.DEBUG_TIMING_HEADER", True)
+    detections = metrics.STAGE_SECONDS.count(stage="detection")
+
+    from backend.main import app
+    client = TestClient(app)
+    response = client.post("/api/predict", files={"file": ("a.jpg", b"jpeg", "image/jpeg")})
+    assert response.status_code == 200
+    stages = {part.split(";")[0] for part in response.headers["server-timing"].split(", ")}
+    assert {"read", "batch_wait", "queue", "detection", "serialize", "batch", "total"} <= stages
+
+    text = client.get("/metrics").text
+    assert 'face_http_requests_total{method="POST",route="/api/predict",status="200"}' in text
+    assert "face_inference_pending 0" in text
+    assert metrics.STAGE_SECONDS.count(stage="detection") == detections + 1
@@ -0,0 +1,97 @@
+"""
+프로토타입 압축 테스트 - 중심(centroid) + farthest-point 대표 선택, 원본 갤러리 변경 추적, 서비스 연동 검증
+"""
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend.app.services.face_recognition import FaceRecognitionService
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.matcher import BatchMatcher
+from backend.app.services.prototypes import PrototypeIndex, select_prototypes
+from backend.app.services.search_index import l2_normalize
+
+
+def person(n, seed, noise=0.5):
+    rng = np.random.default_rng(seed)
+    center = rng.standard_normal(512).astype(np.float32)
+    return l2_normalize(center + noise * rng.standard_normal((n, 512)).astype(np.float32))
+
+
+def test_select_prototypes():
+    samples = person(20, seed=1)
+    np.testing.assert_array_equal(select_prototypes(samples[:4], k=3), samples[:4])
+
+    outlier = person(1, seed=2)
+    embeddings = np.vstack([samples, outlier])
+    prototypes = select_prototypes(embeddings, k=3)
+    assert prototypes.shape == (4, 512)
+    np.testing.assert_allclose(prototypes[0], l2_normalize(embeddings.mean(axis=0)), rtol=1e-5)
+    # The least typical sample is the first exemplar
+    np.testing.assert_allclose(prototypes[1], outlier[0])
+
+
+def test_index_follows_source_changes():
+    source = GalleryIndex()
+    index = PrototypeIndex(source, k=2)
+    for i in range(5):
+        source.add(f"user{i}", person(1 + 3 * i, seed=i))
+    index.refresh()
+    assert [index.gallery.count(f"user{i}") for i in range(5)] == [1, 3, 3, 3, 3]
+
+    source.add("user0", person(4, seed=10))
+    source.remove("user1")
+    source.rename("user2", "renamed")
+    index.refresh()
+    assert index.gallery.count("user0") == 3
+    assert "user1" not in index.gallery and "user2" not in index.gallery
+    np.testing.assert_allclose(index.gallery.embeddings("renamed"), select_prototypes(source.embeddings("renamed"), 2),
+                               atol=1e-6)
+
+    # Incremental updates end up where a full rebuild does
+    rebuilt = PrototypeIndex(source, k=2)
+    rebuilt.refresh()
+    for name in source.names():
+        np.testing.assert_allclose(np.sort(index.gallery.embeddings(name), axis=0),
+                                   np.sort(rebuilt.gallery.embeddings(name), axis=0), atol=1e-6)
+
+
+def test_prototypes_match_like_raw_embeddings():
+    rng = np.random.default_rng(0)
+    source = GalleryIndex()
+    for i in range(30):
+        source.add(f"user{i}", person(int(rng.integers(1, 40)), seed=100 + i))
+    index = PrototypeIndex(source, k=4)
+    index.refresh()
+    assert len(index) <= 30 * 5 < len(source)
+
+    queries = np.vstack([person(1, seed=100 + i) for i in range(30)])
+    raw = [name for name, _ in BatchMatcher(source).match(queries)]
+    compact = [name for name, _ in BatchMatcher(index.gallery).match(queries)]
+    assert raw == compact == [f"user{i}" for i in range(30)]
+
+
+def test_service_searches_prototypes_and_keeps_raw(tmp_path):
+    service = FaceRecognitionService(data_dir=str(tmp_path), prototypes=2)
+    service._ensure_gallery()
+    service.store.fsync = False
+    embeddings = person(10, seed=5)
+    service.store.add_many([("kim", embedding, "t") for embedding in embeddings])
+    service.store.add("lee", person(1, seed=6)[0], "t")
+
+    def Face(embedding):
+        return SimpleNamespace(embedding=embedding)
+
+    assert service._match([Face(embeddings[0])])[0][0] == "kim"
+    assert service.gallery.count("kim") == 10
+    assert service.prototype_index.gallery.count("kim") == 3
+
+    # Every raw embedding is still on disk: without prototypes, all are searched again
+    reopened = FaceRecognitionService(data_dir=str(tmp_path))
+    reopened._ensure_gallery()
+    assert reopened.prototype_index is None and len(reopened.gallery) == 11
+    reopened.store.close()
+
+    service.delete_user("kim")
+    assert service._match([Face(embeddings[0])])[0][0] == "lee"
+    service.store.close()
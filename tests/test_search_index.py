@@ -0,0 +1,190 @@
+"""
+검색 백엔드(Exact / IVF / Quantized) 단위 테스트 - recall@1 을 exact 결과와 비교
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from backend.app.services.face_recognition import FaceRecognitionService, configured_service
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.matcher import BatchMatcher
+from backend.app.services.search_index import (
+    ExactBackend, IVFBackend, QuantizedBackend, SearchBackend, code_scores, encode, l2_normalize, make_backend,
+    recall_at_1
+)
+
+
+def clustered_gallery(identities=300, per_identity=3, dim=512, seed=0):
+    """Embeddings of each identity scattered around its own random center."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((identities, dim)).astype(np.float32)
+    vectors = np.repeat(centers, per_identity, axis=0)
+    vectors += 0.3 * rng.standard_normal(vectors.shape).astype(np.float32)
+    labels = np.repeat(np.arange(identities), per_identity).astype(np.int32)
+    queries = centers + 0.3 * rng.standard_normal(centers.shape).astype(np.float32)
+    return vectors, labels, queries
+
+
+def test_ivf_recall_against_exact():
+    vectors, labels, queries = clustered_gallery()
+    exact = ExactBackend()
+    exact.build(vectors, labels)
+    ivf = IVFBackend(nlist=16, nprobe=4)
+    ivf.build(vectors, labels)
+
+    assert ivf.centroids is not None
+    assert recall_at_1(ivf, exact, queries) >= 0.9
+
+    # Probing every list is exact
+    ivf.nprobe = ivf.nlist
+    assert recall_at_1(ivf, exact, queries) == 1.0
+
+
+def test_backends_add_and_remove():
+    vectors, labels, queries = clustered_gallery(identities=40, per_identity=2)
+    for backend in (ExactBackend(), IVFBackend(nlist=4, nprobe=4, train_size=32),
+                    IVFBackend(nlist=4, nprobe=4, train_size=32, codec="int8"), QuantizedBackend()):
+        backend.add(vectors[:40], labels[:40])
+        backend.add(vectors[40:], labels[40:])
+        assert len(backend) == len(vectors)
+
+        _, found = backend.search(queries[30], 1)
+        assert found[0, 0] == 30
+
+        backend.remove(30)
+        assert len(backend) == len(vectors) - 2
+        _, found = backend.search(queries[30], 5)
+        assert 30 not in found
+
+
+def test_search_pads_when_fewer_than_k():
+    backend = make_backend("ivf", nlist=8)
+    scores, found = backend.search(np.ones(512, dtype=np.float32), 3)
+    assert found.tolist() == [[-1, -1, -1]]
+    assert np.isneginf(scores).all()
+
+
+def test_matcher_with_ivf_gallery_matches_exact():
+    vectors, labels, queries = clustered_gallery(identities=200)
+    faces = {}
+    for vector, label in zip(vectors, labels):
+        faces.setdefault(f"user{label}", []).append(vector)
+
+    exact = BatchMatcher(GalleryIndex.from_faces(faces), "mean")
+    approx = BatchMatcher(
+        GalleryIndex.from_faces(faces, backend=IVFBackend(nlist=16, nprobe=4)), "mean", candidates=16
+    )
+    expected = exact.match(queries)
+    found = approx.match(queries)
+    agreement = np.mean([a[0] == b[0] for a, b in zip(expected, found)])
+    assert agreement >= 0.9
+    for (name_a, score_a), (name_b, score_b) in zip(expected, found):
+        if name_a == name_b:
+            assert abs(score_a - score_b) < 1e-5
+
+
+def test_backend_must_implement_the_interface():
+    class Partial(SearchBackend):
+        def build(self, vectors, labels):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial()
+    for backend in (ExactBackend(), QuantizedBackend(), IVFBackend()):
+        assert isinstance(backend, SearchBackend) and len(backend) == 0
+
+
+def test_gallery_keeps_an_empty_backend():
+    # An empty backend has len() == 0; the gallery must not swap it for the exact default
+    backend = IVFBackend(nlist=4)
+    gallery = GalleryIndex(backend=backend)
+    assert gallery.backend is backend
+
+
+def test_codecs_approximate_float32_scores():
+    vectors, _, queries = clustered_gallery(identities=50)
+    vectors, queries = l2_normalize(vectors), l2_normalize(queries)
+    exact = queries @ vectors.T
+    for codec, tolerance in (("float32", 1e-6), ("float16", 2e-3), ("int8", 2e-2)):
+        codes, scales = encode(vectors, codec)
+        np.testing.assert_allclose(code_scores(queries, codes, scales), exact, atol=tolerance)
+
+
+def test_quantized_backend_recall_and_memory():
+    vectors, labels, queries = clustered_gallery()
+    exact = ExactBackend()
+    exact.build(l2_normalize(vectors), labels)
+    for codec, max_fraction in (("int8", 0.27), ("float16", 0.51)):
+        backend = make_backend("quantized", codec=codec)
+        backend.build(vectors, labels)
+        assert recall_at_1(backend, exact, queries) >= 0.99
+        assert backend.nbytes <= max_fraction * exact.nbytes
+
+
+def test_matcher_without_rerank_uses_backend_scores():
+    vectors, labels, queries = clustered_gallery(identities=100)
+    faces = {}
+    for vector, label in zip(vectors, labels):
+        faces.setdefault(f"user{label}", []).append(vector)
+
+    expected = BatchMatcher(GalleryIndex.from_faces(faces), "mean").match(queries)
+    gallery = GalleryIndex.from_faces(faces, backend=QuantizedBackend())
+    for rerank in (True, False):
+        found = BatchMatcher(gallery, "mean", candidates=16, rerank=rerank).match(queries)
+        assert np.mean([a[0] == b[0] for a, b in zip(expected, found)]) >= 0.95
+        # Re-ranked scores are the exact float32 ones; the others are close
+        tolerance = 1e-5 if rerank else 2e-2
+        for (name_a, score_a), (name_b, score_b) in zip(expected, found):
+            if name_a == name_b:
+                assert abs(score_a - score_b) < tolerance
+
+
+def test_configured_service_passes_codec_only_to_codec_backends(tmp_path, monkeypatch):
+    monkeypatch.setattr("backend.app.config.SEARCH_BACKEND", "quantized")
+    monkeypatch.setattr("backend.app.config.SEARCH_CODEC", "float16")
+    service = configured_service(data_dir=str(tmp_path))
+    service._ensure_gallery()
+    assert isinstance(service.gallery.backend, QuantizedBackend) and service.gallery.backend.codec == "float16"
+    service.store.close()
+
+    monkeypatch.setattr("backend.app.config.SEARCH_BACKEND", "exact")
+    with pytest.raises(ValueError, match="FACE_SEARCH_CODEC"):
+        configured_service(data_dir=str(tmp_path))
+    with pytest.raises(ValueError, match="exact"):
+        make_backend("exact", codec="int8")
+
+
+def test_service_keeps_float32_rows_file_backed_for_approximate_backends(tmp_path):
+    service = FaceRecognitionService(data_dir=str(tmp_path), search_backend="quantized")
+    service._ensure_gallery()
+    service.store.fsync = False
+    vectors, _, _ = clustered_gallery(identities=4)
+    service.store.add_many([(f"user{i}", vector, "t") for i, vector in enumerate(vectors)])
+    assert isinstance(service.gallery._matrix, np.memmap)
+    assert service._match([SimpleNamespace(embedding=vectors[5])])[0][0] == "user5"
+    service.store.close()
+
+    exact = FaceRecognitionService(data_dir=str(tmp_path))
+    exact._ensure_gallery()
+    exact.store.fsync = False
+    exact.store.add("kim", vectors[0], "t")
+    assert not isinstance(exact.gallery._matrix, np.memmap)
+    exact.store.close()
+
+
+def test_service_gallery_uses_the_configured_backend(tmp_path):
+    # Regression: an empty IVF backend is falsy and used to be swapped for exact search
+    service = FaceRecognitionService(data_dir=str(tmp_path), search_backend="ivf", search_params={"nlist": 4})
+    service._ensure_gallery()
+    assert isinstance(service.gallery.backend, IVFBackend)
+    service.store.fsync = False
+    vectors, _, _ = clustered_gallery(identities=20)
+    service.store.add_many([(f"user{i}", vector, "t") for i, vector in enumerate(vectors)])
+    service.save_faces()
+    service.store.close()
+
+    reopened = FaceRecognitionService(data_dir=str(tmp_path), search_backend="ivf", search_params={"nlist": 4})
+    reopened._ensure_gallery()
+    assert isinstance(reopened.gallery.backend, IVFBackend) and len(reopened.gallery.backend) == len(vectors)
+    reopened.store.close()
@@ -0,0 +1,73 @@
+"""
+서버 시작 테스트 - import 시 모델 로딩/디렉터리 생성이 없는지, /ready 응답, 모델 팩/모듈 설정 검증
+"""
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.app.services.face_recognition import FaceRecognitionService
+
+
+def test_import_does_not_load_models():
+    code = (
+        "import os, sys\n"
+        "import backend.main\n"
+        "from backend.app.services import face_recognition as fr\n"
+        "assert 'insightface' not in sys.modules, 'insightface imported eagerly'\n"
+        "assert 'onnxruntime' not in sys.modules, 'onnxruntime imported eagerly'\n"
+        "assert fr.face_service._app is None\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_ready_reports_loading_until_warm():
+    from backend.main import app
+    from backend.app.services.face_recognition import face_service
+
+    # Without entering the client context the lifespan (and warmup) does not run
+    client = TestClient(app)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["status"] == "loading"
+    assert body["models_loaded"] is False
+    assert face_service.is_ready is False
+    assert client.get("/health").status_code == 200
+
+
+class FakeFaceAnalysis:
+    """Records the FaceAnalysis arguments instead of loading a model pack."""
+    created = []
+
+    def __init__(self, name, allowed_modules, providers, **kwargs):
+        self.name = name
+        self.models = {module: None for module in allowed_modules}
+        FakeFaceAnalysis.created.append((name, list(allowed_modules)))
+
+    def prepare(self, ctx_id, det_size):
+        self.det_size = det_size
+
+
+def test_model_pack_and_modules_reach_face_analysis(tmp_path, monkeypatch):
+    monkeypatch.setattr("insightface.app.FaceAnalysis", FakeFaceAnalysis)
+    FakeFaceAnalysis.created.clear()
+
+    service = FaceRecognitionService(data_dir=str(tmp_path), model_pack="buffalo_s",
+                                     allowed_modules=["detection", "recognition", "landmark_2d_106"])
+    assert service.app.name == "buffalo_s"
+    assert FakeFaceAnalysis.created == [("buffalo_s", ["detection", "recognition", "landmark_2d_106"])]
+    assert "models" in service.startup_timings
+
+    # Without arguments the pack and modules come from config (FACE_MODEL_PACK / FACE_MODEL_MODULES)
+    monkeypatch.setattr("backend.app.config.MODEL_PACK", "antelopev2")
+    monkeypatch.setattr("backend.app.config.MODEL_MODULES", ["recognition", "detection"])
+    FaceRecognitionService(data_dir=str(tmp_path)).app
+    assert FakeFaceAnalysis.created[-1] == ("antelopev2", ["recognition", "detection"])
+
+
+@pytest.mark.parametrize("modules", [["detection"], ["recognition", "genderage"]])
+def test_modules_without_detection_or_recognition_are_rejected(tmp_path, modules):
+    with pytest.raises(ValueError, match="allowed_modules must include"):
+        FaceRecognitionService(data_dir=str(tmp_path), allowed_modules=modules)
@@ -0,0 +1,51 @@
+"""
+WebSocket 스트리밍 테스트 - 처리 중 도착한 오래된 프레임은 버리고 최신 프레임만 분석하는지 검증
+"""
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from backend.app.api import endpoints
+from backend.app.services.batcher import MicroBatcher
+from backend.app.services.frame_stream import LatestFrame
+
+
+def test_latest_frame_keeps_only_newest():
+    async def scenario():
+        mailbox = LatestFrame()
+        for frame in (b"1", b"2", b"3"):
+            mailbox.put(frame)
+        assert await mailbox.get() == (3, b"3")
+        assert mailbox.dropped == 2
+
+        mailbox.put(b"4")
+        mailbox.close()
+        assert await mailbox.get() == (4, b"4")
+        assert await mailbox.get() is None
+
+    asyncio.run(scenario())
+
+
+def test_stream_drops_stale_frames(monkeypatch):
+    def slow_analyze(frames):
+        time.sleep(0.2)
+        return [[{"bytes": len(frame)}] for frame in frames]
+
+    size = endpoints.resolve_det_size(None)
+    monkeypatch.setitem(
+        endpoints.predict_batchers, size, MicroBatcher(slow_analyze, endpoints.inference_pool, max_batch=1)
+    )
+
+    from backend.main import app
+    client = TestClient(app)
+    with client.websocket_connect("/api/stream?track=false") as ws:
+        for i in range(1, 6):
+            ws.send_bytes(b"x" * i)
+        messages = [ws.receive_json()]
+        while messages[-1]["frame"] != 5:
+            messages.append(ws.receive_json())
+
+    assert messages[-1]["results"] == [{"bytes": 5}]
+    assert len(messages) < 5
+    assert messages[-1]["dropped"] == 5 - len(messages)
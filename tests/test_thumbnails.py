@@ -0,0 +1,63 @@
+"""
+썸네일 캐시/엔드포인트 테스트 - LRU 무효화, ETag 조건부 요청(304) 검증
+"""
+import os
+
+from fastapi.testclient import TestClient
+
+from backend.app.services.face_recognition import face_service
+from backend.app.services.thumbnail_cache import ThumbnailCache
+
+
+def write_thumb(cache, name, data):
+    with open(cache.path(name), 'wb') as f:
+        f.write(data)
+
+
+def test_cache_hits_until_file_changes(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_entries=2)
+    write_thumb(cache, "홍길동", b"jpeg-1")
+    data, etag, _ = cache.get("홍길동")
+    assert data == b"jpeg-1" and cache.get("홍길동")[1] == etag
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1}
+    assert cache.version("홍길동") == etag
+
+    # Rewritten by another process: the stat signature no longer matches
+    write_thumb(cache, "홍길동", b"jpeg-two")
+    assert cache.get("홍길동")[0] == b"jpeg-two"
+
+    os.remove(cache.path("홍길동"))
+    assert cache.get("홍길동") is None and cache.version("홍길동") is None
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), max_entries=2)
+    for name in ("a", "b", "c"):
+        write_thumb(cache, name, name.encode())
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")
+    assert list(cache._entries) == ["a", "c"]
+
+
+def test_thumbnail_endpoint_conditional_requests(tmp_path, monkeypatch):
+    cache = ThumbnailCache(str(tmp_path))
+    monkeypatch.setattr(face_service, "thumbnails", cache)
+    write_thumb(cache, "kim", b"\xff\xd8jpeg")
+
+    from backend.main import app
+    client = TestClient(app)
+    response = client.get("/api/users/kim/thumbnail")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    assert client.get("/api/users/kim/thumbnail", headers={"If-None-Match": etag}).status_code == 304
+    last_modified = response.headers["last-modified"]
+    assert client.get("/api/users/kim/thumbnail", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    versioned = client.get("/api/users/kim/thumbnail", params={"v": etag.strip('"')})
+    assert "immutable" in versioned.headers["cache-control"]
+    assert client.get("/api/users/lee/thumbnail").status_code == 404
@@ -0,0 +1,56 @@
+"""
+FaceTracker 단위 테스트 - IoU 연관, 새 트랙/주기/품질 향상 시에만 재임베딩
+"""
+import numpy as np
+
+from backend.app.services.tracker import FaceTracker, face_quality, iou_matrix
+
+
+def test_iou_matrix():
+    boxes = np.array([[0, 0, 10, 10], [5, 0, 15, 10]])
+    iou = iou_matrix(boxes, boxes)
+    np.testing.assert_allclose(np.diag(iou), 1.0)
+    assert iou[0, 1] == np.float32(50 / 150)
+    assert iou_matrix(np.empty((0, 4)), boxes).shape == (0, 2)
+
+
+def test_moving_faces_keep_their_tracks():
+    tracker = FaceTracker(refresh_every=100)
+    a = np.array([0, 0, 100, 100], dtype=np.float32)
+    b = np.array([300, 0, 400, 100], dtype=np.float32)
+
+    first = tracker.update([a, b], [0.8, 0.8])
+    assert [needs for _, needs in first] == [True, True]
+    for track, _ in first:
+        tracker.assign(track, f"user{track.track_id}", 0.9, 0.8)
+
+    # Faces move 20 px per frame and come in a different order: no re-embedding
+    for step in range(1, 6):
+        shift = np.array([20, 0, 20, 0], dtype=np.float32) * step
+        tracked = tracker.update([b + shift, a + shift], [0.8, 0.8])
+        assert [track.track_id for track, _ in tracked] == [2, 1]
+        assert not any(needs for _, needs in tracked)
+
+    # A clearer view of the same face triggers one re-embedding
+    shift = np.array([120, 0, 120, 0], dtype=np.float32)
+    tracked = tracker.update([a + shift, b + shift], [0.95, 0.8])
+    assert [needs for _, needs in tracked] == [True, False]
+
+
+def test_refresh_and_expiry():
+    tracker = FaceTracker(refresh_every=3, max_missed=1)
+    box = [0, 0, 100, 100]
+    (track, _), = tracker.update([box], [0.8])
+    tracker.assign(track, "a", 0.9, 0.8)
+    assert [tracker.update([box], [0.8])[0][1] for _ in range(3)] == [False, False, True]
+
+    tracker.update([], [])
+    tracker.update([], [])
+    assert tracker.tracks == []
+    (new_track, needs), = tracker.update([box], [0.8])
+    assert needs and new_track.track_id != track.track_id
+
+
+def test_face_quality_discounts_small_faces():
+    assert face_quality([0, 0, 112, 200], 0.9) == 0.9
+    assert face_quality([0, 0, 56, 56], 0.9) == 0.45
@@ -0,0 +1,126 @@
+"""
+UserIndex 단위 테스트 - 증분 정렬 인덱스, 커서 페이지네이션, 한글(초성) 검색 검증
+"""
+import unicodedata
+
+import numpy as np
+import pytest
+
+from backend.app.services.embedding_store import EmbeddingStore
+from backend.app.services.gallery import GalleryIndex
+from backend.app.services.user_index import UserIndex, encode_cursor, initials
+
+
+def entry(day, count=1):
+    return {"created_at": f"2026-01-{day:02d}T00:00:00", "updated_at": f"2026-02-{day:02d}T00:00:00",
+            "image_count": count}
+
+
+def make_index():
+    return UserIndex({
+        "홍길동": entry(3, 5),
+        "홍수아": entry(1, 2),
+        "김철수": entry(2, 7),
+        "Kim": entry(5, 1),
+        "lee": entry(4, 3),
+    })
+
+
+def page_names(index, **kwargs):
+    return index.query(**kwargs)["names"]
+
+
+def test_sorting_by_each_field():
+    index = make_index()
+    assert page_names(index) == ["Kim", "lee", "김철수", "홍길동", "홍수아"]
+    assert page_names(index, sort="created_at") == ["홍수아", "김철수", "홍길동", "lee", "Kim"]
+    assert page_names(index, sort="image_count", order="desc") == ["김철수", "홍길동", "lee", "홍수아", "Kim"]
+    with pytest.raises(ValueError):
+        index.query(sort="age")
+
+
+def test_indexes_follow_incremental_updates():
+    index = make_index()
+    index["홍수아"] = entry(9, 10)  # re-registered: replaced, not mutated
+    index["박영희"] = entry(6, 4)
+    del index["lee"]
+    assert page_names(index, sort="image_count", order="desc") == ["홍수아", "김철수", "홍길동", "박영희", "Kim"]
+    assert page_names(index, sort="updated_at")[-1] == "홍수아"
+    assert all(len(keys) == len(index) for keys in index._sorted.values())
+
+
+def test_cursor_pages_cover_everything_once():
+    index = make_index()
+    seen, cursor = [], None
+    while True:
+        page = index.query(sort="created_at", order="desc", limit=2, cursor=cursor)
+        assert page["matched"] == 5
+        seen += page["names"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == page_names(index, sort="created_at", order="desc")
+
+    # The cursor stays valid while users ahead of it are added or removed
+    first = index.query(limit=2)
+    index["Aaron"] = entry(7)
+    del index["Kim"]
+    assert page_names(index, limit=2, cursor=first["next_cursor"]) == ["김철수", "홍길동"]
+    with pytest.raises(ValueError):
+        index.query(cursor="not-a-cursor")
+    # A well-formed cursor from another sort field is rejected, not compared
+    for key in ([1, "x"], ["a"], "abc", {"a": 1}):
+        with pytest.raises(ValueError):
+            index.query(sort="name", cursor=encode_cursor(key))
+    with pytest.raises(ValueError):
+        index.query(sort="image_count", cursor=first["next_cursor"])
+
+
+def test_offset_paging():
+    index = make_index()
+    assert page_names(index, offset=1, limit=2) == ["lee", "김철수"]
+    assert page_names(index, order="desc", offset=1, limit=2) == ["홍길동", "김철수"]
+    assert page_names(index, search="홍", offset=1) == ["홍수아"]
+
+
+def test_search_prefix_substring_and_initials():
+    index = make_index()
+    assert initials("홍길동") == "ㅎㄱㄷ"
+    assert page_names(index, search="KIM") == ["Kim"]
+    assert page_names(index, search="홍", mode="prefix") == ["홍길동", "홍수아"]
+    assert page_names(index, search="수") == ["김철수", "홍수아"]
+    assert page_names(index, search="수", mode="prefix") == []
+    assert page_names(index, search="ㅎㄱ") == ["홍길동"]
+    assert page_names(index, search="ㅅ", mode="prefix") == []
+    # Decomposed (NFD) input matches composed names
+    assert page_names(index, search=unicodedata.normalize("NFD", "홍길")) == ["홍길동"]
+    assert index.query(search="홍", limit=1)["matched"] == 2
+
+
+def test_store_maintains_index(tmp_path):
+    store = EmbeddingStore(str(tmp_path), fsync=False)
+    gallery = GalleryIndex()
+    meta = store.load(gallery, UserIndex())
+    rng = np.random.default_rng(0)
+    store.add("홍길동", rng.standard_normal(512).astype(np.float32), "2026-01-01T00:00:00")
+    store.add("kim", rng.standard_normal(512).astype(np.float32), "2026-01-02T00:00:00")
+    store.add("홍길동", rng.standard_normal(512).astype(np.float32), "2026-01-03T00:00:00")
+    store.rename("kim", "김철수", "2026-01-04T00:00:00")
+    assert isinstance(meta, UserIndex)
+    assert page_names(meta, sort="image_count", order="desc") == ["홍길동", "김철수"]
+    assert page_names(meta, sort="updated_at", order="desc") == ["김철수", "홍길동"]
+    store.close()
+
+    reloaded = EmbeddingStore(str(tmp_path), fsync=False).load(GalleryIndex(), UserIndex())
+    assert page_names(reloaded, search="ㄱㅊ") == ["김철수"]
+
+
+def test_users_endpoint_rejects_mismatched_cursor(service, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from backend.app.api import endpoints
+    from backend.main import app
+    monkeypatch.setattr(endpoints, "face_service", service)
+    client = TestClient(app)
+    response = client.get("/api/users", params={"sort": "name", "cursor": encode_cursor([1, "x"])})
+    assert response.status_code == 400